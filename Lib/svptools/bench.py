@@ -0,0 +1,365 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import imp
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+from collections import OrderedDict
+import numpy as np
+from svptools import suite as svp_suite
+
+DEFAULT_SUITE = os.path.join('Suites', 'Simulated Rig.ste')
+RESULT_FILE = 'bench.json'
+
+# parameters every benchmark run gets: a simulated rig on a virtual clock, so nothing waits on real time except
+# the configured driver latency, with the timing trace that provides the per-operation timings
+BENCH_PARAMS = [
+    ('sim.mode', 'string', 'Enabled'),
+    ('trace.mode', 'string', 'Enabled'),
+    ('workbook.mode', 'string', 'Incremental'),
+    ('session.mode', 'string', 'Disabled'),
+]
+
+PERCENTILES = [50, 95, 99]
+# percentiles compared with the baseline; p99 of a few runs is too noisy to gate on, and so is p95 of an
+# operation timed fewer than MIN_SAMPLES times
+COMPARED = ['p50', 'p95']
+MIN_SAMPLES = 20
+
+# a percentile or peak memory is a regression when it is this much worse than the baseline (fraction) and also
+# worse by more than the absolute floor, which keeps timer noise on sub-millisecond operations from flagging
+THRESHOLD = 0.25
+MIN_DELTA = 0.05  # ms
+MIN_MEMORY_DELTA = 4.  # MB
+
+
+class BenchError(Exception):
+    pass
+
+
+def peak_memory():
+    """
+    Peak resident memory of this process in MB, or None where the resource module is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak/(1024.*1024.) if sys.platform == 'darwin' else peak/1024.
+
+
+def run_child(script_path, config_file, out_file):
+    """
+    Run one test script in this process (the benchmark child) and write its span durations, wall time and peak
+    memory to out_file.
+    """
+    import script
+    from svptools import trace
+
+    np.random.seed(0)
+    name = os.path.splitext(os.path.basename(script_path))[0]
+    sys.path.insert(0, os.path.dirname(script_path))
+    memory_before = peak_memory()
+    start = time.time()
+    module = imp.load_source(name, script_path)
+    loaded = time.time()
+    rc = 0
+    try:
+        module.run(script.Script(info=module.script_info(), config_file=config_file))
+    except SystemExit, e:
+        rc = e.code if e.code is not None else 0
+    end = time.time()
+    spans = {}
+    for span_name, cat, span_start, duration, tid in trace.tracer.events:
+        spans.setdefault(span_name, []).append(duration)
+    result = {'rc': rc, 'import': loaded - start, 'wall': end - loaded, 'spans': spans,
+              'dropped': trace.tracer.dropped, 'memory': peak_memory(), 'memory_before': memory_before}
+    f = open(out_file, 'w')
+    try:
+        json.dump(result, f)
+    finally:
+        f.close()
+    return rc
+
+
+def stats(durations, wall):
+    """
+    Per-operation statistics in ms: calls, total, throughput (calls per second of wall time, wall being the
+    total test wall time in s) and latency percentiles.
+    """
+    d = np.asarray(durations, dtype=np.float64) * 1000.
+    s = OrderedDict([('samples', len(d)), ('calls', len(d)), ('total', float(d.sum())),
+                     ('throughput', len(d)/wall if wall > 0 else None), ('mean', float(d.mean()))])
+    for p, v in zip(PERCENTILES, np.percentile(d, PERCENTILES)):
+        s['p%d' % p] = float(v)
+    s['max'] = float(d.max())
+    return s
+
+
+class Benchmark(object):
+    """
+    Runs the members of a suite against the simulated rig, each repetition in a fresh child process with its
+    own result directory, and reports for each test script the per-operation latency percentiles and
+    throughput, the test wall time and the peak memory. The operations are the timing trace spans: driver
+    calls (der.measurements, das.data_capture_read, ...), settling and start-up waits, dataset saves, summary
+    flushes and the workbook build. As the simulated rig runs on a virtual clock, the test wall time is the
+    scripts' own overhead plus the configured driver latency.
+    """
+
+    def __init__(self, suite, out_dir, repeat=3, overrides=None, python=None, log=None):
+        self.suite = suite
+        self.out_dir = out_dir
+        self.repeat = int(repeat)
+        self.overrides = overrides if overrides is not None else OrderedDict()
+        self.python = python if python is not None else sys.executable
+        self.log = log if log is not None else self._log
+
+    def _log(self, msg):
+        sys.stdout.write('%s\n' % msg)
+        sys.stdout.flush()
+
+    def _env(self):
+        env = dict(os.environ)
+        path = [os.path.join(self.suite.svp_dir, svp_suite.LIB_DIR),
+                os.path.join(self.suite.svp_dir, svp_suite.SCRIPTS_DIR)]
+        if env.get('PYTHONPATH'):
+            path.append(env['PYTHONPATH'])
+        env['PYTHONPATH'] = os.pathsep.join(path)
+        return env
+
+    def _params(self, run_dir):
+        params = OrderedDict()
+        for name, ptype, value in BENCH_PARAMS:
+            params[name] = svp_suite.Param(name, ptype, value)
+        # keep the caches and the results index of the benchmark away from the user's
+        for name in ['eutconfig.cache_file', 'checkpoint.dir', 'resultindex.db']:
+            params[name] = svp_suite.Param(name, 'string', os.path.join(run_dir, 'cache', name.split('.')[0]))
+        params.update(self.overrides)
+        return params
+
+    def run_one(self, index, config, rep):
+        run_dir = os.path.abspath(os.path.join(self.out_dir, '%02d_%s' % (index + 1, config.name), 'run%d' % rep))
+        if os.path.exists(run_dir):
+            shutil.rmtree(run_dir)
+        os.makedirs(run_dir)
+        config = config.merged(self._params(run_dir))
+        config_file = os.path.join(run_dir, config.name + '.tst')
+        config.to_file(config_file)
+        script_path = os.path.join(self.suite.svp_dir, svp_suite.SCRIPTS_DIR, config.script + '.py')
+        out_file = os.path.join(run_dir, RESULT_FILE)
+        log = open(os.path.join(run_dir, config.name + '.log'), 'w')
+        try:
+            rc = subprocess.call([self.python, '-m', 'svptools.bench', '--child', script_path, config_file, out_file],
+                                 cwd=run_dir, env=self._env(), stdout=log, stderr=subprocess.STDOUT)
+        finally:
+            log.close()
+        if not os.path.exists(out_file):
+            raise BenchError('%s did not run (rc = %s), see %s' % (config.name, rc, log.name))
+        f = open(out_file)
+        try:
+            result = json.load(f)
+        finally:
+            f.close()
+        if result['rc'] != 0:
+            self.log('Warning: %s exited with rc = %s, see %s' % (config.name, result['rc'], log.name))
+        return result
+
+    def run(self):
+        """
+        Run the benchmark and return {test name: {'wall', 'import', 'memory', 'ops': {operation: stats}}}.
+        """
+        results = OrderedDict()
+        for index, config in enumerate(self.suite.tests()):
+            runs = []
+            for rep in range(self.repeat):
+                runs.append(self.run_one(index, config, rep))
+            wall = float(np.median([r['wall'] for r in runs]))
+            spans = {}
+            for r in runs:
+                for name, durations in r['spans'].items():
+                    spans.setdefault(name, []).extend(durations)
+            memory = [r['memory'] for r in runs if r['memory'] is not None]
+            ops = OrderedDict()
+            for name in sorted(spans):
+                ops[name] = stats(spans[name], wall * len(runs))
+                # calls and total time per run
+                ops[name]['calls'] /= float(len(runs))
+                ops[name]['total'] /= len(runs)
+            results[config.name] = OrderedDict([
+                ('script', config.script),
+                ('wall', wall * 1000.),
+                ('import', float(np.median([r['import'] for r in runs])) * 1000.),
+                ('memory', max(memory) if memory else None),
+                ('ops', ops)])
+            self.log('%s: %0.1f ms per run (median of %d)' % (config.name, wall * 1000., len(runs)))
+        return results
+
+
+def compare(results, baseline, threshold=THRESHOLD, min_delta=MIN_DELTA, min_memory_delta=MIN_MEMORY_DELTA):
+    """
+    Compare benchmark results with a baseline. Returns a list of (test, metric, baseline, now, ratio) for each
+    regression; operations or tests missing from either side are not compared.
+    """
+    regressions = []
+
+    def check(test, metric, old, new, floor):
+        if old is None or new is None:
+            return
+        if new > old * (1. + threshold) and new - old > floor:
+            regressions.append((test, metric, old, new, new/old if old else float('inf')))
+
+    for test, r in results.items():
+        b = baseline.get(test)
+        if b is None:
+            continue
+        check(test, 'wall', b.get('wall'), r.get('wall'), min_delta)
+        check(test, 'memory', b.get('memory'), r.get('memory'), min_memory_delta)
+        for op, s in r['ops'].items():
+            bs = b.get('ops', {}).get(op)
+            if bs is None:
+                continue
+            for key in COMPARED:
+                if key != 'p50' and min(s.get('samples', 0), bs.get('samples', 0)) < MIN_SAMPLES:
+                    continue
+                check(test, '%s %s' % (op, key), bs.get(key), s.get(key), min_delta)
+    return regressions
+
+
+def report(results, out=None):
+    out = out if out is not None else sys.stdout
+    for test, r in results.items():
+        out.write('\n%s (%s): %0.1f ms per run, import %0.1f ms, peak memory %s\n' %
+                  (test, r['script'], r['wall'], r['import'],
+                   '%0.1f MB' % r['memory'] if r['memory'] is not None else 'n/a'))
+        out.write('  %-32s %8s %10s %10s %9s %9s %9s %9s\n' %
+                  ('operation', 'calls', 'total ms', 'calls/s', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        for op, s in sorted(r['ops'].items(), key=lambda item: item[1]['total'], reverse=True):
+            out.write('  %-32s %8.1f %10.2f %10.1f %9.4f %9.4f %9.4f %9.4f\n' %
+                      (op, s['calls'], s['total'], s['throughput'] or 0., s['p50'], s['p95'], s['p99'], s['max']))
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the test scripts against the simulated rig')
+    parser.add_argument('suite', nargs='?', default=None,
+                        help='suite (.ste) whose members are benchmarked (default %s)' % DEFAULT_SUITE)
+    parser.add_argument('-n', '--repeat', type=int, default=3, help='runs per test (default %(default)s)')
+    parser.add_argument('-o', '--output', default=None, help='benchmark directory (default a temporary one)')
+    parser.add_argument('--latency', type=float, default=None, help='simulated driver call latency (ms)')
+    parser.add_argument('--sample-interval', type=float, default=None,
+                        help='enable the background capture at this DAS sample interval (ms)')
+    parser.add_argument('-p', '--param', action='append', default=[], metavar='NAME=VALUE',
+                        help='parameter override, e.g. dataset.mode=Binary')
+    parser.add_argument('--save', default=None, help='write the results to this JSON file (e.g. as a baseline)')
+    parser.add_argument('--baseline', default=None, help='compare the results with this baseline JSON file')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='regression threshold as a fraction of the baseline (default %(default)s)')
+    parser.add_argument('--child', nargs=3, metavar=('SCRIPT', 'CONFIG', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+
+    if args.child:
+        return run_child(*args.child)
+
+    suite_file = args.suite
+    if suite_file is None:
+        svp_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        suite_file = os.path.join(svp_dir, DEFAULT_SUITE)
+    suite = svp_suite.compile_suite(suite_file)
+
+    overrides = OrderedDict()
+    if args.latency is not None:
+        overrides['sim.latency'] = svp_suite.Param('sim.latency', 'float', args.latency)
+    if args.sample_interval is not None:
+        overrides['capture.mode'] = svp_suite.Param('capture.mode', 'string', 'Enabled')
+        overrides['capture.sample_interval'] = svp_suite.Param('capture.sample_interval', 'float',
+                                                               args.sample_interval)
+    for item in args.param:
+        if '=' not in item:
+            parser.error('--param expects NAME=VALUE, not %s' % item)
+        name, value = item.split('=', 1)
+        try:
+            float(value)
+            overrides[name] = svp_suite.Param(name, 'float', float(value))
+        except ValueError:
+            overrides[name] = svp_suite.Param(name, 'string', value)
+
+    out_dir = args.output
+    temporary = out_dir is None
+    if temporary:
+        out_dir = tempfile.mkdtemp(prefix='svpbench_')
+    try:
+        results = Benchmark(suite, out_dir, repeat=args.repeat, overrides=overrides).run()
+    finally:
+        if temporary:
+            shutil.rmtree(out_dir, ignore_errors=True)
+    report(results)
+
+    if args.save:
+        f = open(args.save, 'w')
+        try:
+            json.dump({'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'repeat': args.repeat,
+                       'params': dict([(p.name, p.value) for p in overrides.values()]), 'results': results},
+                      f, indent=2)
+        finally:
+            f.close()
+
+    if args.baseline:
+        f = open(args.baseline)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        params = dict([(p.name, p.value) for p in overrides.values()])
+        if baseline.get('params', {}) != params:
+            sys.stdout.write('\nWarning: the baseline was run with different parameters (%s)\n' %
+                             baseline.get('params'))
+        regressions = compare(results, baseline.get('results', {}), threshold=args.threshold)
+        if regressions:
+            sys.stdout.write('\n%d regression(s) against %s:\n' % (len(regressions), args.baseline))
+            for test, metric, old, new, ratio in regressions:
+                sys.stdout.write('  %-16s %-40s %10.4f -> %10.4f (x%0.2f)\n' % (test, metric, old, new, ratio))
+            return 1
+        sys.stdout.write('\nNo regressions against %s\n' % args.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import json
+import struct
+import time
+import numpy as np
+
+SUFFIX = '.svpcap'
+MAGIC = 'SVPCAP01'
+VERSION = 1
+DTYPE = '<f8'
+
+# samples buffered by the writer before they are appended to the file
+FLUSH_RECORDS = 1000
+# rows per block when a capture file is read sequentially
+BLOCK_RECORDS = 65536
+
+
+class CaptureFileError(Exception):
+    pass
+
+
+class CaptureWriter(object):
+    """
+    Append-only binary capture file, written as samples arrive.
+
+    The file starts with a header giving the channel map, followed by fixed-width records of one little-endian
+    float64 per channel. The record count is not stored: it follows from the file size, so a file cut short by
+    a crash is still readable up to its last complete record. Missing values are stored as NaN.
+    """
+
+    def __init__(self, filename, points, flush_records=FLUSH_RECORDS, meta=None):
+        self.filename = filename
+        self.points = list(points)
+        self.index = dict([(p, i) for i, p in enumerate(self.points)])
+        self.flush_records = int(flush_records)
+        self._pending = []
+        self._len = 0
+        header = {'version': VERSION, 'channels': self.points, 'dtype': DTYPE, 'created': time.time()}
+        if meta:
+            header['meta'] = meta
+        text = json.dumps(header)
+        # pad so the records start on an 8-byte boundary
+        size = len(MAGIC) + 4 + len(text)
+        text += ' ' * (-size % 8)
+        self.file = open(filename, 'wb')
+        self.file.write(MAGIC + struct.pack('<I', len(text)) + text)
+
+    def __len__(self):
+        return self._len
+
+    def append(self, values):
+        """
+        Append one sample given as a sequence ordered like points, or a dict keyed by point name.
+        """
+        if isinstance(values, dict):
+            values = [values.get(p) for p in self.points]
+        elif len(values) != len(self.points):
+            raise CaptureFileError('Sample has %d values, capture has %d channels' % (len(values), len(self.points)))
+        self._pending.append([np.nan if v is None else v for v in values])
+        self._len += 1
+        if len(self._pending) >= self.flush_records:
+            self.flush()
+
+    def extend(self, columns):
+        """
+        Append a block of samples given as one array per point, ordered like points.
+        """
+        if len(columns) != len(self.points):
+            raise CaptureFileError('Block has %d columns, capture has %d channels' % (len(columns), len(self.points)))
+        self.flush()
+        block = np.column_stack([np.asarray(c, dtype=np.float64) for c in columns]).astype(DTYPE)
+        block.tofile(self.file)
+        self._len += len(block)
+
+    def flush(self):
+        if self._pending:
+            np.array(self._pending, dtype=DTYPE).tofile(self.file)
+            self._pending = []
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def read_header(filename):
+    """
+    Return the header dict of a capture file and the offset of its first record.
+    """
+    f = open(filename, 'rb')
+    try:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise CaptureFileError('%s is not a capture file' % filename)
+        length = struct.unpack('<I', f.read(4))[0]
+        header = json.loads(f.read(length))
+    finally:
+        f.close()
+    if header.get('version', 0) > VERSION:
+        raise CaptureFileError('%s has unsupported capture file version %s' % (filename, header.get('version')))
+    return header, len(MAGIC) + 4 + length
+
+
+class CaptureFile(object):
+    """
+    Capture file opened through numpy.memmap. Only the pages that are accessed are read, so a recording larger
+    than memory can be analysed a channel or a block at a time. Columns are strided views of the file; with
+    mode 'r+' an existing channel can be rewritten in place (e.g. a derived soft channel).
+    """
+
+    def __init__(self, filename, mode='r'):
+        self.filename = filename
+        self.header, self.offset = read_header(filename)
+        self.points = [str(p) for p in self.header['channels']]
+        self.index = dict([(p, i) for i, p in enumerate(self.points)])
+        record_size = np.dtype(DTYPE).itemsize * len(self.points)
+        count = (os.path.getsize(filename) - self.offset) // record_size if record_size else 0
+        if count > 0:
+            self.data = np.memmap(filename, dtype=DTYPE, mode=mode, offset=self.offset,
+                                  shape=(count, len(self.points)))
+        else:
+            self.data = np.empty((0, len(self.points)), dtype=DTYPE)
+
+    def __len__(self):
+        return len(self.data)
+
+    def column(self, name):
+        if name not in self.index:
+            raise CaptureFileError('No channel %s in %s' % (name, self.filename))
+        return self.data[:, self.index[name]]
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def set_column(self, name, values):
+        """
+        Rewrite a channel in place. The channel map of a capture file is fixed, so the channel must exist.
+        """
+        if name not in self.index:
+            raise CaptureFileError('Cannot add channel %s to capture file %s' % (name, self.filename))
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) != len(self.data):
+            raise CaptureFileError('Column %s has %d values, capture has %d samples' %
+                                   (name, len(values), len(self.data)))
+        i = self.index[name]
+        for start in range(0, len(values), BLOCK_RECORDS):
+            self.data[start:start + BLOCK_RECORDS, i] = values[start:start + BLOCK_RECORDS]
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+
+    def blocks(self, size=BLOCK_RECORDS):
+        """
+        Iterate over the data one block of rows at a time as 2-D arrays (rows x points).
+        """
+        for start in range(0, len(self.data), size):
+            yield self.data[start:start + size]
+
+    def to_csv(self, filename, fmt='%.10g'):
+        """
+        Export to CSV in the svpelab dataset layout, streaming one block at a time.
+        """
+        f = open(filename, 'w')
+        try:
+            f.write('%s\n' % ', '.join(self.points))
+            for block in self.blocks():
+                np.savetxt(f, block, fmt=fmt, delimiter=', ')
+        finally:
+            f.close()
+
+    def close(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+        # drop the mapping so the file can be moved or deleted (required on Windows)
+        self.data = np.empty((0, len(self.points)), dtype=DTYPE)
+
+
+def write(filename, ds, meta=None):
+    """
+    Write a dataset with points and column(name) (e.g. svptools.dataset.ColumnarDataset) to a capture file.
+    """
+    writer = CaptureWriter(filename, ds.points, meta=meta)
+    try:
+        if len(ds):
+            writer.extend([ds.column(p) for p in ds.points])
+    finally:
+        writer.close()
+    return CaptureFile(filename)
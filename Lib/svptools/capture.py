@@ -0,0 +1,261 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import threading
+import numpy as np
+from svptools import capfile
+from svptools import channels as svp_channels
+from svptools import clock
+from svptools import dataset
+
+CAPTURE_DEFAULT_ID = 'capture'
+
+
+class CaptureError(Exception):
+    pass
+
+
+def params(info, group_name=CAPTURE_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Background Capture Parameters', glob=True)
+    info.param(gname('mode'), label='Background Capture', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('buffer_time'), label='Buffer Length (s)', default=600.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('sample_interval'), label='Sample Interval (ms), 0 = DAS interval', default=0,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+class RingBuffer(object):
+    """
+    Fixed-size, preallocated sample buffer. Each row is one sample and each column one channel. Samples are
+    addressed by their absolute index (the number of samples written before them) so indices remain valid as
+    the buffer wraps, until the sample is overwritten.
+    """
+
+    def __init__(self, channels, capacity, dtype=np.float64):
+        self.channels = list(channels)
+        self.index = dict([(c, i) for i, c in enumerate(self.channels)])
+        self.capacity = int(capacity)
+        if self.capacity <= 0:
+            raise CaptureError('Ring buffer capacity must be positive: %s' % capacity)
+        self.data = np.full((self.capacity, len(self.channels)), np.nan, dtype=dtype)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def append(self, values):
+        with self.lock:
+            self.data[self.count % self.capacity] = values
+            self.count += 1
+
+    def append_dict(self, rec):
+        row = [rec.get(c) for c in self.channels]
+        self.append([np.nan if v is None else v for v in row])
+
+    def window(self, start=None, end=None):
+        """
+        Return the samples with absolute index start <= i < end. A view into the buffer is returned when the
+        window does not cross the wrap point, otherwise the two segments are joined into a copy.
+        """
+        with self.lock:
+            count = self.count
+        oldest = max(0, count - self.capacity)
+        if start is None or start < oldest:
+            start = oldest
+        if end is None or end > count:
+            end = count
+        if end <= start:
+            return self.data[0:0]
+        s = start % self.capacity
+        e = s + (end - start)
+        if e <= self.capacity:
+            return self.data[s:e]
+        return np.concatenate((self.data[s:], self.data[:e - self.capacity]))
+
+    def channel(self, name, start=None, end=None):
+        return self.window(start, end)[:, self.index[name]]
+
+    def latest(self):
+        """
+        Return the most recent sample as a dict. Channels without a value in that sample are omitted.
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            row = self.data[(self.count - 1) % self.capacity].tolist()
+        return dict([(c, v) for c, v in zip(self.channels, row) if not np.isnan(v)])
+
+
+def channel_order(points):
+    """
+    Return the points of a DAS channel map in dataset column order: as given, with TIME first.
+    """
+    points = list(points)
+    if 'TIME' in points:
+        points.remove('TIME')
+        points.insert(0, 'TIME')
+    return points
+
+
+class Capture(object):
+    """
+    Background acquisition worker that samples the DAS at a fixed interval into a RingBuffer so that the test
+    loop does not block on acquisition. The test loop marks step boundaries with tag() and reads the samples
+    since a boundary with since(). With record set, every sample is also kept in a ColumnarDataset that is
+    started afresh on each start(), or streamed to a binary capture file when start() is given one.
+
+    The columns follow the DAS channel map (TIME first), as in the svpelab dataset. The capture thread is the
+    only code that samples the DAS while it runs: start() stops the svpelab timed capture (data_capture()),
+    since DAS drivers are not safe to sample from two threads, so the recording must come from the capture.
+    """
+
+    def __init__(self, daq, capacity, interval, channels=None, record=False):
+        self.daq = daq
+        self.interval = float(interval)
+        self.capacity = int(capacity)
+        self.channels = channels
+        self.record = record
+        self.buffer = None
+        self.dataset = None
+        self.tags = []
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        if self.interval <= 0:
+            raise CaptureError('Capture sample interval must be positive: %s' % interval)
+
+    def _sample(self):
+        self.daq.data_sample()
+        return self.daq.data_capture_read()
+
+    def _append(self, rec):
+        self.buffer.append_dict(rec)
+        if self.dataset is not None:
+            self.dataset.append(rec)
+
+    def start(self, stream=None):
+        """
+        Start sampling. With record set and stream given, the samples are written to the capture file stream
+        (see svptools.capfile) as they arrive instead of being held in memory.
+        """
+        if self._thread is not None:
+            return
+        self.daq.data_capture(False)
+        rec = self._sample()
+        if self.buffer is None:
+            channels = self.channels
+            if channels is None:
+                channels = channel_order(svp_channels.channel_map(self.daq) or sorted(rec.keys()))
+            self.buffer = RingBuffer(channels, self.capacity)
+        if self.record and stream is not None:
+            self.dataset = capfile.CaptureWriter(stream, self.buffer.channels)
+        elif self.record:
+            self.dataset = dataset.ColumnarDataset(self.buffer.channels)
+        self._append(rec)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='svptools-capture')
+        self._thread.daemon = True
+        clock.start(self._thread)
+
+    def _run(self):
+        next_time = clock.now() + self.interval
+        while not self._stop.is_set():
+            delay = next_time - clock.now()
+            if delay > 0 and clock.wait(self._stop, delay):
+                break
+            try:
+                self._append(self._sample())
+            except Exception, e:
+                self.error = e
+                break
+            next_time += self.interval
+            # skip missed slots rather than bursting to catch up
+            now = clock.now()
+            if next_time < now:
+                next_time = now + self.interval
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            if isinstance(self.dataset, capfile.CaptureWriter):
+                # hand the recording back as a memory-mapped file
+                self.dataset.close()
+                self.dataset = capfile.CaptureFile(self.dataset.filename, mode='r+')
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise CaptureError('Background capture failed: %s' % error)
+
+    def tag(self, label):
+        """
+        Mark a step boundary at the next sample to be captured. Returns the absolute sample index.
+        """
+        index = self.buffer.count
+        self.tags.append((index, label))
+        return index
+
+    def since(self, index):
+        return self.buffer.window(index)
+
+    def latest(self):
+        return self.buffer.latest()
+
+    def source(self):
+        """
+        Return a reader for svptools.settle that reports the total W, VAr and PF of the latest buffered sample
+        (see channels.totals()).
+        """
+        def read():
+            rec = self.latest()
+            if rec is None:
+                return None
+            return svp_channels.totals(rec)
+        return read
+
+
+def capture_init(ts, daq, channels=None, record=False, group_name=CAPTURE_DEFAULT_ID):
+    """
+    Create a Capture object from the capture.* parameters, or None if background capture is disabled. The
+    sample interval defaults to the DAS sample interval.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Enabled' or daq is None:
+        return None
+    interval = ts.param_value(gname('sample_interval'))
+    if not interval:
+        interval = getattr(daq, 'sample_interval', None) or 1000
+    interval = float(interval)/1000.
+    capacity = int(ts.param_value(gname('buffer_time'))/interval) + 1
+    ts.log('Background capture: %d samples at %0.3f s interval' % (capacity, interval))
+    return Capture(daq, capacity, interval, channels=channels, record=record)
@@ -0,0 +1,207 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import re
+import numpy as np
+
+PHASE_POWER = re.compile(r'^AC_P_(\d+)$')
+
+
+class ChannelError(Exception):
+    pass
+
+
+def phases(points):
+    """
+    Return the number of AC phases in a DAS channel map, from the per-phase power channels (AC_P_1, AC_P_2, ...)
+    that it contains.
+    """
+    found = set()
+    for p in points:
+        m = PHASE_POWER.match(p)
+        if m:
+            found.add(int(m.group(1)))
+    n = 0
+    while n + 1 in found:
+        n += 1
+    return n
+
+
+def channel_map(daq):
+    """
+    Return the channel names of a DAS from its configuration, without taking a sample: the data points of an
+    svpelab DAS driver (data_points, or points), with its soft channels. Returns None if the driver exposes
+    neither.
+    """
+    points = getattr(daq, 'data_points', None) or getattr(daq, 'points', None)
+    if not points:
+        return None
+    return list(points) + [p for p in (getattr(daq, 'sc', None) or {}) if p not in points]
+
+
+def totals(rec):
+    """
+    Return the total W, VAr and PF of a single DAS sample (a dict of channel values) as {'W', 'VAr', 'PF'}, from
+    the per-phase channels. PF is signed as in standard(); it is None if the total cannot be computed, except on a
+    single-phase DAS without reactive power channels, where AC_PF_1 is used.
+    """
+    n = phases([p for p, v in rec.items() if v is not None])
+    w = sum([rec['AC_P_%d' % i] for i in range(1, n + 1)]) if n else None
+    var = None
+    if n and all([rec.get('AC_Q_%d' % i) is not None for i in range(1, n + 1)]):
+        var = sum([rec['AC_Q_%d' % i] for i in range(1, n + 1)])
+    pf = None
+    if w is not None and var is not None:
+        s = np.hypot(w, var)
+        if s > 0:
+            pf = (-1. if var < 0 else 1.) * abs(w)/s
+    elif n == 1:
+        pf = rec.get('AC_PF_1')
+    return {'W': w, 'VAr': var, 'PF': pf}
+
+
+class DerivedChannel(object):
+    """
+    Soft channel computed from measured channels. expr is a Python expression over channel names (and np) that
+    is evaluated on whole arrays at once, or on scalars for a single sample.
+    """
+
+    def __init__(self, name, expr):
+        self.name = name
+        self.expr = expr
+        try:
+            self.code = compile(expr, '<%s>' % name, 'eval')
+        except SyntaxError, e:
+            raise ChannelError('Invalid expression for %s: %s' % (name, e))
+        self.inputs = [n for n in self.code.co_names if n != 'np']
+
+
+class DerivedChannels(object):
+    """
+    Ordered set of derived channels. Later channels may use earlier ones.
+    """
+
+    def __init__(self, channels=None):
+        self.channels = list(channels) if channels is not None else []
+
+    def add(self, name, expr):
+        self.channels.append(DerivedChannel(name, expr))
+
+    def names(self):
+        return [c.name for c in self.channels]
+
+    def required(self, names=None):
+        """
+        Return the channels needed to compute names (all channels if None): the named channels and the derived
+        channels they use, in declaration order.
+        """
+        if names is None:
+            return list(self.channels)
+        needed = set(names)
+        for c in reversed(self.channels):
+            if c.name in needed:
+                needed.update(c.inputs)
+        return [c for c in self.channels if c.name in needed]
+
+    def evaluate(self, data, names=None):
+        """
+        Evaluate the channels over data, a dict of channel name -> value or array (a sample, a chunk or a whole
+        capture). Only names and the channels they depend on are computed. Returns a dict of derived channel
+        name -> value or array.
+        """
+        env = {'np': np, '__builtins__': {}}
+        env.update(data)
+        result = {}
+        for c in self.required(names):
+            try:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    value = eval(c.code, env)
+            except (NameError, TypeError), e:
+                # a channel missing from the data, or a sample value that is None
+                raise ChannelError('Cannot compute %s (%s): %s' % (c.name, c.expr, e))
+            env[c.name] = value
+            if names is None or c.name in names:
+                result[c.name] = value
+        return result
+
+    def apply(self, ds, names=None):
+        """
+        Compute the channels over a whole dataset in one vectorized pass and store them as dataset columns,
+        replacing soft channels of the same name. Works with svptools.dataset.ColumnarDataset and svpelab
+        datasets (points plus one list per point).
+        """
+        inputs = set()
+        for c in self.required(names):
+            inputs.update(c.inputs)
+        if hasattr(ds, 'column'):
+            data = dict([(p, ds.column(p)) for p in ds.points if p in inputs])
+        else:
+            data = dict([(p, np.asarray(ds.data[i], dtype=np.float64)) for i, p in enumerate(ds.points)
+                         if p in inputs])
+        result = self.evaluate(data, names)
+        length = len(list(data.values())[0]) if data else 0
+        for name in self.names():
+            if name not in result:
+                continue
+            values = np.broadcast_to(np.asarray(result[name], dtype=np.float64), (length,))
+            if hasattr(ds, 'set_column'):
+                ds.set_column(name, values)
+            elif name in ds.points:
+                ds.data[ds.points.index(name)] = list(values)
+            else:
+                ds.points.append(name)
+                ds.data.append(list(values))
+        return result
+
+
+def standard(points, v_nom=None, p_nom=None):
+    """
+    Declare the standard totals for a DAS channel map: W_TOTAL, VAR_TOTAL and PF from the per-phase channels,
+    plus W_PU and V_PU when the nominal values are given. The phase count comes from the channel map. PF is
+    signed like the per-phase PF channels: negative when the reactive power is negative.
+    """
+    points = list(points)
+    n = phases(points)
+    if n == 0:
+        raise ChannelError('No per-phase power channels (AC_P_n) in channel map')
+    derived = DerivedChannels()
+    derived.add('W_TOTAL', ' + '.join(['AC_P_%d' % i for i in range(1, n + 1)]))
+    if all(['AC_Q_%d' % i in points for i in range(1, n + 1)]):
+        derived.add('VAR_TOTAL', ' + '.join(['AC_Q_%d' % i for i in range(1, n + 1)]))
+        derived.add('PF', 'np.where(VAR_TOTAL < 0, -1., 1.) * np.abs(W_TOTAL)/np.sqrt(W_TOTAL**2 + VAR_TOTAL**2)')
+    if p_nom:
+        derived.add('W_PU', 'W_TOTAL/%r' % float(p_nom))
+    if v_nom and all(['AC_VRMS_%d' % i in points for i in range(1, n + 1)]):
+        v_sum = ' + '.join(['AC_VRMS_%d' % i for i in range(1, n + 1)])
+        derived.add('V_PU', '(%s)/%r' % (v_sum, float(n * v_nom)))
+    return derived
@@ -0,0 +1,303 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+
+CHECKPOINT_DEFAULT_ID = 'checkpoint'
+
+CHECKPOINT_DIR = os.path.join(os.path.expanduser('~'), '.svptools', 'checkpoints')
+
+# a checkpoint not updated for longer than this (hours) is from a run that was abandoned, not interrupted
+MAX_AGE = 24.
+
+# parameter groups that change how a test runs but not what it measures; a checkpoint stays valid across them
+IGNORE_GROUPS = ['checkpoint', 'session', 'trace', 'deviceio', 'workbook']
+
+
+class CheckpointError(Exception):
+    pass
+
+
+def params(info, group_name=CHECKPOINT_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Checkpoint Parameters', glob=True)
+    info.param(gname('mode'), label='Resume From Checkpoint', default='Disabled',
+               values=['Enabled', 'Restart', 'Disabled'])
+    info.param(gname('dir'), label='Checkpoint Directory (blank for default)', default='',
+               active=gname('mode'), active_value=['Enabled', 'Restart'])
+    info.param(gname('max_age'), label='Maximum Checkpoint Age (h)', default=MAX_AGE,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def config_fingerprint(ts):
+    """
+    Fingerprint of the test parameters that affect the measurements, or None if the parameters are not available.
+    """
+    params = getattr(ts, 'params', None)
+    if not isinstance(params, dict):
+        return None
+    values = sorted([(k, str(v)) for k, v in params.items() if k.split('.')[0] not in IGNORE_GROUPS])
+    return hashlib.sha1(json.dumps(values)).hexdigest()
+
+
+def identity(euts):
+    """
+    [serial number, firmware version] of each EUT, None for what an EUT does not report.
+    """
+    ids = []
+    for eut in euts:
+        info = eut.info() if eut is not None else None
+        if not isinstance(info, dict):
+            info = {}
+        serial = info.get('SerialNumber')
+        version = info.get('Version')
+        ids.append([str(serial) if serial else None, str(version) if version else None])
+    return ids
+
+
+def point_key(point):
+    if not isinstance(point, (list, tuple)):
+        point = (point,)
+    return '/'.join([str(p) for p in point])
+
+
+def _json_value(value):
+    # NumPy scalars (e.g. measurements) are stored as plain numbers so restored rows format like fresh ones
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except (AttributeError, OSError):
+        return os.path.abspath(a) == os.path.abspath(b)
+
+
+def _copy(src, dst):
+    if os.path.exists(dst):
+        if _same_file(src, dst):
+            return
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except (AttributeError, OSError):
+        shutil.copy2(src, dst)
+
+
+class Checkpoint(object):
+    """
+    Record of the completed points of a test, so a rerun after a crash or a lost connection resumes where the
+    last run stopped instead of starting over.
+
+    A point is a tuple such as (loop, setpoint). For each completed point the checkpoint keeps the result summary
+    rows written for it and copies of the data files it saved, in <dir>/<test>.json and <dir>/<test>/. A rerun of
+    the same test with the same parameters on the same EUT(s) (serial number and firmware version) skips the
+    completed points and restores their rows and files. A checkpoint from a different configuration or EUT, or
+    one that has not been updated for more than max_age hours, is discarded. complete() removes the checkpoint
+    once the test has run to the end. A disabled checkpoint has no completed points and records nothing.
+    """
+
+    def __init__(self, ts, path=None, fingerprint=None, euts=None, max_age=MAX_AGE, enabled=True):
+        self.ts = ts
+        self.path = path
+        self.fingerprint = fingerprint
+        self.euts = euts
+        self.max_age = float(max_age) if max_age else None
+        self.enabled = enabled and path is not None
+        self.data_dir = os.path.splitext(path)[0] if path is not None else None
+        self.points = {}
+        self.restored = 0
+        self.lock = threading.Lock()
+
+    def load(self):
+        """
+        Load the checkpoint left by an earlier run, if it is consistent with this one. Returns the number of
+        completed points.
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return 0
+        try:
+            f = open(self.path)
+            try:
+                state = json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError), e:
+            self.ts.log_warning('Unable to read checkpoint %s, starting over: %s' % (self.path, e))
+            self.discard()
+            return 0
+        if state.get('fingerprint') != self.fingerprint:
+            self.ts.log_warning('Checkpoint %s was made with different test parameters, starting over' % self.path)
+            self.discard()
+            return 0
+        if state.get('euts') != self.euts:
+            self.ts.log_warning('Checkpoint %s was made with a different EUT or firmware (%s, now %s), '
+                                'starting over' % (self.path, state.get('euts'), self.euts))
+            self.discard()
+            return 0
+        age = (time.time() - float(state.get('updated', 0)))/3600.
+        if self.max_age is not None and age > self.max_age:
+            self.ts.log_warning('Checkpoint %s was last updated %0.1f hours ago (maximum %0.1f), starting over' %
+                                (self.path, age, self.max_age))
+            self.discard()
+            return 0
+        self.points = state.get('points', {})
+        if self.points:
+            self.ts.log('Resuming from checkpoint %s, last updated %s (%0.1f hours ago) with EUT %s: '
+                        '%d points already completed: %s' %
+                        (self.path, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(float(state['updated']))),
+                         age, ', '.join(['%s (firmware %s)' % tuple(e) for e in self.euts]), len(self.points),
+                         ', '.join(sorted(self.points.keys()))))
+        return len(self.points)
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        state = {'test': self.ts.config_name(), 'fingerprint': self.fingerprint, 'euts': self.euts,
+                 'updated': time.time(), 'points': self.points}
+        tmp = self.path + '.tmp'
+        f = open(tmp, 'w')
+        try:
+            json.dump(state, f, indent=2, sort_keys=True, default=_json_value)
+        finally:
+            f.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp, self.path)
+
+    def done(self, *point):
+        return point_key(point) in self.points
+
+    def record(self, point, rows=None, files=None, registered=None):
+        """
+        Mark a point completed.
+
+        :param rows: result summary rows written for the point.
+        :param files: names of the result files saved for the point, copied into the checkpoint.
+        :param registered: dict of result file name -> plot parameters for the files registered with the test.
+        """
+        if not self.enabled:
+            return
+        files = list(files or [])
+        with self.lock:
+            try:
+                if files and not os.path.exists(self.data_dir):
+                    os.makedirs(self.data_dir)
+                for name in files:
+                    _copy(self.ts.result_file_path(name), os.path.join(self.data_dir, name))
+                self.points[point_key(point)] = {'rows': list(rows or []), 'files': files,
+                                                 'registered': dict(registered or {})}
+                self.save()
+            except (IOError, OSError), e:
+                # the test itself is unaffected, it just cannot be resumed from this point
+                self.ts.log_warning('Unable to save checkpoint %s: %s' % (self.path, e))
+
+    def restore(self, *point):
+        """
+        Copy the files of a completed point back into the result directory, register them with the test and
+        return the point's result summary rows.
+        """
+        entry = self.points.get(point_key(point))
+        if entry is None:
+            raise CheckpointError('Point %s is not in checkpoint %s' % (point_key(point), self.path))
+        for name in entry.get('files', []):
+            src = os.path.join(self.data_dir, name)
+            if not os.path.exists(src):
+                raise CheckpointError('Checkpoint file %s is missing' % src)
+            _copy(src, self.ts.result_file_path(name))
+        for name, plot_params in entry.get('registered', {}).items():
+            self.ts.result_file(name, params=plot_params or None)
+        self.ts.log('Restored point %s from checkpoint: %d row(s)%s' %
+                    (point_key(point), len(entry.get('rows', [])),
+                     ', files ' + ', '.join(entry['files']) if entry.get('files') else ''))
+        self.restored += 1
+        return entry.get('rows', [])
+
+    def discard(self):
+        self.points = {}
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        if self.data_dir is not None and os.path.exists(self.data_dir):
+            shutil.rmtree(self.data_dir, ignore_errors=True)
+
+    def complete(self):
+        """
+        Remove the checkpoint once every point of the test has been run.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            try:
+                self.discard()
+            except (IOError, OSError), e:
+                self.ts.log_warning('Unable to remove checkpoint %s: %s' % (self.path, e))
+        if self.restored:
+            self.ts.log('%d points were restored from the checkpoint' % self.restored)
+
+
+def result_files(ts, name):
+    """
+    Names of the result files saved under a dataset name (<name>.csv, <name>.svpcap, ... and their sidecars).
+    """
+    directory = os.path.dirname(ts.result_file_path(name))
+    return sorted([f for f in os.listdir(directory or '.') if f.startswith(name + '.')])
+
+
+def checkpoint_init(ts, euts, group_name=CHECKPOINT_DEFAULT_ID):
+    """
+    Create the checkpoint of a test from the checkpoint.* parameters and load the points completed by an earlier
+    run of it. euts is the EUT handle, or a list of them, whose serial numbers and firmware versions the
+    checkpoint must match. In the Restart mode an existing checkpoint is discarded and the test starts over.
+    """
+    gname = lambda name: group_name + '.' + name
+    mode = ts.param_value(gname('mode'))
+    if mode not in ['Enabled', 'Restart']:
+        return Checkpoint(ts, enabled=False)
+    if not isinstance(euts, (list, tuple)):
+        euts = [euts]
+    directory = ts.param_value(gname('dir')) or CHECKPOINT_DIR
+    cp = Checkpoint(ts, os.path.join(directory, ts.config_name() + '.json'), fingerprint=config_fingerprint(ts),
+                    euts=identity(euts), max_age=ts.param_value(gname('max_age')))
+    if mode == 'Restart':
+        cp.discard()
+    else:
+        cp.load()
+    return cp
@@ -0,0 +1,162 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import time
+import threading
+
+# how often a background thread waiting on virtual time re-checks its stop event (real seconds)
+VIRTUAL_POLL = 0.01
+# longest a virtual sleep waits (real seconds) for a released background thread to wait again
+WAITER_TIMEOUT = 5.
+
+
+class Clock(object):
+    """
+    Wall clock. Test code asks this module for the time, and background threads wait through it, so that a
+    virtual clock can be substituted for simulated runs.
+    """
+
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        """
+        Wait until event is set or timeout seconds have passed. Returns True if the event is set.
+        """
+        return event.wait(timeout) or event.is_set()
+
+    def start(self, thread):
+        """
+        Start a background thread that waits through this clock.
+        """
+        thread.start()
+
+
+class VirtualClock(Clock):
+    """
+    Clock that only advances when the test sleeps, for simulated runs. sleep() returns immediately after moving
+    the time forward.
+
+    Background threads that wait on the clock (capture, trajectories) are kept in step with it: sleep() advances
+    to each deadline they are waiting for in turn and lets the thread run until it waits again, so work
+    scheduled for a given virtual time happens before the test moves past it. Threads must be started with
+    start(), which counts them as waiting at the current time until their first wait.
+    """
+
+    virtual = True
+
+    def __init__(self, start=None):
+        self.now = float(start) if start is not None else time.time()
+        self.cond = threading.Condition()
+        # thread -> virtual time it is waiting for, or has just been released at
+        self.waiters = {}
+
+    def time(self):
+        return self.now
+
+    def _due(self, until):
+        due = []
+        for t, deadline in self.waiters.items():
+            if not t.is_alive():
+                del self.waiters[t]
+            elif deadline <= until:
+                due.append(deadline)
+        return due
+
+    def sleep(self, seconds):
+        if seconds <= 0:
+            return
+        target = self.now + seconds
+        with self.cond:
+            while True:
+                due = self._due(target)
+                self.now = max(self.now, min(due) if due else target)
+                self.cond.notify_all()
+                if not due:
+                    break
+                # let the released threads run until they wait again or exit
+                limit = time.time() + WAITER_TIMEOUT
+                while self._due(self.now) and time.time() < limit:
+                    self.cond.wait(VIRTUAL_POLL)
+                if time.time() >= limit:
+                    break
+
+    def start(self, thread):
+        thread.start()
+        with self.cond:
+            # a thread that already waited keeps its deadline; one that is still starting up holds the next
+            # sleep() at the current time until it waits, so it cannot miss the time the test moves past
+            self.waiters.setdefault(thread, self.now)
+
+    def wait(self, event, timeout):
+        me = threading.current_thread()
+        with self.cond:
+            deadline = self.now + timeout
+            self.waiters[me] = deadline
+            self.cond.notify_all()
+            while self.now < deadline and not event.is_set():
+                self.cond.wait(VIRTUAL_POLL)
+            if event.is_set():
+                self.waiters.pop(me, None)
+        return event.is_set()
+
+
+clock = Clock()
+
+
+def use(new_clock):
+    global clock
+    clock = new_clock
+    return clock
+
+
+def now():
+    return clock.time()
+
+
+def wait(event, timeout):
+    return clock.wait(event, timeout)
+
+
+def start(thread):
+    clock.start(thread)
+
+
+def is_virtual():
+    return clock.virtual
@@ -0,0 +1,158 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import numpy as np
+
+CONFORMANCE_DEFAULT_ID = 'conformance'
+
+
+class ConformanceError(Exception):
+    pass
+
+
+def params(info, group_name=CONFORMANCE_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Curve Conformance Parameters', glob=True)
+    info.param(gname('mode'), label='Online Conformance Check', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('tol'), label='Curve Tolerance (% of rating)', default=10.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('pf_tol'), label='Power Factor Tolerance', default=0.02,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('max_failures'), label='Failures Before Fail-Fast', default=3,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('action'), label='Fail-Fast Action', default='Abort', values=['Abort', 'Skip'],
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def pf_offset(pf):
+    """
+    Map a signed power factor onto a continuous scale: the signed distance from unity, sign(pf) * (1 - |pf|).
+    Signed PF jumps from +1 to -1 at unity, so 1.0 and -0.999 are 2 apart but only 0.001 apart on this scale.
+    """
+    pf = np.asarray(pf, dtype=np.float64)
+    return np.sign(pf) * (1. - np.abs(pf))
+
+
+class Conformance(object):
+    """
+    Checks each settled measurement of a sweep against the commanded curve as it arrives.
+
+    The expected response is the commanded curve interpolated at the setpoint (or the setpoint itself when no
+    curve is given, e.g. a PF target), and a measurement conforms when it is within tol of it. With pf set,
+    setpoints and measurements are signed power factors compared by their distance from unity (pf_offset()). Once
+    max_failures points have been out of tolerance since the last reset(), check() raises ConformanceError
+    (action 'Abort') or returns False so the caller can skip the rest of the sweep (action 'Skip').
+    """
+
+    def __init__(self, curve_x=None, curve_y=None, tol=10., max_failures=3, action='Abort', name='curve',
+                 pf=False):
+        if (curve_x is None) != (curve_y is None):
+            raise ConformanceError('Both curve x and y points are required')
+        self.curve_x = np.asarray(curve_x, dtype=np.float64) if curve_x is not None else None
+        self.curve_y = np.asarray(curve_y, dtype=np.float64) if curve_y is not None else None
+        self.tol = float(tol)
+        self.max_failures = int(max_failures)
+        self.action = action
+        self.name = name
+        self.pf = pf
+        self.results = []
+        self.failures = 0
+
+    def expected(self, x):
+        if self.curve_x is None:
+            return np.asarray(x, dtype=np.float64)
+        return np.interp(x, self.curve_x, self.curve_y)
+
+    def envelope(self, x):
+        """
+        Return the expected response and its lower and upper limits for an array of setpoints.
+        """
+        expected = self.expected(np.asarray(x, dtype=np.float64))
+        return expected, expected - self.tol, expected + self.tol
+
+    def check_many(self, x, y):
+        """
+        Vectorized check of arrays of setpoints and measurements. Returns a boolean array, True where the
+        measurement conforms. Missing measurements (NaN) conform.
+        """
+        y = np.asarray(y, dtype=np.float64)
+        expected, lower, upper = self.envelope(x)
+        if self.pf:
+            expected = pf_offset(expected)
+            lower, upper = expected - self.tol, expected + self.tol
+            y = pf_offset(y)
+        with np.errstate(invalid='ignore'):
+            return np.isnan(y) | ((y >= lower) & (y <= upper))
+
+    def check(self, x, y):
+        if y is None:
+            return True
+        expected = float(self.expected(x))
+        if self.pf:
+            ok = abs(float(pf_offset(y) - pf_offset(expected))) <= self.tol
+        else:
+            ok = abs(y - expected) <= self.tol
+        self.results.append((x, y, expected, ok))
+        if not ok:
+            self.failures += 1
+            if self.failures >= self.max_failures:
+                msg = ('%s conformance failed at %d points, last at %s: measured %0.3f, expected %0.3f +/- %0.3f' %
+                       (self.name, self.failures, x, y, expected, self.tol))
+                if self.action == 'Abort':
+                    raise ConformanceError(msg)
+                return False
+        return True
+
+    def reset(self):
+        """
+        Restart the failure count, e.g. at the start of the next sweep of a multi-sweep test.
+        """
+        self.failures = 0
+
+    def passed(self):
+        return all([ok for x, y, expected, ok in self.results])
+
+
+def conformance_init(ts, curve_x=None, curve_y=None, tol=None, name='curve', group_name=CONFORMANCE_DEFAULT_ID):
+    """
+    Create a Conformance checker from the conformance.* parameters, or None if the check is disabled. The
+    tolerance defaults to conformance.tol for curves and conformance.pf_tol for PF targets, which are compared as
+    signed power factors.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Enabled':
+        return None
+    if tol is None:
+        tol = ts.param_value(gname('tol')) if curve_x is not None else ts.param_value(gname('pf_tol'))
+    return Conformance(curve_x, curve_y, tol=tol, max_failures=ts.param_value(gname('max_failures')),
+                       action=ts.param_value(gname('action')), name=name, pf=curve_x is None)
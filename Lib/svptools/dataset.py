@@ -0,0 +1,253 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import numpy as np
+from svptools import capfile
+from svptools import workbook
+from svptools import trace
+
+DATASET_DEFAULT_ID = 'dataset'
+
+CHUNK_SIZE = 65536
+
+
+class DatasetError(Exception):
+    pass
+
+
+def params(info, group_name=DATASET_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Dataset Parameters', glob=True)
+    info.param(gname('mode'), label='Dataset Storage', default='DAS', values=['DAS', 'Columnar', 'Binary'])
+    info.param(gname('binary'), label='Binary Export', default='Disabled', values=['Disabled', 'NPZ'],
+               active=gname('mode'), active_value=['Columnar'])
+    info.param(gname('csv'), label='CSV Export', default='Enabled', values=['Enabled', 'Disabled'],
+               active=gname('mode'), active_value=['Binary'])
+
+
+class ColumnarDataset(object):
+    """
+    Dataset stored as one NumPy array per channel. Storage grows a chunk of rows at a time, so filled chunks are
+    never copied and memory is bounded by the data captured plus one chunk.
+
+    The CSV output has the same layout as the svpelab dataset (header of point names, one row per sample) so the
+    files load into the result workbook unchanged, but values are written with fmt and missing values as nan
+    rather than None.
+    """
+
+    def __init__(self, points, chunk_size=CHUNK_SIZE, dtype=np.float64):
+        self.points = list(points)
+        self.index = dict([(p, i) for i, p in enumerate(self.points)])
+        self.chunk_size = int(chunk_size)
+        self.dtype = dtype
+        self._chunks = [[] for p in self.points]
+        self._pos = self.chunk_size  # forces a new chunk on the first append
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _new_chunk(self):
+        for chunks in self._chunks:
+            chunks.append(np.empty(self.chunk_size, dtype=self.dtype))
+        self._pos = 0
+
+    def append(self, values):
+        """
+        Append one sample given as a sequence ordered like points, or a dict keyed by point name. Missing
+        values are stored as NaN.
+        """
+        if isinstance(values, dict):
+            values = [values.get(p) for p in self.points]
+        elif len(values) != len(self.points):
+            raise DatasetError('Sample has %d values, dataset has %d points' % (len(values), len(self.points)))
+        if self._pos >= self.chunk_size:
+            self._new_chunk()
+        pos = self._pos
+        for chunks, v in zip(self._chunks, values):
+            chunks[-1][pos] = np.nan if v is None else v
+        self._pos += 1
+        self._len += 1
+
+    def extend(self, columns):
+        """
+        Append a block of samples given as one array per point, ordered like points.
+        """
+        if len(columns) != len(self.points):
+            raise DatasetError('Block has %d columns, dataset has %d points' % (len(columns), len(self.points)))
+        columns = [np.asarray(c, dtype=self.dtype) for c in columns]
+        n = len(columns[0])
+        start = 0
+        while start < n:
+            if self._pos >= self.chunk_size:
+                self._new_chunk()
+            count = min(n - start, self.chunk_size - self._pos)
+            for chunks, c in zip(self._chunks, columns):
+                chunks[-1][self._pos:self._pos + count] = c[start:start + count]
+            self._pos += count
+            self._len += count
+            start += count
+
+    def _segments(self, i):
+        chunks = self._chunks[i]
+        for chunk in chunks[:-1]:
+            yield chunk
+        if chunks:
+            yield chunks[-1][:self._pos]
+
+    def column(self, name):
+        segments = list(self._segments(self.index[name]))
+        if not segments:
+            return np.empty(0, dtype=self.dtype)
+        if len(segments) == 1:
+            return segments[0]
+        return np.concatenate(segments)
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def set_column(self, name, values):
+        """
+        Replace the values of a point, or add it as a new point, from an array with one value per sample.
+        """
+        values = np.asarray(values, dtype=self.dtype)
+        if len(values) != self._len:
+            raise DatasetError('Column %s has %d values, dataset has %d samples' % (name, len(values), self._len))
+        chunks = []
+        for start in range(0, self._len, self.chunk_size):
+            chunk = np.empty(self.chunk_size, dtype=self.dtype)
+            count = min(self.chunk_size, self._len - start)
+            chunk[:count] = values[start:start + count]
+            chunks.append(chunk)
+        if name in self.index:
+            self._chunks[self.index[name]] = chunks
+        else:
+            self.index[name] = len(self.points)
+            self.points.append(name)
+            self._chunks.append(chunks)
+
+    def blocks(self):
+        """
+        Iterate over the data one chunk at a time as 2-D arrays (rows x points).
+        """
+        segments = [list(self._segments(i)) for i in range(len(self.points))]
+        for k in range(len(segments[0]) if segments else 0):
+            yield np.column_stack([s[k] for s in segments])
+
+    def to_csv(self, filename, fmt='%.10g'):
+        f = open(filename, 'w')
+        try:
+            f.write('%s\n' % ', '.join(self.points))
+            for block in self.blocks():
+                np.savetxt(f, block, fmt=fmt, delimiter=', ')
+        finally:
+            f.close()
+
+    def to_npz(self, filename):
+        # the point order is stored alongside the columns since npz members are unordered
+        columns = dict([(p, self.column(p)) for p in self.points])
+        np.savez(filename, _points=np.array(self.points), **columns)
+
+    @classmethod
+    def from_npz(cls, filename, chunk_size=CHUNK_SIZE):
+        data = np.load(filename)
+        points = [str(p) for p in data['_points']]
+        ds = cls(points, chunk_size=chunk_size)
+        ds.extend([data[p] for p in points])
+        return ds
+
+    @classmethod
+    def from_dataset(cls, ds, chunk_size=CHUNK_SIZE):
+        """
+        Convert an svpelab dataset (points plus one list per point) to a columnar dataset.
+        """
+        cds = cls(ds.points, chunk_size=chunk_size)
+        if ds.data and len(ds.data[0]) > 0:
+            cds.extend([[np.nan if v is None else v for v in col] for col in ds.data])
+        return cds
+
+
+def stream_path(ts, name, group_name=DATASET_DEFAULT_ID):
+    """
+    Return the path of the binary capture file that a recording named name should be streamed to, or None
+    unless the binary storage mode is selected.
+    """
+    if ts.param_value(group_name + '.mode') != 'Binary':
+        return None
+    return ts.result_file_path(name + capfile.SUFFIX)
+
+
+@trace.traced('dataset.save')
+def save(ts, ds, name, params=None, group_name=DATASET_DEFAULT_ID):
+    """
+    Write a dataset to the result directory and register it with the test. The plot parameters are also kept
+    for the svptools workbook builder.
+
+    In the columnar and DAS modes the dataset is written as <name>.csv, plus <name>.npz when binary export is
+    enabled; an svpelab dataset is converted to columnar form in the columnar mode. In the binary mode the
+    dataset is kept as the capture file <name>.svpcap (streamed there already when it came from a capture
+    started with stream_path()), and the CSV is exported from it block by block when CSV export is enabled.
+    Returns the name of the file registered.
+    """
+    gname = lambda name: group_name + '.' + name
+    mode = ts.param_value(gname('mode'))
+    if mode == 'Binary':
+        cap_filename = name + capfile.SUFFIX
+        if not isinstance(ds, capfile.CaptureFile):
+            if not isinstance(ds, ColumnarDataset):
+                ds = ColumnarDataset.from_dataset(ds)
+            ds = capfile.write(ts.result_file_path(cap_filename), ds)
+        try:
+            if ts.param_value(gname('csv')) != 'Enabled':
+                ts.result_file(cap_filename, params=params)
+                if params:
+                    workbook.write_plot_params(ts.result_file_path(cap_filename), params)
+                return cap_filename
+            filename = name + '.csv'
+            ds.to_csv(ts.result_file_path(filename))
+        finally:
+            ds.close()
+    else:
+        if mode == 'Columnar' and not isinstance(ds, ColumnarDataset):
+            ds = ColumnarDataset.from_dataset(ds)
+        filename = name + '.csv'
+        ds.to_csv(ts.result_file_path(filename))
+    ts.result_file(filename, params=params)
+    if params:
+        workbook.write_plot_params(ts.result_file_path(filename), params)
+    if mode == 'Columnar' and ts.param_value(gname('binary')) == 'NPZ':
+        # not registered as a result file so the workbook builder only sees the CSV
+        npz_filename = name + '.npz'
+        ds.to_npz(ts.result_file_path(npz_filename))
+        ts.log('Saving binary data capture: %s' % npz_filename)
+    return filename
@@ -0,0 +1,214 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import sys
+import Queue
+import threading
+
+DEVICEIO_DEFAULT_ID = 'deviceio'
+
+
+class DeviceIOError(Exception):
+    pass
+
+
+def params(info, group_name=DEVICEIO_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Device I/O Parameters', glob=True)
+    info.param(gname('mode'), label='Overlap Independent Device I/O', default='Disabled',
+               values=['Enabled', 'Disabled'])
+
+
+class Future(object):
+    """
+    Result of a device call that may still be running. result() waits for it and returns the value or raises
+    the call's exception with its original traceback.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self._done = threading.Event()
+        self._value = None
+        self._exc_info = None
+
+    def set_result(self, value):
+        self._value = value
+        self._done.set()
+
+    def set_exception(self, exc_info):
+        self._exc_info = exc_info
+        self._done.set()
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout) and not self._done.is_set():
+            raise DeviceIOError('Timed out waiting for %s' % (self.name or 'device call'))
+        if self._exc_info is not None:
+            raise self._exc_info[0], self._exc_info[1], self._exc_info[2]
+        return self._value
+
+
+def _run(future, func, args, kwargs):
+    try:
+        future.set_result(func(*args, **kwargs))
+    except Exception:
+        future.set_exception(sys.exc_info())
+
+
+def completed(func, *args, **kwargs):
+    """
+    Run func now in this thread and return its result as a completed Future (the synchronous facade).
+    """
+    future = Future(getattr(func, '__name__', None))
+    _run(future, func, args, kwargs)
+    return future
+
+
+class Worker(object):
+    """
+    Thread that runs the calls submitted to it one at a time, in submission order. Each device gets its own
+    worker: calls to one device never overlap (drivers are not thread-safe) while calls to different devices
+    do.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.queue = Queue.Queue()
+        self.thread = None
+
+    def submit(self, func, *args, **kwargs):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._loop, name=self.name)
+            self.thread.daemon = True
+            self.thread.start()
+        future = Future('%s.%s' % (self.name, getattr(func, '__name__', 'call')))
+        self.queue.put((future, func, args, kwargs))
+        return future
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            _run(*item)
+
+    def close(self):
+        if self.thread is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+
+
+class AsyncDevice(object):
+    """
+    Wrapper for a device handle whose method calls return Futures. With overlap enabled each device's calls run
+    on its own worker thread, so calls to different devices proceed concurrently and a step takes as long as
+    its slowest device; otherwise every call runs immediately and returns a completed Future, so the same step
+    code runs sequentially. Attributes that are not methods are read from the handle.
+    """
+
+    def __init__(self, handle, name, enabled=True):
+        self.handle = handle
+        self.name = name
+        self.worker = Worker(name) if enabled else None
+
+    def call(self, func, *args, **kwargs):
+        """
+        Run func (e.g. a function that makes several calls on this device) in the device's call order.
+        """
+        if self.worker is None:
+            return completed(func, *args, **kwargs)
+        return self.worker.submit(func, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self.handle, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.call(attr, *args, **kwargs)
+        return call
+
+    def close(self):
+        if self.worker is not None:
+            self.worker.close()
+
+
+def enabled(ts, group_name=DEVICEIO_DEFAULT_ID):
+    return ts.param_value(group_name + '.mode') == 'Enabled'
+
+
+def wrap(ts, handle, name, group_name=DEVICEIO_DEFAULT_ID):
+    """
+    Return an AsyncDevice for a handle, overlapping its calls with other devices if deviceio.mode is enabled.
+    """
+    if handle is None:
+        return None
+    return AsyncDevice(handle, name, enabled=enabled(ts, group_name))
+
+
+def background(ts, func, *args, **kwargs):
+    """
+    Start func on a thread of its own if deviceio.mode is enabled (otherwise run it now) and return its Future,
+    e.g. to open one device while others are being set up.
+    """
+    if not enabled(ts):
+        return completed(func, *args, **kwargs)
+    future = Future(getattr(func, '__name__', None))
+    t = threading.Thread(target=_run, args=(future, func, args, kwargs),
+                         name='deviceio-%s' % getattr(func, '__name__', 'call'))
+    t.daemon = True
+    t.start()
+    return future
+
+
+def gather(*futures, **kwargs):
+    """
+    Wait for all of the futures and return their results in order. If any call failed, its exception is raised
+    once every call has finished, so no device is left mid-transaction.
+    """
+    timeout = kwargs.get('timeout')
+    error = None
+    results = []
+    for f in futures:
+        try:
+            results.append(f.result(timeout))
+        except Exception:
+            results.append(None)
+            if error is None:
+                error = sys.exc_info()
+    if error is not None:
+        raise error[0], error[1], error[2]
+    return results
@@ -0,0 +1,285 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import imp
+import json
+import importlib
+import threading
+
+MANIFEST_FILE = os.path.join(os.path.expanduser('~'), '.svptools', 'driver_manifest.json')
+MANIFEST_VERSION = 1
+
+# svpelab device abstraction modules that the scripts use
+KINDS = ['das', 'der', 'gridsim', 'hil', 'pvsim']
+
+lock = threading.Lock()
+
+# kind -> signature of its driver files, computed once per process
+signatures = {}
+
+
+class DriverError(Exception):
+    pass
+
+
+# error classes of the device kinds, available without importing svpelab (e.g. on a simulated rig)
+class DASError(Exception):
+    pass
+
+
+class DERError(Exception):
+    pass
+
+
+class GridSimError(Exception):
+    pass
+
+
+class HILError(Exception):
+    pass
+
+
+class PVSimError(Exception):
+    pass
+
+
+def _str(value):
+    """
+    Undo the unicode conversion of json, so replayed parameters look exactly like the ones the driver declared.
+    """
+    if isinstance(value, unicode):
+        try:
+            return str(value)
+        except UnicodeEncodeError:
+            return value
+    if isinstance(value, list):
+        return [_str(v) for v in value]
+    if isinstance(value, dict):
+        return dict([(_str(k), _str(v)) for k, v in value.items()])
+    return value
+
+
+def package_dir():
+    """
+    Return the directory of the svpelab package without importing it, or None if it cannot be found.
+    """
+    try:
+        f, path, desc = imp.find_module('svpelab')
+    except ImportError:
+        return None
+    if f is not None:
+        f.close()
+    return path
+
+
+def signature(kind):
+    """
+    Return the name, size and modification time of the abstraction module of a kind and of all of its driver
+    modules (e.g. der.py, der_sim.py, der_sunspec.py), or None if svpelab is not found. Adding, removing or
+    editing a driver changes the signature and so invalidates the cached parameters of that kind.
+    """
+    sig = signatures.get(kind)
+    if sig is None:
+        path = package_dir()
+        if path is None:
+            return None
+        sig = []
+        for name in sorted(os.listdir(path)):
+            if name == kind + '.py' or (name.startswith(kind + '_') and name.endswith('.py')):
+                st = os.stat(os.path.join(path, name))
+                sig.append([name, st.st_size, int(st.st_mtime)])
+        signatures[kind] = sig
+    return sig
+
+
+def load(path):
+    try:
+        f = open(path)
+        try:
+            manifest = json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest
+
+
+def store(path, kind, sig, key, calls):
+    """
+    Merge the recorded parameter calls of one kind into the manifest, which may be shared by several processes.
+    """
+    with lock:
+        manifest = load(path)
+        manifest['version'] = MANIFEST_VERSION
+        drivers = manifest.setdefault('drivers', {})
+        entry = drivers.get(kind)
+        if entry is None or entry.get('signature') != sig:
+            entry = drivers[kind] = {'signature': sig, 'params': {}}
+        entry['params'][key] = calls
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp = path + '.%d.tmp' % os.getpid()
+        f = open(tmp, 'w')
+        try:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        finally:
+            f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+
+
+class Recorder(object):
+    """
+    Stands in for the script info while a driver module declares its parameters: every call (param_group(),
+    param(), param_add_value(), ...) is passed on to the info and recorded so it can be replayed later.
+    """
+
+    def __init__(self, info):
+        self.info = info
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self.info, name)
+
+        def call(*args, **kwargs):
+            self.calls.append([name, list(args), kwargs])
+            return method(*args, **kwargs)
+        return call
+
+
+class Driver(object):
+    """
+    Lazily imported svpelab device abstraction module (das, der, gridsim, hil, pvsim).
+
+    Importing an svpelab abstraction module imports every driver of that kind (e.g. all DER drivers), which
+    makes loading the scripts slow. A Driver only imports its module when it is actually used:
+
+    - params() replays the parameter declarations of the kind from a manifest cached on disk
+      (~/.svptools/driver_manifest.json), which is rebuilt from the module whenever one of its driver files
+      changes.
+    - <kind>_init() imports the module and calls its init function, so the device (including the disabled
+      device svpelab returns for the 'Disabled' mode) behaves exactly as with svpelab imported directly.
+    - The kind's error class (e.g. DERError) is the module's once it has been imported and the one defined
+      here before, so raising it never imports the driver.
+    - Any other attribute is read from the imported module.
+    """
+
+    def __init__(self, kind, error, manifest=MANIFEST_FILE):
+        self.kind = kind
+        self.error = error
+        self.manifest = manifest
+        self._module = None
+
+    def __repr__(self):
+        return '<%s driver%s>' % (self.kind, '' if self._module is not None else ' (not imported)')
+
+    def module(self):
+        if self._module is None:
+            self._module = importlib.import_module('svpelab.%s' % self.kind)
+        return self._module
+
+    def params(self, info, **kwargs):
+        key = json.dumps(kwargs, sort_keys=True, default=repr)
+        sig = signature(self.kind)
+        if sig is not None and self.manifest:
+            entry = load(self.manifest).get('drivers', {}).get(self.kind)
+            if entry is not None and entry.get('signature') == sig:
+                calls = entry.get('params', {}).get(key)
+                if calls is not None:
+                    for name, args, kw in calls:
+                        getattr(info, name)(*_str(args), **_str(kw))
+                    return
+        recorder = Recorder(info)
+        self.module().params(recorder, **kwargs)
+        if sig is None or not self.manifest:
+            return
+        try:
+            calls = json.loads(json.dumps(recorder.calls))
+        except (TypeError, ValueError):
+            # a parameter that cannot be stored as json (e.g. a callable), always ask the module
+            return
+        try:
+            store(self.manifest, self.kind, sig, key, calls)
+        except (IOError, OSError), e:
+            sys.stderr.write('Unable to update driver manifest %s: %s\n' % (self.manifest, e))
+
+    def init(self, ts, **kwargs):
+        return getattr(self.module(), '%s_init' % self.kind)(ts, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if name == '%s_init' % self.kind:
+            return self.init
+        if name == self.error.__name__:
+            return getattr(self._module, name, self.error) if self._module is not None else self.error
+        return getattr(self.module(), name)
+
+
+das = Driver('das', DASError)
+der = Driver('der', DERError)
+gridsim = Driver('gridsim', GridSimError)
+hil = Driver('hil', HILError)
+pvsim = Driver('pvsim', PVSimError)
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rebuild the cached svpelab driver parameter manifest')
+    parser.add_argument('--manifest', default=MANIFEST_FILE, help='manifest file (default %(default)s)')
+    parser.add_argument('scripts', nargs='+', help='test scripts whose driver parameters are cached')
+    args = parser.parse_args(args)
+
+    if os.path.exists(args.manifest):
+        os.remove(args.manifest)
+    for kind in KINDS:
+        globals()[kind].manifest = args.manifest
+    for path in args.scripts:
+        imp.load_source(os.path.splitext(os.path.basename(path))[0], path).script_info()
+        sys.stdout.write('%s\n' % path)
+    manifest = load(args.manifest)
+    for kind, entry in sorted(manifest.get('drivers', {}).items()):
+        sys.stdout.write('%s: %d file(s), %d parameter set(s)\n' % (kind, len(entry['signature']),
+                                                                    len(entry['params'])))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
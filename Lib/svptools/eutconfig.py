@@ -0,0 +1,242 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import json
+import hashlib
+import threading
+
+EUTCONFIG_DEFAULT_ID = 'eutconfig'
+
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.svptools', 'eut_config.json')
+
+# settings that differ by less than this (relative, or absolute near zero) are equal, allowing for register
+# scale factors
+TOLERANCE = 1e-3
+
+# functions written with a curve id as the first argument
+CURVE_FUNCTIONS = ['volt_var_curve', 'freq_watt_curve', 'volt_watt_curve']
+
+lock = threading.Lock()
+
+
+class EUTConfigError(Exception):
+    pass
+
+
+def params(info, group_name=EUTCONFIG_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='EUT Configuration Cache Parameters', glob=True)
+    info.param(gname('mode'), label='Write Changed Settings Only', default='Enabled', values=['Enabled', 'Disabled'])
+    info.param(gname('cache_file'), label='Cache File (blank for default)', default='',
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def fingerprint(settings):
+    return hashlib.sha1(json.dumps(settings, sort_keys=True, default=str)).hexdigest()
+
+
+def equal(a, b):
+    if isinstance(a, (list, tuple)) or isinstance(b, (list, tuple)):
+        if not isinstance(a, (list, tuple)) or not isinstance(b, (list, tuple)) or len(a) != len(b):
+            return False
+        return all([equal(x, y) for x, y in zip(a, b)])
+    try:
+        a = float(a)
+        b = float(b)
+    except (TypeError, ValueError):
+        return a == b
+    return abs(a - b) <= TOLERANCE * max(1., abs(a), abs(b))
+
+
+def diff(desired, state):
+    """
+    Return the desired settings that state does not already have.
+    """
+    if state is None:
+        return dict(desired)
+    return dict([(k, v) for k, v in desired.items() if not equal(state.get(k), v)])
+
+
+def load(path):
+    try:
+        f = open(path)
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return {}
+
+
+def store(path, serial, entries):
+    """
+    Merge the entries of one EUT into the cache file, which may be shared by several EUTs and processes.
+    """
+    with lock:
+        cache = load(path)
+        cache[serial] = entries
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        tmp = path + '.%d.tmp' % os.getpid()
+        f = open(tmp, 'w')
+        try:
+            json.dump(cache, f, indent=2, sort_keys=True, default=str)
+        finally:
+            f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp, path)
+
+
+class EUTConfig(object):
+    """
+    Writes DER function settings and curves, sending only what differs from the EUT's known state.
+
+    The known state of each function is what was last written to or read back from the EUT, cached per EUT
+    serial number together with a fingerprint of the settings last verified. apply() diffs the desired
+    settings against it, writes only the changed ones, and verifies them with one read of the function. If the
+    read shows that the EUT was changed behind the cache, the difference is written and verified again. With
+    no serial number (or path unset) the cache only lasts for the life of the object.
+    """
+
+    def __init__(self, ts, eut, path=None, enabled=True):
+        self.ts = ts
+        self.eut = eut
+        self.path = path
+        self.enabled = enabled
+        self.writes = 0
+        self.reads = 0
+        self.serial = None
+        self.entries = {}
+        if enabled:
+            info = eut.info()
+            serial = info.get('SerialNumber') if isinstance(info, dict) else None
+            if serial:
+                self.serial = str(serial)
+                if path is not None:
+                    self.entries = load(path).get(self.serial, {})
+
+    def _key(self, func, id):
+        return func if id is None else '%s.%s' % (func, id)
+
+    def _call(self, func, id, params=None):
+        method = getattr(self.eut, func)
+        if id is None:
+            return method(params=params) if params is not None else method()
+        return method(id, params=params) if params is not None else method(id)
+
+    def write(self, func, settings, id=None):
+        self._call(func, id, settings)
+        self.writes += 1
+
+    def read(self, func, id=None):
+        self.reads += 1
+        state = self._call(func, id)
+        return dict(state) if isinstance(state, dict) else None
+
+    def _remember(self, func, id, state, desired=None):
+        key = self._key(func, id)
+        entry = self.entries.get(key, {})
+        entry['state'] = dict(entry.get('state') or {}, **state)
+        if desired is not None:
+            entry['hash'] = fingerprint(desired)
+        else:
+            entry.pop('hash', None)
+        self.entries[key] = entry
+        if self.serial is not None and self.path is not None:
+            try:
+                store(self.path, self.serial, self.entries)
+            except (IOError, OSError), e:
+                self.ts.log_warning('Unable to save EUT configuration cache: %s' % e)
+
+    def apply(self, func, desired, id=None):
+        """
+        Bring a function (e.g. 'volt_var', or 'volt_var_curve' with its curve id) to the desired settings.
+        Returns the settings read back from the EUT.
+        """
+        if not self.enabled:
+            self.write(func, desired, id)
+            return self.read(func, id)
+
+        entry = self.entries.get(self._key(func, id), {})
+        state = entry.get('state')
+        fresh = False
+        if state is None:
+            state = self.read(func, id)
+            fresh = True
+        if entry.get('hash') == fingerprint(desired) and not fresh:
+            changes = {}
+        else:
+            changes = diff(desired, state)
+        if changes:
+            self.write(func, changes, id)
+        if changes or not fresh:
+            state = self.read(func, id)
+        if state is None:
+            # the driver cannot read this function back, so it cannot be verified or cached
+            if not changes:
+                self.write(func, desired, id)
+            return None
+        changes = diff(desired, state)
+        if changes:
+            self.ts.log_debug('EUT %s differs from the cached configuration, rewriting %s' %
+                              (self._key(func, id), sorted(changes.keys())))
+            self.write(func, changes, id)
+            state = self.read(func, id)
+            if diff(desired, state):
+                raise EUTConfigError('EUT %s readback %s does not match %s' % (self._key(func, id), state, desired))
+        self._remember(func, id, state, desired)
+        return state
+
+    def set(self, func, settings, id=None):
+        """
+        Write settings unconditionally without a readback (e.g. to disable a function on the way out), keeping
+        the cached state in step.
+        """
+        self.write(func, settings, id)
+        if self.enabled:
+            self._remember(func, id, settings)
+
+
+def eutconfig_init(ts, eut, group_name=EUTCONFIG_DEFAULT_ID):
+    """
+    Create the configuration writer for an EUT from the eutconfig.* parameters. When disabled every setting is
+    written and read back in full.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Enabled':
+        return EUTConfig(ts, eut, enabled=False)
+    path = ts.param_value(gname('cache_file')) or CACHE_FILE
+    return EUTConfig(ts, eut, path=path)
@@ -0,0 +1,92 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+from svptools import clock
+
+POINTS = ['W', 'VAr', 'PF', 'Hz', 'PhVphA', 'PhVphB', 'PhVphC']
+
+# measurements newer than this are served from the last read
+MAX_AGE = 0.05
+
+
+class Measurements(object):
+    """
+    Shared, short-lived cache of the EUT measurements.
+
+    The DER driver reads the whole inverter measurement block in one transaction per measurements() call,
+    and the scripts only use one or two points from it. The caller declares the points it needs once; all
+    get() calls within max_age seconds of a read are served from that read, so polling W, VAr and PF in
+    the same tick costs one round trip.
+
+    The object can be passed wherever an EUT is polled for measurements (e.g. svptools.settle.eut_source).
+    """
+
+    def __init__(self, eut, points=None, max_age=MAX_AGE):
+        self.eut = eut
+        self.points = list(points) if points is not None else list(POINTS)
+        self.max_age = float(max_age)
+        self.reads = 0
+        self._data = None
+        self._time = None
+
+    def read(self, force=False):
+        """
+        Return a dict of the declared points, reading the EUT if the cached values are older than max_age.
+        Returns None if the EUT does not report measurements.
+        """
+        now = clock.now()
+        if force or self._time is None or now - self._time > self.max_age:
+            m = self.eut.measurements()
+            self.reads += 1
+            self._time = clock.now()
+            if m is None:
+                self._data = None
+            else:
+                self._data = dict([(p, m.get(p)) for p in self.points])
+        return self._data
+
+    def measurements(self):
+        return self.read()
+
+    def get(self, point, force=False):
+        if point not in self.points:
+            # not declared up front; add it so following reads keep it
+            self.points.append(point)
+            force = True
+        data = self.read(force=force)
+        if data is None:
+            return None
+        return data.get(point)
+
+    def invalidate(self):
+        self._time = None
@@ -0,0 +1,122 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import threading
+from svptools import clock
+
+PARALLEL_DEFAULT_ID = 'parallel'
+
+# channels beyond the first use the device groups der_2, pvsim_2, ...
+MAX_CHANNELS = 4
+
+
+class ParallelError(Exception):
+    pass
+
+
+def params(info, group_name=PARALLEL_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Parallel Channel Parameters', glob=True)
+    info.param(gname('mode'), label='Parallel Channels', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('channels'), label='Number of Channels', default=2, values=range(2, MAX_CHANNELS + 1),
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('split'), label='Split Across Channels', default='Irradiance', values=['Irradiance', 'EUT'],
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def channel_count(ts, group_name=PARALLEL_DEFAULT_ID):
+    """
+    Return the number of device channels the test drives: parallel.channels if enabled, otherwise 1.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Enabled':
+        return 1
+    return int(ts.param_value(gname('channels')))
+
+
+def channel_kind(kind, channel):
+    """
+    Return the device group of a channel: the kind itself for channel 1, <kind>_<channel> for the others (the
+    svpelab convention for several devices of one kind, e.g. der_init(ts, id=2) reads the der_2.* parameters).
+    """
+    return kind if channel == 1 else '%s_%d' % (kind, channel)
+
+
+def channel_args(channel):
+    """
+    Return the keyword arguments that select a channel's device in the svpelab init functions.
+    """
+    return {} if channel == 1 else {'id': channel}
+
+
+def assign(items, n):
+    """
+    Deal items round-robin into n lists, one per channel.
+    """
+    return [list(items[i::n]) for i in range(n)]
+
+
+def run(jobs):
+    """
+    Run jobs, a list of (name, callable, args) tuples, one thread each, and return their results in job order.
+    Every job runs to completion; if any failed, ParallelError reports all of the failures.
+
+    On a virtual clock (svptools.sim) the jobs run one after another in this thread, since simulated time
+    costs nothing and the clock is advanced by a single test thread.
+    """
+    results = [None] * len(jobs)
+    if len(jobs) <= 1 or clock.is_virtual():
+        for i, (name, func, args) in enumerate(jobs):
+            results[i] = func(*args)
+        return results
+
+    errors = [None] * len(jobs)
+
+    def target(i, func, args):
+        try:
+            results[i] = func(*args)
+        except Exception, e:
+            errors[i] = e
+
+    threads = []
+    for i, (name, func, args) in enumerate(jobs):
+        t = threading.Thread(target=target, args=(i, func, args), name=name)
+        t.daemon = True
+        threads.append(t)
+        t.start()
+    for t in threads:
+        t.join()
+    failed = ['%s: %s' % (jobs[i][0], e) for i, e in enumerate(errors) if e is not None]
+    if failed:
+        raise ParallelError('; '.join(failed))
+    return results
@@ -0,0 +1,522 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import sqlite3
+from svptools import capfile
+from svptools import trace
+
+RESULTINDEX_DEFAULT_ID = 'resultindex'
+
+DB_FILE = os.path.join(os.path.expanduser('~'), '.svptools', 'results.db')
+
+# written by each test next to its results: test name, time, EUT identity, parameters and result
+RUN_INFO = 'run_info.json'
+SCHEMA_SUFFIX = '.schema.json'
+
+# result summaries written by the scripts; other CSVs with a schema are not results and are not indexed
+RESULT_FILES = ['result_summary.csv', 'pf_map.csv']
+
+# summary columns that hold the setpoint of a row, in order of preference: curtailment, PF and FW
+SETPOINT_COLUMNS = ['power_pct', 'pf_target', 'freq']
+
+# summary column types whose values are indexed as numbers
+NUMERIC_TYPES = ['float', 'int']
+
+# setpoints and numeric where-values closer than this are equal
+TOLERANCE = 1e-3
+
+# directories under a results tree that never hold runs
+SKIP_DIRS = ['.workbook_cache']
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, path TEXT UNIQUE, signature TEXT, test TEXT, '
+    'script TEXT, timestamp REAL, result TEXT, serial TEXT, manufacturer TEXT, model TEXT, firmware TEXT, '
+    'info TEXT)',
+    'CREATE TABLE IF NOT EXISTS points (run_id INTEGER, source TEXT, row INTEGER, setpoint REAL, name TEXT, '
+    'value REAL, text TEXT)',
+    'CREATE TABLE IF NOT EXISTS datasets (run_id INTEGER, name TEXT, samples INTEGER, channels TEXT)',
+    'CREATE INDEX IF NOT EXISTS points_name ON points (name, setpoint)',
+    'CREATE INDEX IF NOT EXISTS points_row ON points (run_id, source, row)',
+    'CREATE INDEX IF NOT EXISTS runs_eut ON runs (test, serial, firmware)',
+]
+
+# run attributes a query can filter or group by
+RUN_FIELDS = ['path', 'test', 'script', 'timestamp', 'result', 'serial', 'manufacturer', 'model', 'firmware']
+
+
+class ResultIndexError(Exception):
+    pass
+
+
+def params(info, group_name=RESULTINDEX_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Results Index Parameters', glob=True)
+    info.param(gname('mode'), label='Add Results to Index', default='Enabled', values=['Enabled', 'Disabled'])
+    info.param(gname('db'), label='Index Database (blank for default)', default='',
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _load_json(path):
+    try:
+        f = open(path)
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    f = open(path + '.tmp', 'w')
+    try:
+        json.dump(data, f, indent=2, sort_keys=True, default=str)
+    finally:
+        f.close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+
+def run_info(ts, euts):
+    """
+    Record the test name, start time, EUT identity (eut.info() of each EUT) and parameters in the result
+    directory, so the run can be indexed and compared with other runs later. Errors are logged, never raised.
+    """
+    if not isinstance(euts, (list, tuple)):
+        euts = [euts]
+    infos = []
+    for eut in euts:
+        try:
+            info = eut.info() if eut is not None else None
+        except Exception, e:
+            ts.log_warning('Unable to read EUT info for the results index: %s' % e)
+            info = None
+        infos.append(dict(info) if isinstance(info, dict) else {})
+    params = getattr(ts, 'params', None)
+    data = {'test': ts.config_name(), 'script': ts.name, 'version': getattr(ts.info, 'version', None),
+            'timestamp': time.time(), 'euts': infos,
+            'params': dict([(k, v) for k, v in params.items()]) if isinstance(params, dict) else None}
+    try:
+        _write_json(ts.result_file_path(RUN_INFO), data)
+    except (IOError, OSError), e:
+        ts.log_warning('Unable to write %s: %s' % (RUN_INFO, e))
+
+
+def index_result(ts, result, group_name=RESULTINDEX_DEFAULT_ID):
+    """
+    Record the result of the test in its run info and, if resultindex.mode is enabled, add the result directory
+    to the index. Errors are logged, never raised, so indexing cannot fail a test.
+    """
+    gname = lambda name: group_name + '.' + name
+    path = ts.result_file_path(RUN_INFO)
+    try:
+        data = _load_json(path)
+        if data is not None:
+            data['result'] = result
+            _write_json(path, data)
+        if ts.param_value(gname('mode')) != 'Enabled':
+            return
+        index = ResultIndex(ts.param_value(gname('db')) or DB_FILE)
+        try:
+            index.ingest(os.path.dirname(path))
+        finally:
+            index.close()
+    except Exception, e:
+        ts.log_warning('Unable to add the results to the index: %s' % e)
+
+
+def is_run(files):
+    return RUN_INFO in files or [f for f in files if f in RESULT_FILES]
+
+
+def signature(run_dir, files):
+    """
+    Cheap change signature of a result directory: the names, sizes and modification times of its result files.
+    """
+    h = hashlib.sha1()
+    for name in sorted(files):
+        if os.path.splitext(name)[1].lower() in ['.csv', '.json', capfile.SUFFIX]:
+            st = os.stat(os.path.join(run_dir, name))
+            h.update('%s:%d:%d\n' % (name, st.st_size, int(st.st_mtime)))
+    return h.hexdigest()
+
+
+def read_summary(path, schema):
+    """
+    Read a result summary CSV written by svptools.summary, using its schema for the delimiter and column keys.
+    Returns a list of rows, each a list of (key, text) pairs.
+    """
+    delimiter = schema.get('delimiter', ', ')
+    keys = [c['key'] for c in schema.get('columns', [])]
+    rows = []
+    f = open(path)
+    try:
+        for i, line in enumerate(f):
+            if i < schema.get('header_rows', 1):
+                continue
+            line = line.rstrip('\r\n')
+            if line:
+                rows.append(zip(keys, line.split(delimiter)))
+    finally:
+        f.close()
+    return rows
+
+
+def read_dataset_header(path):
+    """
+    Return (samples, channels) of a dataset CSV or capture file. The samples of a CSV are not counted, so large
+    recordings are not read in full; they are None.
+    """
+    if path.endswith(capfile.SUFFIX):
+        header, offset = capfile.read_header(path)
+        channels = [str(c) for c in header['channels']]
+        record_size = 8 * len(channels)
+        return ((os.path.getsize(path) - offset) // record_size if record_size else 0), channels
+    f = open(path, 'rb')
+    try:
+        header = next(csv.reader(f), [])
+    finally:
+        f.close()
+    return None, [h.strip() for h in header]
+
+
+class ResultIndex(object):
+    """
+    SQLite index of the result directories of many runs, for comparing runs across EUTs, firmware builds and
+    months without opening their workbooks.
+
+    Each run is a result directory with a run_info.json and/or result summaries (RESULT_FILES). The
+    runs table holds the run's test name, time, result and EUT identity (serial number, manufacturer, model and
+    firmware version from eut.info()); the points table holds every value of every summary row, keyed by run,
+    summary file, row and column, with the row's setpoint; the datasets table lists the time-series recordings
+    and their channels, which stay in their files. update() only ingests directories that are new or have
+    changed since they were last indexed.
+    """
+
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self.db = sqlite3.connect(path, timeout=30.)
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def update(self, root, log=None):
+        """
+        Index the runs found under root. Returns the number of runs ingested.
+        """
+        count = 0
+        for run_dir, dirs, files in os.walk(root):
+            dirs[:] = sorted([d for d in dirs if d not in SKIP_DIRS])
+            if is_run(files) and self.ingest(run_dir, files):
+                count += 1
+                if log is not None:
+                    log('Indexed %s' % run_dir)
+        return count
+
+    def ingest(self, run_dir, files=None):
+        """
+        Add or refresh one result directory. Returns False if it is already indexed and unchanged.
+        """
+        run_dir = os.path.abspath(run_dir)
+        if files is None:
+            files = os.listdir(run_dir)
+        sig = signature(run_dir, files)
+        existing = self.db.execute('SELECT id, signature FROM runs WHERE path = ?', (run_dir,)).fetchone()
+        if existing is not None and existing[1] == sig:
+            return False
+
+        info = _load_json(os.path.join(run_dir, RUN_INFO)) or {}
+        euts = info.get('euts') or [{}]
+        eut = euts[0] or {}
+        timestamp = info.get('timestamp') or os.path.getmtime(run_dir)
+        run = (run_dir, sig, info.get('test') or os.path.basename(run_dir), info.get('script'), timestamp,
+               info.get('result'), eut.get('SerialNumber'), eut.get('Manufacturer'), eut.get('Model'),
+               eut.get('Version'), json.dumps(euts, default=str))
+        with self.db:
+            if existing is not None:
+                run_id = existing[0]
+                self.db.execute('DELETE FROM points WHERE run_id = ?', (run_id,))
+                self.db.execute('DELETE FROM datasets WHERE run_id = ?', (run_id,))
+                self.db.execute('UPDATE runs SET path = ?, signature = ?, test = ?, script = ?, timestamp = ?, '
+                                'result = ?, serial = ?, manufacturer = ?, model = ?, firmware = ?, info = ? '
+                                'WHERE id = ?', run + (run_id,))
+            else:
+                run_id = self.db.execute('INSERT INTO runs (path, signature, test, script, timestamp, result, '
+                                         'serial, manufacturer, model, firmware, info) '
+                                         'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', run).lastrowid
+            for name in RESULT_FILES:
+                schema_name = os.path.splitext(name)[0] + SCHEMA_SUFFIX
+                if name in files and schema_name in files:
+                    self._ingest_summary(run_id, run_dir, name, os.path.join(run_dir, schema_name))
+            for name in sorted(files):
+                base, ext = os.path.splitext(name)
+                # summaries and other tables with a schema (e.g. timing traces of older runs) are not recordings
+                if name in RESULT_FILES or name == trace.SUMMARY_FILE or base + SCHEMA_SUFFIX in files:
+                    continue
+                if ext.lower() == '.csv' or (ext == capfile.SUFFIX and base + '.csv' not in files):
+                    try:
+                        samples, channels = read_dataset_header(os.path.join(run_dir, name))
+                    except (IOError, capfile.CaptureFileError):
+                        continue
+                    self.db.execute('INSERT INTO datasets (run_id, name, samples, channels) VALUES (?, ?, ?, ?)',
+                                    (run_id, name, samples, json.dumps(channels)))
+        return True
+
+    def _ingest_summary(self, run_id, run_dir, name, schema_path):
+        schema = _load_json(schema_path)
+        if schema is None:
+            return
+        numeric = set([c['key'] for c in schema.get('columns', []) if c.get('type') in NUMERIC_TYPES])
+        points = []
+        for i, row in enumerate(read_summary(os.path.join(run_dir, name), schema)):
+            values = dict(row)
+            setpoint = None
+            for key in SETPOINT_COLUMNS:
+                if key in values:
+                    setpoint = _number(values[key])
+                    break
+            for key, text in row:
+                text = text.strip()
+                value = _number(text)
+                # a numeric column without a value (None, nan or empty) is stored as missing, not as text
+                if value is not None and value != value:
+                    value = None
+                if value is None and key not in numeric:
+                    points.append((run_id, name, i, setpoint, key, None, text))
+                else:
+                    points.append((run_id, name, i, setpoint, key, value, None))
+        self.db.executemany('INSERT INTO points (run_id, source, row, setpoint, name, value, text) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?)', points)
+
+    def _run_filter(self, test=None, serial=None, firmware=None, since=None, until=None):
+        clauses = []
+        args = []
+        if test is not None:
+            clauses.append('(r.test LIKE ? OR r.script LIKE ?)')
+            args.extend(['%' + test + '%'] * 2)
+        if serial is not None:
+            clauses.append('r.serial = ?')
+            args.append(serial)
+        if firmware is not None:
+            clauses.append('r.firmware = ?')
+            args.append(firmware)
+        if since is not None:
+            clauses.append('r.timestamp >= ?')
+            args.append(since)
+        if until is not None:
+            clauses.append('r.timestamp < ?')
+            args.append(until)
+        return clauses, args
+
+    def runs(self, **kwargs):
+        """
+        Return the indexed runs, newest first, as dicts of RUN_FIELDS. Accepts the run filters of query().
+        """
+        clauses, args = self._run_filter(**kwargs)
+        sql = 'SELECT %s FROM runs r' % ', '.join(['r.' + f for f in RUN_FIELDS])
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY r.timestamp DESC'
+        return [dict(zip(RUN_FIELDS, row)) for row in self.db.execute(sql, args)]
+
+    def query(self, metric, setpoint=None, where=None, source=None, tol=TOLERANCE, **kwargs):
+        """
+        Return the values of one summary column across runs, oldest first, as dicts of the run fields plus
+        source, row, setpoint and value.
+
+        :param metric: summary column key, e.g. 'w_das_err'.
+        :param setpoint: only rows at this setpoint (within tol).
+        :param where: dict of other column key -> value the row must have, e.g. {'irradiance': 600}.
+        :param source: only rows of this summary file.
+        :param kwargs: run filters: test (substring of the test or script name), serial, firmware, since and
+            until (time.time() values).
+        """
+        clauses, args = self._run_filter(**kwargs)
+        clauses.insert(0, 'p.name = ?')
+        args.insert(0, metric)
+        if setpoint is not None:
+            clauses.append('ABS(p.setpoint - ?) <= ?')
+            args.extend([float(setpoint), tol])
+        if source is not None:
+            clauses.append('p.source = ?')
+            args.append(source)
+        for key, value in sorted((where or {}).items()):
+            number = _number(value)
+            match = 'ABS(w.value - ?) <= ?' if number is not None else 'w.text = ?'
+            clauses.append('EXISTS (SELECT 1 FROM points w WHERE w.run_id = p.run_id AND w.source = p.source AND '
+                           'w.row = p.row AND w.name = ? AND %s)' % match)
+            args.extend([key, number, tol] if number is not None else [key, str(value)])
+        fields = RUN_FIELDS + ['source', 'row', 'setpoint', 'value']
+        sql = ('SELECT %s, p.source, p.row, p.setpoint, COALESCE(p.value, p.text) FROM points p '
+               'JOIN runs r ON r.id = p.run_id WHERE %s ORDER BY r.timestamp, p.source, p.row' %
+               (', '.join(['r.' + f for f in RUN_FIELDS]), ' AND '.join(clauses)))
+        return [dict(zip(fields, row)) for row in self.db.execute(sql, args)]
+
+    def datasets(self, **kwargs):
+        """
+        Return the time-series recordings of the indexed runs as dicts of the run fields plus the file path,
+        sample count (None for CSVs) and channels. Accepts the run filters of query().
+        """
+        clauses, args = self._run_filter(**kwargs)
+        sql = ('SELECT %s, d.name, d.samples, d.channels FROM datasets d JOIN runs r ON r.id = d.run_id' %
+               ', '.join(['r.' + f for f in RUN_FIELDS]))
+        if clauses:
+            sql += ' WHERE ' + ' AND '.join(clauses)
+        sql += ' ORDER BY r.timestamp, d.name'
+        result = []
+        for row in self.db.execute(sql, args):
+            d = dict(zip(RUN_FIELDS, row[:len(RUN_FIELDS)]))
+            d.update({'file': os.path.join(d['path'], row[-3]), 'samples': row[-2], 'channels': json.loads(row[-1])})
+            result.append(d)
+        return result
+
+
+def summarize(rows, by='firmware'):
+    """
+    Group query() rows by a run field and return (group, count, mean, min, max) of their numeric values.
+    """
+    groups = {}
+    order = []
+    for row in rows:
+        if not isinstance(row['value'], (int, float)):
+            continue
+        key = row.get(by)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(row['value'])
+    return [(key, len(groups[key]), sum(groups[key])/len(groups[key]), min(groups[key]), max(groups[key]))
+            for key in order]
+
+
+def _time(text):
+    return time.mktime(time.strptime(text, '%Y-%m-%d')) if text else None
+
+
+def _format_time(t):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) if t is not None else ''
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Index SVP result directories and query results across runs')
+    parser.add_argument('--db', default=DB_FILE, help='index database (default %(default)s)')
+    commands = parser.add_subparsers(dest='command')
+
+    update = commands.add_parser('update', help='index new and changed runs under result directories')
+    update.add_argument('roots', nargs='+', help='result directory trees to scan')
+
+    filters = argparse.ArgumentParser(add_help=False)
+    filters.add_argument('-t', '--test', help='test or script name (substring)')
+    filters.add_argument('--serial', help='EUT serial number')
+    filters.add_argument('--firmware', help='EUT firmware version')
+    filters.add_argument('--since', type=_time, help='runs from this date (YYYY-MM-DD)')
+    filters.add_argument('--until', type=_time, help='runs before this date (YYYY-MM-DD)')
+
+    commands.add_parser('runs', parents=[filters], help='list the indexed runs')
+    commands.add_parser('datasets', parents=[filters], help='list the indexed time-series recordings')
+
+    query = commands.add_parser('query', parents=[filters], help='values of a summary column across runs')
+    query.add_argument('metric', help='summary column key, e.g. w_das_err')
+    query.add_argument('-s', '--setpoint', type=float, help='setpoint of the rows, e.g. 30 (%% power)')
+    query.add_argument('-w', '--where', action='append', default=[], metavar='KEY=VALUE',
+                       help='other column value the rows must have')
+    query.add_argument('--by', choices=RUN_FIELDS, help='summarize the values by this run field')
+    args = parser.parse_args(args)
+
+    index = ResultIndex(args.db)
+    out = csv.writer(sys.stdout, lineterminator='\n')
+    try:
+        if args.command == 'update':
+            count = sum([index.update(root) for root in args.roots])
+            sys.stdout.write('%d run(s) indexed\n' % count)
+            return 0
+        run_filter = {'test': args.test, 'serial': args.serial, 'firmware': args.firmware, 'since': args.since,
+                      'until': args.until}
+        if args.command == 'runs':
+            out.writerow(RUN_FIELDS)
+            for run in index.runs(**run_filter):
+                run['timestamp'] = _format_time(run['timestamp'])
+                out.writerow([run[f] for f in RUN_FIELDS])
+        elif args.command == 'datasets':
+            out.writerow(['test', 'timestamp', 'serial', 'firmware', 'file', 'samples', 'channels'])
+            for d in index.datasets(**run_filter):
+                out.writerow([d['test'], _format_time(d['timestamp']), d['serial'], d['firmware'], d['file'],
+                              d['samples'], ' '.join(d['channels'])])
+        else:
+            where = {}
+            for item in args.where:
+                if '=' not in item:
+                    parser.error('--where expects KEY=VALUE, not %s' % item)
+                key, value = item.split('=', 1)
+                where[key] = value
+            rows = index.query(args.metric, setpoint=args.setpoint, where=where, **run_filter)
+            if args.by:
+                out.writerow([args.by, 'count', 'mean', 'min', 'max'])
+                for group in summarize(rows, by=args.by):
+                    out.writerow(group)
+            else:
+                out.writerow(['test', 'timestamp', 'serial', 'firmware', 'source', 'row', 'setpoint', args.metric])
+                for row in rows:
+                    out.writerow([row['test'], _format_time(row['timestamp']), row['serial'], row['firmware'],
+                                  row['source'], row['row'], row['setpoint'], row['value']])
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
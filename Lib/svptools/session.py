@@ -0,0 +1,196 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import atexit
+from svptools import sim
+from svptools import trace
+
+SESSION_DEFAULT_ID = 'session'
+
+# kind -> Session for the device handles currently held open
+sessions = {}
+
+# kind -> callable(handle), raise or return False if the handle is no longer usable
+health_checks = {}
+
+# kind -> callable(handle), return the device to a neutral state before the next test uses it
+resets = {}
+
+# DER functions disabled when a pooled EUT is released, so no setpoint carries over into the next test
+DER_RESET_FUNCTIONS = ['fixed_pf', 'limit_max_power', 'volt_var', 'freq_watt']
+
+
+class SessionError(Exception):
+    pass
+
+
+def params(info, group_name=SESSION_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Device Session Parameters', glob=True)
+    info.param(gname('mode'), label='Reuse Device Connections', default='Enabled', values=['Enabled', 'Disabled'])
+
+
+def register(kind, health=None, reset=None):
+    """
+    Register the health check and reset hooks for a device kind ('der', 'hil', 'pvsim', 'gridsim').
+    """
+    if health is not None:
+        health_checks[kind] = health
+    if reset is not None:
+        resets[kind] = reset
+
+
+def der_reset(handle):
+    """
+    Disable the EUT functions the scripts enable. An error closes the session, so the next test initializes the
+    EUT afresh.
+    """
+    for name in DER_RESET_FUNCTIONS:
+        func = getattr(handle, name, None)
+        if func is not None:
+            func(params={'Ena': False})
+
+
+def default_health(handle):
+    info = getattr(handle, 'info', None)
+    if info is not None:
+        info()
+    return True
+
+
+class Session(object):
+
+    def __init__(self, kind, key, handle):
+        self.kind = kind
+        self.key = key
+        self.handle = handle
+        self.uses = 1
+
+
+def session_key(ts, kind):
+    """
+    Key a session on all of the parameters of its device group, so a handle is only reused by a test that
+    would have configured the device identically. Returns None if the parameters are not available.
+    """
+    params = getattr(ts, 'params', None)
+    if not isinstance(params, dict):
+        return None
+    prefix = kind + '.'
+    return tuple(sorted([(k, str(v)) for k, v in params.items() if k.startswith(prefix)]))
+
+
+def healthy(s):
+    try:
+        return health_checks.get(s.kind, default_health)(s.handle) is not False
+    except Exception:
+        return False
+
+
+def discard(kind):
+    s = sessions.pop(kind, None)
+    if s is not None:
+        try:
+            s.handle.close()
+        except Exception:
+            pass
+
+
+def acquire(ts, kind, init, config=False, pool=True, group_name=SESSION_DEFAULT_ID, **kwargs):
+    """
+    Return a handle for a device kind. An open handle from an earlier test in this process is reused when
+    session reuse is enabled, its parameters match and it passes its health check. Otherwise the device is
+    initialized with init(ts, **kwargs), followed by config() when config is set. A reused handle is configured
+    again as well, so the test starts from its configured state. Handles acquired with pool unset are never
+    kept for reuse. On a simulated rig (sim.mode) the simulated device is returned instead. The handle's driver
+    calls are traced when the timing trace is enabled.
+    """
+    if sim.enabled(ts):
+        with trace.span('%s.init' % kind, kind):
+            handle = sim.device(ts, kind, **kwargs)
+            if handle is not None and config:
+                handle.config()
+        return trace.instrument(handle, kind)
+
+    enabled = pool and ts.param_value(group_name + '.mode') == 'Enabled'
+    key = session_key(ts, kind) if enabled else None
+
+    s = sessions.get(kind)
+    if s is not None:
+        if key is not None and s.key == key and healthy(s):
+            if hasattr(s.handle, 'ts'):
+                s.handle.ts = ts
+            s.uses += 1
+            ts.log('Reusing %s session (use %d)' % (kind, s.uses))
+            if config:
+                with trace.span('%s.config' % kind, kind):
+                    s.handle.config()
+            return trace.instrument(s.handle, kind)
+        discard(kind)
+
+    with trace.span('%s.init' % kind, kind):
+        handle = init(ts, **kwargs)
+        if handle is not None:
+            if config:
+                handle.config()
+            if key is not None:
+                sessions[kind] = Session(kind, key, handle)
+    return trace.instrument(handle, kind)
+
+
+def release(ts, handle):
+    """
+    Release a handle at the end of a test. Pooled handles are reset and kept open, others are closed.
+    """
+    handle = trace.unwrap(handle)
+    if handle is None:
+        return
+    for kind, s in sessions.items():
+        if s.handle is handle:
+            reset = resets.get(kind)
+            if reset is not None:
+                try:
+                    reset(handle)
+                except Exception, e:
+                    ts.log_warning('Unable to reset %s session, closing it: %s' % (kind, e))
+                    discard(kind)
+            return
+    handle.close()
+
+
+def close_all():
+    for kind in list(sessions.keys()):
+        discard(kind)
+
+
+register('der', reset=der_reset)
+atexit.register(close_all)
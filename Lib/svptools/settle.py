@@ -0,0 +1,204 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+from svptools import channels
+from svptools import clock
+from svptools import trace
+
+SETTLE_DEFAULT_ID = 'settle'
+
+# default steady-state tolerances, in the units reported by the EUT/DAS
+W_TOL = 50.
+VAR_TOL = 50.
+PF_TOL = 0.01
+
+
+class SettleError(Exception):
+    pass
+
+
+def params(info, group_name=SETTLE_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Settling Parameters', glob=True)
+    info.param(gname('mode'), label='Settle Detection', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('source'), label='Measurement Source', default='EUT', values=['EUT', 'DAS'],
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('min_time'), label='Minimum Dwell (s)', default=0.5,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('max_time'), label='Maximum Dwell (s)', default=5.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('poll_interval'), label='Poll Interval (s)', default=0.2,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('window'), label='Samples in Steady-State Window', default=3,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('w_tol'), label='Active Power Tolerance (W)', default=W_TOL,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('var_tol'), label='Reactive Power Tolerance (VAr)', default=VAR_TOL,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('pf_tol'), label='Power Factor Tolerance', default=PF_TOL,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def eut_source(eut):
+    """
+    Return a reader that polls the EUT measurements for W, VAr and PF. eut may be a DER handle or an
+    svptools.measure.Measurements cache.
+    """
+    def read():
+        m = eut.measurements()
+        if m is None:
+            return None
+        return {'W': m.get('W'), 'VAr': m.get('VAr'), 'PF': m.get('PF')}
+    return read
+
+
+def daq_source(daq):
+    """
+    Return a reader that forces a DAS sample and reports its total W, VAr and PF (see channels.totals()).
+    """
+    def read():
+        daq.data_sample()
+        data = daq.data_capture_read()
+        if data is None:
+            return None
+        return channels.totals(data)
+    return read
+
+
+class Settle(object):
+    """
+    Replaces a fixed dwell after a setpoint change with a wait that ends as soon as the monitored points
+    have been steady for a full window of samples.
+
+    A point is steady when the spread (max - min) of its last 'window' readings is within its tolerance.
+    The wait is never shorter than min_time nor longer than max_time. Points that the source does not
+    report (None) are ignored.
+    """
+
+    def __init__(self, ts, read=None, tol=None, window=3, min_time=0.5, max_time=5., poll_interval=0.2,
+                 enabled=True):
+        self.ts = ts
+        self.read = read
+        if tol is None:
+            tol = {'W': W_TOL, 'VAr': VAR_TOL, 'PF': PF_TOL}
+        self.tol = tol
+        self.window = max(int(window), 2)
+        self.min_time = float(min_time)
+        self.max_time = float(max_time)
+        self.poll_interval = float(poll_interval)
+        self.enabled = enabled
+        self.history = []
+
+        if self.max_time < self.min_time:
+            raise SettleError('Maximum dwell (%s s) is less than minimum dwell (%s s)' %
+                              (self.max_time, self.min_time))
+
+    def steady(self, samples):
+        if len(samples) < self.window:
+            return False
+        recent = samples[-self.window:]
+        for point, tol in self.tol.items():
+            values = [s.get(point) for s in recent if s.get(point) is not None]
+            if not values:
+                continue
+            if len(values) < self.window or max(values) - min(values) > tol:
+                return False
+        return True
+
+    @trace.traced('settle.wait')
+    def wait(self, dwell=None):
+        """
+        Wait for the EUT to settle after a setpoint change.
+
+        :param dwell: fixed dwell (s) used when settle detection is disabled or the source has no data.
+        :returns: time waited (s).
+        """
+        start = clock.now()
+        settled = False
+        if not self.enabled or self.read is None:
+            self.ts.sleep(dwell if dwell is not None else self.max_time)
+        else:
+            if self.min_time > 0:
+                self.ts.sleep(self.min_time)
+            samples = []
+            while True:
+                data = self.read()
+                if data is None:
+                    # no measurements available, fall back to the fixed dwell
+                    remaining = (dwell if dwell is not None else self.max_time) - (clock.now() - start)
+                    if remaining > 0:
+                        self.ts.sleep(remaining)
+                    break
+                samples.append(data)
+                if self.steady(samples):
+                    settled = True
+                    break
+                if clock.now() - start + self.poll_interval > self.max_time:
+                    break
+                self.ts.sleep(self.poll_interval)
+        elapsed = clock.now() - start
+        self.history.append((elapsed, settled))
+        if self.enabled and self.read is not None and not settled:
+            self.ts.log_warning('EUT did not settle within %0.2f seconds' % elapsed)
+        return elapsed
+
+    def total_time(self):
+        return sum([h[0] for h in self.history])
+
+
+def settle_init(ts, eut=None, daq=None, read=None, group_name=SETTLE_DEFAULT_ID):
+    """
+    Create a Settle object from the settle.* parameters. The EUT or DAS is polled depending on the
+    selected measurement source. A DAS reader passed in read (e.g. from svptools.capture) is used
+    instead of forcing DAS samples.
+    """
+    gname = lambda name: group_name + '.' + name
+    mode = ts.param_value(gname('mode'))
+    if mode != 'Enabled':
+        return Settle(ts, enabled=False)
+
+    source = ts.param_value(gname('source'))
+    if source == 'DAS':
+        if read is None and daq is not None:
+            read = daq_source(daq)
+    elif eut is not None:
+        read = eut_source(eut)
+    else:
+        read = None
+
+    tol = {'W': ts.param_value(gname('w_tol')),
+           'VAr': ts.param_value(gname('var_tol')),
+           'PF': ts.param_value(gname('pf_tol'))}
+    return Settle(ts, read=read, tol=tol, window=ts.param_value(gname('window')),
+                  min_time=ts.param_value(gname('min_time')), max_time=ts.param_value(gname('max_time')),
+                  poll_interval=ts.param_value(gname('poll_interval')))
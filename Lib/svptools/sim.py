@@ -0,0 +1,491 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import math
+import time
+import numpy as np
+from svptools import clock
+from svptools import dataset
+
+SIM_DEFAULT_ID = 'sim'
+
+# channel -> simulated rig shared by the device handles of that channel in the current test
+rigs = {}
+
+
+class SimError(Exception):
+    pass
+
+
+def params(info, group_name=SIM_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Simulated Rig Parameters', glob=True)
+    info.param(gname('mode'), label='Simulated Rig (Dry Run)', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('w_rated'), label='EUT Power Rating (W)', default=10000.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('var_rated'), label='EUT Reactive Power Rating (var)', default=4400.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('v_nom'), label='Grid Nominal Voltage (V)', default=230.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('f_nom'), label='Grid Nominal Frequency (Hz)', default=50.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('phases'), label='Phases', default=1, values=[1, 2, 3],
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('tau'), label='EUT Response Time Constant (s)', default=0.5,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('startup_time'), label='EUT Start-up Time (s)', default=5.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('noise'), label='Measurement Noise (% of rating)', default=0.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('latency'), label='Driver Call Latency (ms)', default=0.,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+class SimRig(object):
+    """
+    Model of a PV inverter connected to a PV simulator and a grid simulator.
+
+    The EUT output follows the commanded functions (power limit, fixed PF, volt-var, volt-watt and freq-watt,
+    as curves in % of rating against % of nominal voltage or Hz) with a first-order response of time constant
+    tau, evaluated against the clock, so settling, start-up and dwell logic behave as on a real rig when the
+    clock is virtual.
+    """
+
+    def __init__(self, w_rated=10000., var_rated=4400., v_nom=230., f_nom=50., phases=1, tau=0.5,
+                 startup_time=5., noise=0.):
+        self.w_rated = float(w_rated)
+        self.var_rated = float(var_rated)
+        self.v_nom = float(v_nom)
+        self.f_nom = float(f_nom)
+        self.phases = int(phases)
+        self.tau = float(tau)
+        self.startup_time = float(startup_time)
+        self.noise = float(noise)
+
+        self.v = self.v_nom
+        self.f = self.f_nom
+        self.irradiance = 1000.
+        self.pv_on = False
+        self.connected_at = None
+        self.settings = {
+            'limit': {'Ena': False, 'WMaxPct': 100.},
+            'pf': {'Ena': False, 'PF': 1., 'WinTms': 0, 'RmpTms': 0, 'RvrtTms': 0},
+            'vv': {'Ena': False, 'ActCrv': 1},
+            'vw': {'Ena': False, 'ActCrv': 1},
+            'fw': {'Ena': False, 'ActCrv': 1},
+            'fw_param': None,
+        }
+        self.curves = {'vv': {}, 'vw': {}, 'fw': {}}
+        self.w = 0.
+        self.var = 0.
+        self._time = clock.now()
+
+    def producing(self):
+        return (self.pv_on and self.irradiance > 0 and self.connected_at is not None and
+                clock.now() - self.connected_at >= self.startup_time)
+
+    def curve(self, kind, x_key, y_key):
+        c = self.curves[kind].get(self.settings[kind].get('ActCrv', 1))
+        if c is None or x_key not in c or y_key not in c:
+            return None
+        return c[x_key], c[y_key]
+
+    def target(self):
+        """
+        Return the steady-state (W, var) for the present grid, PV and function settings.
+        """
+        if not self.producing():
+            return 0., 0.
+        w = self.w_rated * min(self.irradiance, 1000.)/1000.
+        s = self.settings
+        if s['limit']['Ena']:
+            w = min(w, self.w_rated * float(s['limit']['WMaxPct'])/100.)
+        v_pct = 100. * self.v/self.v_nom
+        if s['vw']['Ena']:
+            c = self.curve('vw', 'v', 'w')
+            if c is not None:
+                w = min(w, self.w_rated * np.interp(v_pct, c[0], c[1])/100.)
+        if s['fw']['Ena']:
+            c = self.curve('fw', 'hz', 'w')
+            if c is not None:
+                w = min(w, self.w_rated * np.interp(self.f, c[0], c[1])/100.)
+        elif s['fw_param'] is not None:
+            p = s['fw_param']
+            if self.f > float(p.get('HzStr', self.f)):
+                pct = 100. - float(p.get('WGra', 0.)) * (self.f - float(p['HzStr']))
+                w = min(w, self.w_rated * max(pct, 0.)/100.)
+        var = 0.
+        if s['pf']['Ena']:
+            pf = float(s['pf']['PF'])
+            if 0 < abs(pf) < 1:
+                var = math.copysign(w * math.tan(math.acos(abs(pf))), pf)
+        elif s['vv']['Ena']:
+            c = self.curve('vv', 'v', 'var')
+            if c is not None:
+                var = self.var_rated * np.interp(v_pct, c[0], c[1])/100.
+        # apparent power is limited to the power rating, keeping the power factor
+        va = math.hypot(w, var)
+        if va > self.w_rated:
+            w *= self.w_rated/va
+            var *= self.w_rated/va
+        return w, var
+
+    def update(self):
+        now = clock.now()
+        dt = now - self._time
+        self._time = now
+        w, var = self.target()
+        k = math.exp(-dt/self.tau) if self.tau > 0 else 0.
+        self.w = w + (self.w - w) * k
+        self.var = var + (self.var - var) * k
+        return self.w, self.var
+
+    def measure(self):
+        w, var = self.update()
+        if self.noise > 0:
+            w += np.random.normal(0., self.w_rated * self.noise/100.)
+            var += np.random.normal(0., self.var_rated * self.noise/100.)
+        va = math.hypot(w, var)
+        pf = abs(w)/va if va > 0 else 1.
+        if self.settings['pf']['Ena']:
+            pf = math.copysign(pf, float(self.settings['pf']['PF']))
+        elif var < 0:
+            pf = -pf
+        return {'W': w, 'VAr': var, 'VA': va, 'PF': pf, 'Hz': self.f, 'V': self.v}
+
+
+class SimDER(object):
+    """
+    Simulated DER with the svpelab DER interface used by the test scripts.
+    """
+
+    def __init__(self, ts, rig):
+        self.ts = ts
+        self.rig = rig
+
+    def config(self):
+        pass
+
+    def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def info(self):
+        return {'Manufacturer': 'SunSpec', 'Model': 'Simulated DER', 'Options': '', 'Version': '1.0',
+                'SerialNumber': 'SIM-%d' % int(self.rig.w_rated)}
+
+    def nameplate(self):
+        return {'WRtg': self.rig.w_rated, 'VARtg': self.rig.w_rated, 'VArRtgQ1': self.rig.var_rated,
+                'VArRtgQ4': self.rig.var_rated, 'ARtg': self.rig.w_rated/self.rig.v_nom}
+
+    def measurements(self):
+        m = self.rig.measure()
+        result = {'W': m['W'], 'VAr': m['VAr'], 'VA': m['VA'], 'PF': m['PF'], 'Hz': m['Hz'],
+                  'A': m['VA']/m['V'] if m['V'] else 0., 'St': 4 if self.rig.producing() else 1}
+        for name in ['PhVphA', 'PhVphB', 'PhVphC'][:self.rig.phases]:
+            result[name] = m['V']
+        return result
+
+    def _setting(self, kind, params):
+        if params is not None:
+            self.rig.update()
+            self.rig.settings[kind].update(params)
+        return dict(self.rig.settings[kind])
+
+    def connect(self, params=None):
+        if params is not None and 'Conn' in params:
+            self.rig.update()
+            if params['Conn']:
+                if self.rig.connected_at is None:
+                    self.rig.connected_at = clock.now()
+            else:
+                self.rig.connected_at = None
+        return {'Conn': self.rig.connected_at is not None}
+
+    def limit_max_power(self, params=None):
+        return self._setting('limit', params)
+
+    def fixed_pf(self, params=None):
+        return self._setting('pf', params)
+
+    def volt_var(self, params=None):
+        return self._setting('vv', params)
+
+    def volt_var_curve(self, id, params=None):
+        if params is not None:
+            self.rig.update()
+            self.rig.curves['vv'][id] = dict(params)
+        return self.rig.curves['vv'].get(id)
+
+    def volt_watt(self, params=None):
+        return self._setting('vw', params)
+
+    def freq_watt(self, params=None):
+        return self._setting('fw', params)
+
+    def freq_watt_curve(self, id, params=None):
+        if params is not None:
+            self.rig.update()
+            self.rig.curves['fw'][id] = dict(params)
+        return self.rig.curves['fw'].get(id)
+
+    def freq_watt_param(self, params=None):
+        if params is not None:
+            self.rig.update()
+            self.rig.settings['fw_param'] = dict(params)
+        return self.rig.settings['fw_param']
+
+
+class SimGridSim(object):
+    """
+    Simulated grid simulator. Voltage and frequency changes apply instantly.
+    """
+
+    def __init__(self, ts, rig):
+        self.ts = ts
+        self.rig = rig
+        self.v_nom_param = rig.v_nom
+
+    def config(self):
+        pass
+
+    def close(self):
+        pass
+
+    def info(self):
+        return 'Simulated grid simulator'
+
+    def voltage(self, voltage=None):
+        if voltage is not None:
+            if isinstance(voltage, (list, tuple)):
+                voltage = voltage[0]
+            self.rig.update()
+            self.rig.v = float(voltage)
+        return (self.rig.v,) * self.rig.phases
+
+    def freq(self, freq=None):
+        if freq is not None:
+            self.rig.update()
+            self.rig.f = float(freq)
+        return self.rig.f
+
+
+class SimPVSim(object):
+    """
+    Simulated PV simulator. The EUT's available power is proportional to irradiance (1000 W/m^2 = rating).
+    """
+
+    def __init__(self, ts, rig):
+        self.ts = ts
+        self.rig = rig
+
+    def close(self):
+        pass
+
+    def info(self):
+        return 'Simulated PV simulator'
+
+    def irradiance_set(self, irradiance=1000):
+        self.rig.update()
+        self.rig.irradiance = float(irradiance)
+
+    def power_on(self):
+        self.rig.update()
+        self.rig.pv_on = True
+
+    def power_off(self):
+        self.rig.update()
+        self.rig.pv_on = False
+
+
+class SimDAS(object):
+    """
+    Simulated data acquisition system measuring the EUT output per phase, with svpelab style soft channels.
+    """
+
+    def __init__(self, ts, rig, sc_points=None):
+        self.ts = ts
+        self.rig = rig
+        self.sc = dict([(p, 0.) for p in (sc_points or [])])
+        self.start = clock.now()
+        self.capturing = False
+        self.last = None
+        self.ds = None
+        n = self.rig.phases
+        self.points = ['TIME'] + ['%s_%d' % (c, i) for c in ('AC_VRMS', 'AC_IRMS', 'AC_P', 'AC_S', 'AC_Q', 'AC_PF',
+                                                              'AC_FREQ') for i in range(1, n + 1)]
+        self.points += ['DC_V', 'DC_I', 'DC_P'] + list(self.sc.keys())
+
+    def close(self):
+        pass
+
+    def info(self):
+        return 'Simulated DAS (%d phase)' % self.rig.phases
+
+    def data_sample(self):
+        m = self.rig.measure()
+        n = self.rig.phases
+        rec = {'TIME': clock.now() - self.start}
+        for i in range(1, n + 1):
+            rec['AC_VRMS_%d' % i] = m['V']
+            rec['AC_IRMS_%d' % i] = m['VA']/n/m['V'] if m['V'] else 0.
+            rec['AC_P_%d' % i] = m['W']/n
+            rec['AC_S_%d' % i] = m['VA']/n
+            rec['AC_Q_%d' % i] = m['VAr']/n
+            rec['AC_PF_%d' % i] = m['PF']
+            rec['AC_FREQ_%d' % i] = m['Hz']
+        # DC side at a constant 97% conversion efficiency
+        dc_p = m['W']/0.97
+        rec['DC_V'] = 400.
+        rec['DC_I'] = dc_p/400.
+        rec['DC_P'] = dc_p
+        rec.update(self.sc)
+        self.last = rec
+        if self.capturing:
+            self.ds.append(rec)
+        return rec
+
+    def data_capture_read(self):
+        if self.last is None:
+            self.data_sample()
+        return dict(self.last)
+
+    def data_capture(self, enable=True):
+        if enable and not self.capturing:
+            self.ds = dataset.ColumnarDataset(self.points)
+        self.capturing = enable
+
+    def data_capture_dataset(self):
+        if self.ds is None:
+            raise SimError('No data captured')
+        return self.ds
+
+
+class Latency(object):
+    """
+    Proxy for a simulated device that delays every method call by a fixed wall-clock time, standing in for the
+    driver round trips of a real rig (e.g. when benchmarking the scripts). Attribute reads and writes go to the
+    device.
+    """
+
+    def __init__(self, target, latency):
+        object.__setattr__(self, 'target', target)
+        object.__setattr__(self, 'latency', latency)
+
+    def __getattr__(self, name):
+        attr = getattr(self.target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+
+        def call(*args, **kwargs):
+            time.sleep(self.latency)
+            return attr(*args, **kwargs)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self.target, name, value)
+
+
+def sim_init(ts, group_name=SIM_DEFAULT_ID):
+    """
+    Set up the simulated rig for a test if simulation is enabled. The test runs against a virtual clock:
+    ts.sleep() advances it and returns immediately, so a whole suite runs in seconds. Returns the rig, or None
+    if simulation is disabled (the wall clock is then restored).
+    """
+    gname = lambda name: group_name + '.' + name
+    rigs.clear()
+    if ts.param_value(gname('mode')) != 'Enabled':
+        if clock.is_virtual():
+            clock.use(clock.Clock())
+        return None
+    if not clock.is_virtual():
+        clock.use(clock.VirtualClock())
+    ts.sleep = clock.clock.sleep
+    rig = channel_rig(ts, 1, group_name=group_name)
+    ts.log('Running against a simulated %d W rig with a virtual clock' % rig.w_rated)
+    return rig
+
+
+def channel_rig(ts, channel=1, group_name=SIM_DEFAULT_ID):
+    """
+    Return the simulated rig of a device channel, creating it from the sim.* parameters. Each channel is an
+    independent EUT with its own PV and grid simulator.
+    """
+    gname = lambda name: group_name + '.' + name
+    rig = rigs.get(channel)
+    if rig is None:
+        rig = SimRig(w_rated=ts.param_value(gname('w_rated')), var_rated=ts.param_value(gname('var_rated')),
+                     v_nom=ts.param_value(gname('v_nom')), f_nom=ts.param_value(gname('f_nom')),
+                     phases=ts.param_value(gname('phases')), tau=ts.param_value(gname('tau')),
+                     startup_time=ts.param_value(gname('startup_time')), noise=ts.param_value(gname('noise')))
+        rigs[channel] = rig
+    return rig
+
+
+def enabled(ts, group_name=SIM_DEFAULT_ID):
+    try:
+        return ts.param_value(group_name + '.mode') == 'Enabled'
+    except Exception:
+        return False
+
+
+devices = {
+    'der': SimDER,
+    'gridsim': SimGridSim,
+    'pvsim': SimPVSim,
+    'das': SimDAS,
+}
+
+
+def device(ts, kind, group_name=SIM_DEFAULT_ID, **kwargs):
+    """
+    Return a simulated device handle of the given kind ('der', 'gridsim', 'pvsim', 'das', or 'der_2' etc. for
+    the devices of further channels), or None for kinds that are not simulated (e.g. 'hil', which is disabled
+    on a simulated rig). With a driver call latency set, each call of the handle takes that long in real time.
+    """
+    if not clock.is_virtual():
+        sim_init(ts)
+    if not clock.is_virtual():
+        raise SimError('Simulated rig is not enabled')
+    base, sep, channel = kind.partition('_')
+    cls = devices.get(base)
+    if cls is None:
+        return None
+    kwargs.pop('id', None)
+    handle = cls(ts, channel_rig(ts, int(channel) if channel else 1, group_name=group_name), **kwargs)
+    latency = ts.param_value(group_name + '.latency')
+    if latency:
+        handle = Latency(handle, float(latency)/1000.)
+    return handle
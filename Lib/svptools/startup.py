@@ -0,0 +1,97 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+from svptools import clock
+from svptools import trace
+
+POLL_INTERVAL = 0.1
+MAX_POLL_INTERVAL = 1.
+BACKOFF = 1.5
+LOG_INTERVAL = 1.
+
+
+def wait_for_production(ts, meas, threshold, timeout, poll_interval=POLL_INTERVAL,
+                        max_poll_interval=MAX_POLL_INTERVAL, backoff=BACKOFF):
+    """
+    Wait until the EUT reports more than threshold W.
+
+    The EUT is polled quickly at first and then progressively slower (by backoff, up to max_poll_interval),
+    so an inverter that is already producing or starts quickly is detected almost immediately without
+    hammering one that takes minutes.
+
+    :param meas: EUT handle or svptools.measure.Measurements.
+    :returns: start-up latency (s), or None if the EUT did not start within timeout seconds.
+    """
+    latencies = wait_for_production_all(ts, [meas], threshold, timeout, poll_interval=poll_interval,
+                                        max_poll_interval=max_poll_interval, backoff=backoff)
+    return latencies[0]
+
+
+@trace.traced('startup.wait')
+def wait_for_production_all(ts, euts, threshold, timeout, poll_interval=POLL_INTERVAL,
+                            max_poll_interval=MAX_POLL_INTERVAL, backoff=BACKOFF):
+    """
+    Wait for several EUTs starting in parallel. Each EUT is polled until it crosses its threshold (one value
+    for all, or a list with one per EUT) and is then left alone.
+
+    :returns: list of start-up latencies (s), None for the EUTs that did not start within timeout seconds.
+    """
+    if not isinstance(threshold, (list, tuple)):
+        threshold = [threshold] * len(euts)
+    latencies = [None] * len(euts)
+    start = clock.now()
+    last_log = start
+    interval = poll_interval
+    while True:
+        waiting = []
+        for i, eut in enumerate(euts):
+            if latencies[i] is not None:
+                continue
+            m = eut.measurements()
+            power = m.get('W') if m is not None else None
+            if power is not None and power > threshold[i]:
+                latencies[i] = clock.now() - start
+            else:
+                waiting.append((i, power))
+        elapsed = clock.now() - start
+        if not waiting or elapsed >= timeout:
+            break
+        if clock.now() - last_log >= LOG_INTERVAL:
+            for i, power in waiting:
+                name = 'Inverter %d' % (i + 1) if len(euts) > 1 else 'Inverter'
+                ts.log('%s power is at %s. Waiting %0.1f more seconds or until EUT starts...' %
+                       (name, '%0.1f' % power if power is not None else 'unknown', timeout - elapsed))
+            last_log = clock.now()
+        ts.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * backoff, max_poll_interval)
+    return latencies
@@ -0,0 +1,194 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import numpy as np
+from svptools import capture
+
+STEPRESPONSE_DEFAULT_ID = 'stepresponse'
+
+# fractions of the step change that define the rise time (RISE_LOW to RISE_HIGH) and the response time (from the
+# step to RESPONSE_LEVEL)
+RISE_LOW = 0.1
+RISE_HIGH = 0.9
+RESPONSE_LEVEL = 0.9
+
+# samples before a step averaged for the initial value, and the fraction of the step window at its end averaged
+# for the final value
+PRE_SAMPLES = 5
+FINAL_FRACTION = 0.2
+
+# sample interval (ms) used when neither the parameters nor the DAS give one
+SAMPLE_INTERVAL = 50.
+
+METRICS = ['initial', 'final', 'delta', 'rise_time', 'response_time', 'settling_time', 'overshoot', 'error']
+
+
+class StepResponseError(Exception):
+    pass
+
+
+def params(info, group_name=STEPRESPONSE_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Step Response Parameters', glob=True)
+    info.param(gname('mode'), label='Step Response Test', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('steps'), label='Step Levels Between Start and Stop', default=3,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('dwell'), label='Dwell After Each Step (s)', default=10.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('band'), label='Settling Band (% of step)', default=5.,
+               active=gname('mode'), active_value=['Enabled'])
+    info.param(gname('sample_interval'), label='Sample Interval (ms), 0 = DAS interval', default=0,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+def step_levels(nominal, start, stop, steps):
+    """
+    Return the (from, to) steps of a step-response test: from nominal to each of steps levels spread evenly
+    from start (exclusive) to stop (inclusive), and back to nominal after each.
+    """
+    levels = []
+    for level in np.linspace(start, stop, int(steps) + 1)[1:]:
+        levels.append((nominal, float(level)))
+        levels.append((float(level), nominal))
+    return levels
+
+
+def metrics(t, y, starts, expected=None, band=5., pre_samples=PRE_SAMPLES, final_fraction=FINAL_FRACTION,
+            min_step=0.):
+    """
+    Step-response metrics of every step in a capture, computed with whole-array operations.
+
+    Step i starts at sample starts[i] and lasts until the next step or the end of the capture. Its initial value
+    is the mean of up to pre_samples samples before the step, its final value the mean of the last
+    final_fraction of its window. Relative to the change from initial to final value:
+      rise_time      time from RISE_LOW to RISE_HIGH of the change (s)
+      response_time  time from the step to RESPONSE_LEVEL of the change (s)
+      settling_time  time from the step until the response stays within band % of the change of the final
+                     value (s); NaN if it never settles within the window
+      overshoot      largest excursion beyond the final value (% of the change)
+      error          final value minus expected (NaN without expected)
+
+    Metrics of steps that change by no more than min_step, or that have no sample before them, are NaN.
+
+    :returns: dict of metric name -> array with one value per step.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    n = len(y)
+    k = len(starts)
+    if len(t) != n:
+        raise StepResponseError('Time has %d samples, values have %d' % (len(t), n))
+    if k == 0:
+        return dict([(name, np.empty(0)) for name in METRICS])
+    if np.any(np.diff(starts) <= 0) or starts[0] < 0 or starts[-1] >= n:
+        raise StepResponseError('Step start samples must be increasing and within the capture')
+
+    ends = np.append(starts[1:], n)
+    lengths = ends - starts
+    cs = np.concatenate(([0.], np.cumsum(y)))
+
+    prev = np.concatenate(([0], starts[:-1]))
+    m_pre = np.minimum(int(pre_samples), starts - prev)
+    m_fin = np.maximum((lengths * float(final_fraction)).astype(np.int64), 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        initial = np.where(m_pre > 0, (cs[starts] - cs[starts - m_pre]) / m_pre, np.nan)
+        final = (cs[ends] - cs[ends - m_fin]) / m_fin
+        delta = final - initial
+        valid = (m_pre > 0) & (np.abs(delta) > min_step)
+
+    # each sample from the first step on, labelled with its step; the response normalized to 0 before and 1 at
+    # the final value of its step
+    idx = np.arange(starts[0], n)
+    seg = np.repeat(np.arange(k), lengths)
+    offsets = starts - starts[0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r = (y[idx] - initial[seg]) / delta[seg]
+
+    def first(cond):
+        # first sample of each step where cond holds, n if none
+        return np.minimum.reduceat(np.where(cond, idx, n), offsets)
+
+    def at(i):
+        return np.where(i < n, t[np.minimum(i, n - 1)], np.nan)
+
+    with np.errstate(invalid='ignore'):
+        i_low = first(r >= RISE_LOW)
+        i_high = first(r >= RISE_HIGH)
+        i_response = first(r >= RESPONSE_LEVEL)
+        outside = np.abs(y[idx] - final[seg]) > float(band)/100. * np.abs(delta[seg])
+        peak = np.fmax.reduceat(r, offsets)
+    t_step = t[starts]
+    rise_time = at(i_high) - at(i_low)
+    response_time = at(i_response) - t_step
+
+    last_outside = np.maximum.reduceat(np.where(outside, idx, -1), offsets)
+    settled_at = last_outside + 1
+    settling_time = np.where(last_outside < 0, 0., at(settled_at) - t_step)
+    settling_time = np.where(settled_at >= ends, np.nan, settling_time)
+
+    overshoot = np.maximum(peak - 1., 0.) * 100.
+    if expected is not None:
+        error = final - np.asarray(expected, dtype=np.float64)
+    else:
+        error = np.full(k, np.nan)
+
+    result = {'initial': initial, 'final': final, 'delta': delta, 'rise_time': rise_time,
+              'response_time': response_time, 'settling_time': settling_time, 'overshoot': overshoot,
+              'error': error}
+    for name in ['rise_time', 'response_time', 'settling_time', 'overshoot']:
+        result[name] = np.where(valid, result[name], np.nan)
+    return result
+
+
+def summary_value(value):
+    """
+    Summary value of a metric: None for an undefined (NaN) metric, otherwise the float.
+    """
+    if value is None or np.isnan(value):
+        return None
+    return float(value)
+
+
+def capture_init(ts, daq, duration, group_name=STEPRESPONSE_DEFAULT_ID):
+    """
+    Create the background capture that records the DAS at its full rate, or at the configured sample interval,
+    for a step sequence of duration seconds. Returns the capture and its sample interval (s).
+    """
+    interval = ts.param_value(group_name + '.sample_interval')
+    if not interval:
+        interval = getattr(daq, 'sample_interval', None) or SAMPLE_INTERVAL
+    interval = float(interval)/1000.
+    capacity = int(duration/interval) + 1
+    ts.log('Step response capture: up to %d samples at %0.3f s interval' % (capacity, interval))
+    return capture.Capture(daq, capacity, interval, record=True), interval
@@ -0,0 +1,670 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import time
+import json
+import glob
+import hashlib
+import threading
+import subprocess
+import imp
+import argparse
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+SUITES_DIR = 'Suites'
+TESTS_DIR = 'Tests'
+SCRIPTS_DIR = 'Scripts'
+LIB_DIR = 'Lib'
+RESULTS_DIR = 'Results'
+
+# per-member outcome of a suite run, kept in its result directory so an interrupted run can be resumed
+STATE_FILE = 'suite_state.json'
+
+# compiled suites, one file per suite, keyed on the suite and test files they were compiled from
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.svptools', 'suites')
+CACHE_VERSION = 1
+
+PARAM_TYPES = {'int': int, 'float': float, 'string': str, 'bool': lambda v: v.strip().lower() == 'true'}
+
+
+class SuiteError(Exception):
+    pass
+
+
+class Param(object):
+
+    def __init__(self, name, type, value):
+        self.name = name
+        self.type = type
+        self.value = value
+
+    def text(self):
+        if self.type == 'bool':
+            return str(bool(self.value))
+        return str(self.value)
+
+
+def parse_params(element):
+    """
+    Parse the <params> child of a suite, test or rig element into an ordered dict of name -> Param.
+    """
+    params = OrderedDict()
+    params_element = element.find('params')
+    if params_element is None:
+        return params
+    for p in params_element.findall('param'):
+        name = p.get('name')
+        ptype = p.get('type', 'string')
+        text = p.text if p.text is not None else ''
+        try:
+            value = PARAM_TYPES.get(ptype, str)(text)
+        except ValueError, e:
+            raise SuiteError('Invalid %s value for parameter %s: %s' % (ptype, name, text))
+        params[name] = Param(name, ptype, value)
+    return params
+
+
+class TestConfig(object):
+    """
+    A test (.tst) configuration: the script it runs and its parameters.
+    """
+
+    def __init__(self, name, script, params=None):
+        self.name = name
+        self.script = script
+        self.params = params if params is not None else OrderedDict()
+
+    @classmethod
+    def from_file(cls, filename):
+        try:
+            root = ET.parse(filename).getroot()
+        except Exception, e:
+            raise SuiteError('Unable to parse test config %s: %s' % (filename, e))
+        return cls(root.get('name'), root.get('script'), parse_params(root))
+
+    def merged(self, overrides):
+        params = OrderedDict(self.params)
+        params.update(overrides)
+        return TestConfig(self.name, self.script, params)
+
+    def param_value(self, name, default=None):
+        p = self.params.get(name)
+        return p.value if p is not None else default
+
+    def fingerprint(self):
+        values = [self.script] + sorted([(p.name, p.type, p.text()) for p in self.params.values()])
+        return hashlib.sha1(json.dumps(values)).hexdigest()
+
+    def to_file(self, filename):
+        root = ET.Element('scriptConfig', name=self.name, script=self.script)
+        params_element = ET.SubElement(root, 'params')
+        for p in self.params.values():
+            e = ET.SubElement(params_element, 'param', name=p.name, type=p.type)
+            e.text = p.text()
+        ET.ElementTree(root).write(filename)
+
+
+class CompiledConfig(TestConfig):
+    """
+    A suite member compiled once: the test parameters with the suite parameters applied, a plain name -> value
+    dict for parameter lookups and the fingerprint computed up front. The test and suite parameters are kept
+    apart so that outer overrides can still be applied underneath the suite parameters.
+    """
+
+    def __init__(self, name, script, test_params, suite_params, digest=None):
+        params = OrderedDict(test_params)
+        params.update(suite_params)
+        TestConfig.__init__(self, name, script, params)
+        self.test_params = test_params
+        self.suite_params = suite_params
+        self.values = dict([(p.name, p.value) for p in params.values()])
+        self.digest = digest if digest is not None else TestConfig.fingerprint(self)
+
+    def param_value(self, name, default=None):
+        return self.values.get(name, default)
+
+    def fingerprint(self):
+        return self.digest
+
+    def with_overrides(self, overrides):
+        if not overrides:
+            return self
+        params = OrderedDict(self.test_params)
+        params.update(overrides)
+        return CompiledConfig(self.name, self.script, params, self.suite_params)
+
+
+class Suite(object):
+    """
+    A suite (.ste): its members and its parameters. With globals enabled the suite parameters override the
+    member parameters. Member suites are expanded in place.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.svp_dir = os.path.dirname(os.path.dirname(os.path.abspath(filename)))
+        try:
+            root = ET.parse(filename).getroot()
+        except Exception, e:
+            raise SuiteError('Unable to parse suite %s: %s' % (filename, e))
+        self.name = root.get('name')
+        self.globals = root.get('globals', 'False').strip().lower() == 'true'
+        self.params = parse_params(root)
+        self.members = []
+        members_element = root.find('members')
+        if members_element is not None:
+            self.members = [m.get('name') for m in members_element.findall('member')]
+
+    def tests(self, overrides=None):
+        """
+        Return the flattened list of member TestConfigs with the suite parameters applied.
+        """
+        return [config.merged(params) for config, params in self.resolve(overrides)]
+
+    def resolve(self, overrides=None, files=None):
+        """
+        Return (TestConfig, parameters to apply) for every member, member suites expanded. The paths of the
+        suite and test files read are appended to files if given.
+        """
+        if files is not None:
+            files.append(os.path.abspath(self.filename))
+        params = OrderedDict()
+        if overrides:
+            params.update(overrides)
+        if self.globals:
+            params.update(self.params)
+        members = []
+        for member in self.members:
+            if member.endswith('.ste'):
+                sub_suite = Suite(os.path.join(self.svp_dir, SUITES_DIR, member))
+                members.extend(sub_suite.resolve(params, files))
+            else:
+                filename = os.path.join(self.svp_dir, TESTS_DIR, member)
+                if files is not None:
+                    files.append(os.path.abspath(filename))
+                members.append((TestConfig.from_file(filename), params))
+        return members
+
+
+class CompiledSuite(object):
+    """
+    A suite with its members compiled into CompiledConfigs (see compile_suite()). Has the interface of Suite
+    used by the runners.
+    """
+
+    def __init__(self, filename, name, members, files):
+        self.filename = filename
+        self.svp_dir = os.path.dirname(os.path.dirname(os.path.abspath(filename)))
+        self.name = name
+        self.members = members
+        self.files = files
+
+    def tests(self, overrides=None):
+        return [config.with_overrides(overrides) for config in self.members]
+
+
+def file_signature(files):
+    """
+    Return the size and modification time of each file, or None if one of them no longer exists.
+    """
+    sig = []
+    for path in files:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        sig.append([path, st.st_size, st.st_mtime])
+    return sig
+
+
+def _param_list(params):
+    return [[p.name, p.type, p.value] for p in params.values()]
+
+
+def _param_dict(items):
+    params = OrderedDict()
+    for name, ptype, value in items:
+        name = str(name)
+        if isinstance(value, unicode):
+            try:
+                value = str(value)
+            except UnicodeEncodeError:
+                pass
+        params[name] = Param(name, str(ptype), value)
+    return params
+
+
+def validate(config, svp_dir):
+    """
+    Check a compiled member: it names an existing script and all of its parameters are named.
+    """
+    if not config.script:
+        raise SuiteError('Test %s does not name a script' % config.name)
+    script = os.path.join(svp_dir, SCRIPTS_DIR, config.script + '.py')
+    if not os.path.exists(script):
+        raise SuiteError('Script of test %s not found: %s' % (config.name, script))
+    for name in config.params:
+        if not name:
+            raise SuiteError('Test %s has a parameter without a name' % config.name)
+
+
+def cache_path(filename, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, hashlib.sha1(os.path.abspath(filename)).hexdigest() + '.json')
+
+
+def load_compiled(filename, cache_dir=CACHE_DIR):
+    """
+    Return the compiled suite cached for a suite file, or None if there is none or any of the suite and test
+    files it was compiled from changed since. The members are validated again, so a script that was removed or
+    renamed since the suite was compiled is reported before the run.
+    """
+    try:
+        f = open(cache_path(filename, cache_dir))
+        try:
+            cache = json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return None
+    files = [str(path) for path, size, mtime in cache['files']]
+    if file_signature(files) != cache['files']:
+        return None
+    members = [CompiledConfig(str(m['name']), str(m['script']), _param_dict(m['test']), _param_dict(m['suite']),
+                              digest=str(m['fingerprint'])) for m in cache['members']]
+    compiled = CompiledSuite(filename, cache['name'], members, files)
+    for member in members:
+        validate(member, compiled.svp_dir)
+    return compiled
+
+
+def store_compiled(suite, cache_dir=CACHE_DIR):
+    path = cache_path(suite.filename, cache_dir)
+    sig = file_signature(suite.files)
+    if sig is None:
+        return
+    cache = {'version': CACHE_VERSION, 'suite': os.path.abspath(suite.filename), 'name': suite.name,
+             'files': sig,
+             'members': [{'name': c.name, 'script': c.script, 'test': _param_list(c.test_params),
+                          'suite': _param_list(c.suite_params), 'fingerprint': c.digest} for c in suite.members]}
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    tmp = path + '.%d.tmp' % os.getpid()
+    f = open(tmp, 'w')
+    try:
+        json.dump(cache, f, indent=1)
+    finally:
+        f.close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(tmp, path)
+
+
+def compile_suite(filename, cache_dir=CACHE_DIR):
+    """
+    Compile a suite: resolve the suite parameters (with globals) and the test parameters of every member once
+    into a validated CompiledConfig. The result is cached in cache_dir and reused without parsing any XML
+    until one of the suite or test files changes. No cache is used if cache_dir is None.
+
+    The compiled parameters serve the runner (member list, fingerprints, resume). Each member still receives
+    its merged parameters as a .tst config file, which the SVP Script class reads for ts.param_value().
+    """
+    if cache_dir is not None:
+        compiled = load_compiled(filename, cache_dir)
+        if compiled is not None:
+            return compiled
+    suite = Suite(filename)
+    files = []
+    members = []
+    for config, params in suite.resolve(files=files):
+        member = CompiledConfig(config.name, config.script, config.params, params)
+        validate(member, suite.svp_dir)
+        members.append(member)
+    compiled = CompiledSuite(filename, suite.name, members, files)
+    if cache_dir is not None:
+        try:
+            store_compiled(compiled, cache_dir)
+        except (IOError, OSError), e:
+            sys.stderr.write('Unable to cache compiled suite %s: %s\n' % (filename, e))
+    return compiled
+
+
+class Rig(object):
+    """
+    A rig profile: a named set of parameter overrides (der.*, gridsim.*, pvsim.* ...) for one test station.
+    Profiles are XML files in the same format as a test config, with a <rig name="..."> root element.
+    """
+
+    def __init__(self, name, params=None):
+        self.name = name
+        self.params = params if params is not None else OrderedDict()
+
+    @classmethod
+    def from_file(cls, filename):
+        try:
+            root = ET.parse(filename).getroot()
+        except Exception, e:
+            raise SuiteError('Unable to parse rig profile %s: %s' % (filename, e))
+        name = root.get('name') or os.path.splitext(os.path.basename(filename))[0]
+        return cls(name, parse_params(root))
+
+
+class MemberResult(object):
+
+    def __init__(self, config, rig, result_dir):
+        self.config = config
+        self.rig = rig
+        self.result_dir = result_dir
+        self.rc = None
+        self.duration = None
+        self.resumed = False
+
+
+def load_state(results_dir):
+    try:
+        f = open(os.path.join(results_dir, STATE_FILE))
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+    except (IOError, ValueError):
+        return {}
+
+
+def latest_results(suite):
+    """
+    Return the most recent result directory of a suite in the default location, or None.
+    """
+    dirs = sorted(glob.glob(os.path.join(suite.svp_dir, RESULTS_DIR, '%s_*' % suite.name)))
+    return dirs[-1] if dirs else None
+
+
+class ParallelRunner(object):
+    """
+    Runs the members of a suite concurrently, one member per rig at a time. Each member runs in its own
+    process with the rig overrides applied on top of the suite parameters and writes into its own directory
+    under results_dir.
+
+    The member command is built from command, a list of arguments in which {script} and {config} are replaced
+    by the script path and the merged config file path; by default the script is run stand-alone.
+
+    The outcome of each member is recorded in suite_state.json in results_dir. With resume set, members that
+    completed (rc = 0) in an earlier run into the same results_dir with the same configuration are not run
+    again; the others rerun and continue from their own checkpoints (svptools.checkpoint).
+    """
+
+    def __init__(self, suite, rigs, results_dir, command=None, python=None, log=None, resume=False):
+        self.suite = suite
+        self.rigs = rigs
+        self.results_dir = results_dir
+        self.python = python if python is not None else sys.executable
+        self.command = command if command is not None else [self.python, '{script}', '{config}']
+        self.log = log if log is not None else self._log
+        self.resume = resume
+        self.results = []
+        self.state = {}
+        self._lock = threading.Lock()
+        self._queue = []
+
+        if not rigs:
+            raise SuiteError('At least one rig profile is required')
+
+    def _log(self, msg):
+        sys.stdout.write('%s\n' % msg)
+        sys.stdout.flush()
+
+    def _env(self):
+        env = dict(os.environ)
+        path = [os.path.join(self.suite.svp_dir, LIB_DIR), os.path.join(self.suite.svp_dir, SCRIPTS_DIR)]
+        if env.get('PYTHONPATH'):
+            path.append(env['PYTHONPATH'])
+        env['PYTHONPATH'] = os.pathsep.join(path)
+        return env
+
+    def _next(self):
+        with self._lock:
+            if self._queue:
+                return self._queue.pop(0)
+
+    def _member_dir(self, index, config):
+        return os.path.join(self.results_dir, '%02d_%s' % (index + 1, config.name))
+
+    def _completed(self, index, config):
+        """
+        Return the result of a member completed by an earlier run, or None if it has to be run.
+        """
+        entry = self.state.get(os.path.basename(self._member_dir(index, config)))
+        if entry is None or entry.get('rc') != 0 or entry.get('fingerprint') != config.fingerprint():
+            return None
+        member = MemberResult(config, Rig(entry.get('rig')), self._member_dir(index, config))
+        member.rc = 0
+        member.duration = entry.get('duration')
+        member.resumed = True
+        return member
+
+    def _record(self, index, config, member):
+        """
+        Record the outcome of a member in the suite state file. Called with the lock held.
+        """
+        self.state[os.path.basename(member.result_dir)] = {'rc': member.rc, 'rig': member.rig.name,
+                                                           'duration': member.duration,
+                                                           'fingerprint': config.fingerprint()}
+        path = os.path.join(self.results_dir, STATE_FILE)
+        f = open(path + '.tmp', 'w')
+        try:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + '.tmp', path)
+
+    def _run_member(self, index, config, rig):
+        result_dir = self._member_dir(index, config)
+        if not os.path.exists(result_dir):
+            os.makedirs(result_dir)
+        config = config.merged(rig.params)
+        config_file = os.path.join(result_dir, config.name + '.tst')
+        config.to_file(config_file)
+        script = os.path.join(self.suite.svp_dir, SCRIPTS_DIR, config.script + '.py')
+        cmd = [arg.replace('{script}', script).replace('{config}', config_file) for arg in self.command]
+
+        member = MemberResult(config, rig, result_dir)
+        self.log('[%s] Starting %s' % (rig.name, config.name))
+        start = time.time()
+        out = open(os.path.join(result_dir, config.name + '.log'), 'w')
+        try:
+            member.rc = subprocess.call(cmd, cwd=result_dir, env=self._env(), stdout=out, stderr=subprocess.STDOUT)
+        except OSError, e:
+            out.write('Unable to start %s: %s\n' % (cmd, e))
+            member.rc = -1
+        finally:
+            out.close()
+        member.duration = time.time() - start
+        self.log('[%s] Finished %s (rc = %s) in %0.1f seconds' % (rig.name, config.name, member.rc,
+                                                                 member.duration))
+        return member
+
+    def _worker(self, rig):
+        while True:
+            item = self._next()
+            if item is None:
+                break
+            index, config = item
+            member = self._run_member(index, config, rig)
+            with self._lock:
+                self.results.append((index, member))
+                self._record(index, config, member)
+
+    def run(self):
+        if not os.path.exists(self.results_dir):
+            os.makedirs(self.results_dir)
+        self.state = load_state(self.results_dir) if self.resume else {}
+        self._queue = []
+        self.results = []
+        for index, config in enumerate(self.suite.tests()):
+            member = self._completed(index, config)
+            if member is not None:
+                self.log('Skipping %s, completed in an earlier run' % config.name)
+                self.results.append((index, member))
+            else:
+                self._queue.append((index, config))
+        threads = [threading.Thread(target=self._worker, args=(rig,), name=rig.name) for rig in self.rigs]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return [member for index, member in sorted(self.results)]
+
+    def build_workbook(self, excelfile=None):
+        """
+        Build one result workbook over all member directories, if the svpelab result module is available.
+        """
+        try:
+            from svpelab import result as rslt
+        except ImportError, e:
+            self.log('Result workbook not created, svpelab is not available: %s' % e)
+            return None
+        if excelfile is None:
+            excelfile = self.suite.name + '.xlsx'
+        rslt.result_workbook(excelfile, self.results_dir, self.results_dir)
+        return os.path.join(self.results_dir, excelfile)
+
+
+class InProcessRunner(ParallelRunner):
+    """
+    Runs the members of a suite one after another inside this process, so device sessions held by
+    svptools.session stay open from one member to the next. Only the first rig is used.
+    """
+
+    def __init__(self, suite, rigs, results_dir, log=None, resume=False):
+        ParallelRunner.__init__(self, suite, rigs[:1] or [Rig('default')], results_dir, log=log, resume=resume)
+        self.modules = {}
+
+    def _load(self, name):
+        if name not in self.modules:
+            for path in [os.path.join(self.suite.svp_dir, LIB_DIR), os.path.join(self.suite.svp_dir, SCRIPTS_DIR)]:
+                if path not in sys.path:
+                    sys.path.insert(0, path)
+            filename = os.path.join(self.suite.svp_dir, SCRIPTS_DIR, name + '.py')
+            self.modules[name] = imp.load_source(name, filename)
+        return self.modules[name]
+
+    def _run_member(self, index, config, rig):
+        import script
+        from svptools import session
+
+        result_dir = self._member_dir(index, config)
+        if not os.path.exists(result_dir):
+            os.makedirs(result_dir)
+        config = config.merged(rig.params)
+        config_file = os.path.join(result_dir, config.name + '.tst')
+        config.to_file(config_file)
+
+        member = MemberResult(config, rig, result_dir)
+        self.log('[%s] Starting %s' % (rig.name, config.name))
+        start = time.time()
+        cwd = os.getcwd()
+        try:
+            os.chdir(result_dir)
+            module = self._load(config.script)
+            module.run(script.Script(info=module.script_info(), config_file=config_file))
+            member.rc = 0
+        except SystemExit, e:
+            member.rc = e.code if e.code is not None else 0
+        except Exception, e:
+            self.log('[%s] %s failed: %s' % (rig.name, config.name, e))
+            member.rc = -1
+        finally:
+            os.chdir(cwd)
+        member.duration = time.time() - start
+        self.log('[%s] Finished %s (rc = %s) in %0.1f seconds, %d device sessions open' %
+                 (rig.name, config.name, member.rc, member.duration, len(session.sessions)))
+        return member
+
+    def run(self):
+        from svptools import session
+        try:
+            return ParallelRunner.run(self)
+        finally:
+            session.close_all()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Run the members of an SVP suite in parallel across rigs')
+    parser.add_argument('suite', help='suite (.ste) file')
+    parser.add_argument('-r', '--rig', action='append', default=[], help='rig profile file, one per station')
+    parser.add_argument('-o', '--results', default=None, help='result directory')
+    parser.add_argument('--in-process', action='store_true',
+                        help='run the members sequentially in this process, reusing device sessions')
+    parser.add_argument('--no-workbook', action='store_true', help='do not build the result workbook')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='compile the suite from its files without using or updating the compiled suite cache')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run in its result directory (by default the latest one), '
+                             'skipping the members that completed')
+    args = parser.parse_args(args)
+
+    suite = compile_suite(args.suite, cache_dir=None if args.no_cache else CACHE_DIR)
+    rigs = [Rig.from_file(f) for f in args.rig]
+    if not rigs:
+        rigs = [Rig('default')]
+    results_dir = args.results
+    if results_dir is None and args.resume:
+        results_dir = latest_results(suite)
+        if results_dir is None:
+            raise SuiteError('No earlier run of suite %s to resume' % suite.name)
+    if results_dir is None:
+        results_dir = os.path.join(suite.svp_dir, RESULTS_DIR, '%s_%s' % (suite.name,
+                                                                          time.strftime('%Y%m%d_%H%M%S')))
+
+    if args.in_process:
+        runner = InProcessRunner(suite, rigs, results_dir, resume=args.resume)
+    else:
+        runner = ParallelRunner(suite, rigs, results_dir, resume=args.resume)
+    members = runner.run()
+    if not args.no_workbook:
+        runner.build_workbook()
+    failed = [m for m in members if m.rc != 0]
+    for m in members:
+        runner.log('%-20s %-12s rc = %-4s %8.1f s%s' % (m.config.name, m.rig.name, m.rc, m.duration or 0.,
+                                                        ' (earlier run)' if m.resumed else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import time
+import json
+from svptools import trace
+
+FLUSH_ROWS = 20
+FSYNC_INTERVAL = 5.
+
+
+class SummaryError(Exception):
+    pass
+
+
+class Column(object):
+    """
+    Result summary column: the record key, the header label and the format used for the value.
+    """
+
+    def __init__(self, key, label=None, fmt='%s', type='str'):
+        self.key = key
+        self.label = label if label is not None else key
+        self.fmt = fmt
+        self.type = type
+
+
+class ResultSummary(object):
+    """
+    Result summary writer shared by the test scripts.
+
+    Rows are dicts keyed by column key and are written in batches of flush_rows, with an fsync at most every
+    fsync_interval seconds. Data goes to <filename>.tmp, which is renamed over <filename> on close(), so a
+    crash never leaves a partial summary under the final name and a rerun never appends to a stale one. The
+    scripts close the summary at the end of a completed run and again with partial=True from their finally
+    block; a run that failed before that keeps its rows in <filename>.partial. The column schema is written
+    once to <filename minus extension>.schema.json for downstream parsers.
+    """
+
+    def __init__(self, filename, columns, delimiter=', ', flush_rows=FLUSH_ROWS, fsync_interval=FSYNC_INTERVAL):
+        self.filename = filename
+        self.tmp_filename = filename + '.tmp'
+        self.columns = columns
+        self.delimiter = delimiter
+        self.flush_rows = flush_rows
+        self.fsync_interval = fsync_interval
+        self.rows = 0
+        self._pending = []
+        self._last_fsync = time.time()
+
+        self.file = open(self.tmp_filename, 'w')
+        self.file.write(self.delimiter.join([c.label for c in self.columns]) + '\n')
+        self.write_schema()
+
+    def write_schema(self):
+        schema = {'delimiter': self.delimiter,
+                  'header_rows': 1,
+                  'columns': [{'key': c.key, 'label': c.label, 'type': c.type} for c in self.columns]}
+        f = open(os.path.splitext(self.filename)[0] + '.schema.json', 'w')
+        try:
+            json.dump(schema, f, indent=2)
+        finally:
+            f.close()
+
+    def write(self, row):
+        if self.file is None:
+            raise SummaryError('Result summary %s is closed' % self.filename)
+        try:
+            line = self.delimiter.join([c.fmt % (row.get(c.key),) for c in self.columns])
+        except TypeError, e:
+            raise SummaryError('Unable to format result summary row %s: %s' % (row, e))
+        self._pending.append(line + '\n')
+        self.rows += 1
+        if len(self._pending) >= self.flush_rows:
+            self.flush()
+
+    @trace.traced('summary.flush')
+    def flush(self, sync=False):
+        if self._pending:
+            self.file.write(''.join(self._pending))
+            self._pending = []
+        self.file.flush()
+        if sync or time.time() - self._last_fsync >= self.fsync_interval:
+            os.fsync(self.file.fileno())
+            self._last_fsync = time.time()
+
+    def close(self, partial=False):
+        """
+        Flush the remaining rows and move the summary into place, or to <filename>.partial if the run did not
+        complete. Does nothing if the summary is already closed.
+        """
+        if self.file is None:
+            return
+        self.flush(sync=True)
+        self.file.close()
+        self.file = None
+        filename = self.filename + '.partial' if partial else self.filename
+        try:
+            os.rename(self.tmp_filename, filename)
+        except OSError:
+            # os.rename does not replace an existing file on Windows
+            os.remove(filename)
+            os.rename(self.tmp_filename, filename)
@@ -0,0 +1,165 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import bisect
+import numpy as np
+
+SWEEP_DEFAULT_ID = 'sweep'
+
+# values closer than this are the same sweep point
+RESOLUTION = 1e-6
+
+
+class SweepError(Exception):
+    pass
+
+
+def params(info, group_name=SWEEP_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Sweep Parameters', glob=True)
+    info.param(gname('mode'), label='Sweep Point Selection', default='Fixed', values=['Fixed', 'Adaptive'])
+    info.param(gname('tol'), label='Refinement Tolerance (% of rating)', default=5.,
+               active=gname('mode'), active_value=['Adaptive'])
+    info.param(gname('max_depth'), label='Maximum Refinement Depth', default=3,
+               active=gname('mode'), active_value=['Adaptive'])
+
+
+def breakpoint_points(knots, start, stop, coarse, fine, fine_width):
+    """
+    Sweep points from start to stop: every coarse step, plus every fine step within fine_width of each curve
+    knot, so the points are dense around the breakpoints of a piecewise linear curve and sparse elsewhere.
+    """
+    if coarse <= 0 or fine <= 0:
+        raise SweepError('Sweep steps must be positive')
+    points = list(np.arange(start, stop + RESOLUTION, coarse))
+    points.append(stop)
+    for k in knots:
+        points.extend(np.arange(k - fine_width, k + fine_width + RESOLUTION, fine))
+    points = [p for p in points if start - RESOLUTION <= p <= stop + RESOLUTION]
+    return sorted(set([round(p, 6) for p in points]))
+
+
+class Sweep(object):
+    """
+    Fixed list of sweep points. Responses passed to record() are kept in results.
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.results = []
+
+    def __iter__(self):
+        for x in self.values:
+            yield x
+
+    def record(self, x, y):
+        self.results.append((x, y))
+
+    def __len__(self):
+        return len(self.values)
+
+
+class AdaptiveSweep(Sweep):
+    """
+    Sweep that refines itself where the measured response departs from the expected curve.
+
+    When the response recorded for a point differs from the curve (interpolated at that point) by more than
+    tol, the midpoints to its neighbouring points are added, down to max_depth halvings. Points ahead of the
+    current one are swept in order; points behind it are swept in a second pass.
+    """
+
+    def __init__(self, values, curve_x, curve_y, tol, max_depth=3):
+        Sweep.__init__(self, sorted(values))
+        self.curve_x = np.asarray(curve_x, dtype=np.float64)
+        self.curve_y = np.asarray(curve_y, dtype=np.float64)
+        self.tol = float(tol)
+        self.max_depth = int(max_depth)
+        self.refined = 0
+        self._depth = dict([(x, 0) for x in self.values])
+        self._pending = list(self.values)
+        self._revisit = []
+        self._known = list(self.values)
+        self._current = None
+
+    def expected(self, x):
+        return np.interp(x, self.curve_x, self.curve_y)
+
+    def __iter__(self):
+        while self._pending or self._revisit:
+            if self._pending:
+                self._current = self._pending.pop(0)
+            else:
+                self._current = self._revisit.pop(0)
+            yield self._current
+
+    def _add(self, x, depth):
+        x = round(x, 6)
+        i = bisect.bisect_left(self._known, x)
+        for j in (i - 1, i):
+            if 0 <= j < len(self._known) and abs(self._known[j] - x) < RESOLUTION:
+                return
+        self._known.insert(i, x)
+        self._depth[x] = depth
+        self.values.append(x)
+        self.refined += 1
+        if self._current is None or x > self._current:
+            bisect.insort(self._pending, x)
+        else:
+            bisect.insort(self._revisit, x)
+
+    def record(self, x, y):
+        Sweep.record(self, x, y)
+        if y is None:
+            return
+        depth = self._depth.get(x, 0)
+        if abs(y - self.expected(x)) <= self.tol or depth >= self.max_depth:
+            return
+        i = bisect.bisect_left(self._known, x)
+        neighbours = self._known[max(i - 1, 0):i] + self._known[i + 1:i + 2]
+        for n in neighbours:
+            self._add((n + x)/2., depth + 1)
+
+
+def sweep_init(ts, values, curve_x, curve_y, start, stop, coarse, fine, fine_width,
+               group_name=SWEEP_DEFAULT_ID):
+    """
+    Return the sweep for a test: the fixed values, or in adaptive mode points concentrated around the curve
+    knots that are refined against the expected curve as responses are recorded.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Adaptive':
+        return Sweep(values)
+    points = breakpoint_points(curve_x, start, stop, coarse, fine, fine_width)
+    ts.log('Adaptive sweep: %d initial points (fixed sweep has %d)' % (len(points), len(values)))
+    return AdaptiveSweep(points, curve_x, curve_y, ts.param_value(gname('tol')),
+                         ts.param_value(gname('max_depth')))
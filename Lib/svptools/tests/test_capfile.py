@@ -0,0 +1,132 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from svptools import capfile
+from svptools import dataset
+
+POINTS = ['TIME', 'AC_P_1', 'AC_Q_1']
+
+
+class CaptureFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'capture' + capfile.SUFFIX)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, flush_records=capfile.FLUSH_RECORDS):
+        writer = capfile.CaptureWriter(self.filename, POINTS, flush_records=flush_records, meta={'test': 'PF'})
+        writer.append([0., 100., 10.])
+        writer.append({'TIME': 1., 'AC_P_1': 200.})
+        writer.extend([np.array([2., 3.]), np.array([300., 400.]), np.array([30., 40.])])
+        return writer
+
+    def test_round_trip(self):
+        writer = self.write()
+        self.assertEqual(len(writer), 4)
+        writer.close()
+        cap = capfile.CaptureFile(self.filename)
+        try:
+            self.assertEqual(cap.points, POINTS)
+            self.assertEqual(cap.header['meta'], {'test': 'PF'})
+            self.assertEqual(len(cap), 4)
+            self.assertTrue(np.array_equal(cap.column('TIME'), [0., 1., 2., 3.]))
+            self.assertTrue(np.array_equal(cap['AC_P_1'], [100., 200., 300., 400.]))
+            self.assertTrue(np.isnan(cap.column('AC_Q_1')[1]))
+            self.assertEqual([len(b) for b in cap.blocks(size=3)], [3, 1])
+            self.assertRaises(capfile.CaptureFileError, cap.column, 'AC_P_2')
+        finally:
+            cap.close()
+
+    def test_truncated_file(self):
+        writer = self.write()
+        writer.close()
+        f = open(self.filename, 'ab')
+        f.write('\0' * 12)  # part of a record, as left by a crash during a write
+        f.close()
+        cap = capfile.CaptureFile(self.filename)
+        self.assertEqual(len(cap), 4)
+        cap.close()
+
+    def test_unflushed_records(self):
+        writer = self.write(flush_records=100)
+        writer.file.flush()
+        cap = capfile.CaptureFile(self.filename)
+        # the two appended samples are still pending; extend() flushed them before its block
+        self.assertEqual(len(cap), 4)
+        cap.close()
+        writer.close()
+
+    def test_set_column(self):
+        self.write().close()
+        cap = capfile.CaptureFile(self.filename, mode='r+')
+        cap.set_column('AC_Q_1', [1., 2., 3., 4.])
+        self.assertRaises(capfile.CaptureFileError, cap.set_column, 'W_TOTAL', [1., 2., 3., 4.])
+        self.assertRaises(capfile.CaptureFileError, cap.set_column, 'AC_Q_1', [1.])
+        cap.close()
+        cap = capfile.CaptureFile(self.filename)
+        self.assertTrue(np.array_equal(cap.column('AC_Q_1'), [1., 2., 3., 4.]))
+        cap.close()
+
+    def test_dataset_to_csv(self):
+        ds = dataset.ColumnarDataset(POINTS, chunk_size=2)
+        for i in range(5):
+            ds.append([float(i), 100. * i, None])
+        cap = capfile.write(self.filename, ds)
+        try:
+            self.assertEqual(len(cap), 5)
+            csv_filename = os.path.join(self.dir, 'capture.csv')
+            cap.to_csv(csv_filename)
+        finally:
+            cap.close()
+        lines = open(csv_filename).read().splitlines()
+        self.assertEqual(lines[0], 'TIME, AC_P_1, AC_Q_1')
+        self.assertEqual(lines[3], '2, 200, nan')
+        self.assertEqual(len(lines), 6)
+
+    def test_not_a_capture(self):
+        f = open(self.filename, 'wb')
+        f.write('TIME, AC_P_1\n')
+        f.close()
+        self.assertRaises(capfile.CaptureFileError, capfile.CaptureFile, self.filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+from svptools import capture
+
+
+class FakeDAS(object):
+
+    data_points = ['AC_VRMS_1', 'TIME', 'AC_P_1']
+
+    def __init__(self):
+        self.capturing = True
+        self.samples = 0
+
+    def data_capture(self, enable=True):
+        self.capturing = enable
+
+    def data_sample(self):
+        self.samples += 1
+
+    def data_capture_read(self):
+        return {'TIME': float(self.samples), 'AC_VRMS_1': 240., 'AC_P_1': 1000.}
+
+
+class CaptureTest(unittest.TestCase):
+
+    def test_channel_order(self):
+        self.assertEqual(capture.channel_order(['AC_P_1', 'TIME', 'AC_Q_1']), ['TIME', 'AC_P_1', 'AC_Q_1'])
+        self.assertEqual(capture.channel_order(['AC_P_1']), ['AC_P_1'])
+
+    def test_start_owns_das(self):
+        daq = FakeDAS()
+        cap = capture.Capture(daq, 100, 0.01, record=True)
+        cap.start()
+        try:
+            self.assertFalse(daq.capturing)
+        finally:
+            cap.stop()
+        self.assertEqual(cap.dataset.points, ['TIME', 'AC_VRMS_1', 'AC_P_1'])
+        self.assertEqual(cap.buffer.channels, cap.dataset.points)
+        self.assertTrue(len(cap.dataset) >= 1)
+        self.assertEqual(cap.dataset.column('TIME')[0], 1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+import numpy as np
+from svptools import channels
+from svptools import dataset
+
+POINTS = ['TIME', 'AC_P_1', 'AC_P_2', 'AC_P_3', 'AC_Q_1', 'AC_Q_2', 'AC_Q_3', 'AC_VRMS_1', 'AC_VRMS_2', 'AC_VRMS_3']
+
+
+def sample(w, var):
+    rec = {'TIME': 0.}
+    for i in range(1, 4):
+        rec['AC_P_%d' % i] = w/3.
+        rec['AC_Q_%d' % i] = var/3.
+        rec['AC_VRMS_%d' % i] = 230.
+    return rec
+
+
+class StandardChannelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.derived = channels.standard(POINTS, v_nom=230., p_nom=10000.)
+
+    def test_phases(self):
+        self.assertEqual(channels.phases(POINTS), 3)
+        self.assertEqual(channels.phases(['AC_P_1', 'AC_P_3']), 1)
+        self.assertRaises(channels.ChannelError, channels.standard, ['TIME'])
+
+    def test_totals(self):
+        result = self.derived.evaluate(sample(9000., 3000.))
+        self.assertAlmostEqual(result['W_TOTAL'], 9000.)
+        self.assertAlmostEqual(result['VAR_TOTAL'], 3000.)
+        self.assertAlmostEqual(result['W_PU'], 0.9)
+        self.assertAlmostEqual(result['V_PU'], 1.)
+
+    def test_pf_sign_follows_reactive_power(self):
+        lagging = self.derived.evaluate(sample(9000., 3000.))['PF']
+        leading = self.derived.evaluate(sample(9000., -3000.))['PF']
+        self.assertAlmostEqual(lagging, 9000./np.hypot(9000., 3000.))
+        self.assertAlmostEqual(leading, -lagging)
+        self.assertEqual(self.derived.evaluate(sample(9000., 0.))['PF'], 1.)
+
+    def test_pf_sign_vectorized(self):
+        w = np.array([9000., 9000., 5000.])
+        var = np.array([3000., -3000., 0.])
+        data = {}
+        for i in range(1, 4):
+            data['AC_P_%d' % i] = w/3.
+            data['AC_Q_%d' % i] = var/3.
+            data['AC_VRMS_%d' % i] = np.full(3, 230.)
+        pf = self.derived.evaluate(data, ['PF'])['PF']
+        self.assertTrue(np.allclose(np.sign(pf), [1., -1., 1.]))
+
+    def test_missing_value(self):
+        rec = sample(9000., 3000.)
+        rec['AC_P_2'] = None
+        self.assertRaises(channels.ChannelError, self.derived.evaluate, rec, ['W_TOTAL'])
+        del rec['AC_P_2']
+        self.assertRaises(channels.ChannelError, self.derived.evaluate, rec, ['W_TOTAL'])
+
+    def test_only_requested_channels(self):
+        rec = sample(9000., 3000.)
+        rec['AC_Q_1'] = None
+        del rec['AC_VRMS_2']
+        self.assertEqual(self.derived.evaluate(rec, ['W_TOTAL']).keys(), ['W_TOTAL'])
+        self.assertAlmostEqual(self.derived.evaluate(rec, ['W_PU'])['W_PU'], 0.9)
+        self.assertRaises(channels.ChannelError, self.derived.evaluate, rec, ['PF'])
+        self.assertEqual([c.name for c in self.derived.required(['PF'])], ['W_TOTAL', 'VAR_TOTAL', 'PF'])
+
+    def test_apply(self):
+        ds = dataset.ColumnarDataset(POINTS)
+        for w in [1000., 2000., 3000.]:
+            ds.append(sample(w, -w/10.))
+        self.derived.apply(ds, ['W_TOTAL', 'PF'])
+        self.assertTrue(np.allclose(ds.column('W_TOTAL'), [1000., 2000., 3000.]))
+        self.assertTrue((ds.column('PF') < 0).all())
+
+    def test_sample_totals(self):
+        lagging = channels.totals(sample(9000., 3000.))
+        self.assertAlmostEqual(lagging['W'], 9000.)
+        self.assertAlmostEqual(lagging['VAr'], 3000.)
+        self.assertAlmostEqual(lagging['PF'], self.derived.evaluate(sample(9000., 3000.))['PF'])
+        self.assertAlmostEqual(channels.totals(sample(9000., -3000.))['PF'], -lagging['PF'])
+        rec = sample(9000., 3000.)
+        rec['AC_Q_3'] = None
+        self.assertEqual(channels.totals(rec)['PF'], None)
+        self.assertEqual(channels.totals({'AC_P_1': 500., 'AC_PF_1': 0.95}), {'W': 500., 'VAr': None, 'PF': 0.95})
+        self.assertEqual(channels.totals({'TIME': 0.}), {'W': None, 'VAr': None, 'PF': None})
+
+    def test_channel_map(self):
+        class DAS(object):
+            points = ['TIME', 'AC_P_1']
+            sc = {'W_TARG': 0.}
+        self.assertEqual(channels.channel_map(DAS()), ['TIME', 'AC_P_1', 'W_TARG'])
+        self.assertEqual(channels.channel_map(object()), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
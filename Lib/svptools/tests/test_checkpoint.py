@@ -0,0 +1,159 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import unittest
+from svptools import checkpoint
+
+
+class FakeScript(object):
+
+    def __init__(self, result_dir, params):
+        self.result_dir = result_dir
+        self.params = params
+        self.logs = []
+        self.warnings = []
+
+    def param_value(self, name):
+        return self.params.get(name)
+
+    def config_name(self):
+        return 'test'
+
+    def result_file_path(self, name):
+        return os.path.join(self.result_dir, name)
+
+    def result_file(self, name, params=None):
+        pass
+
+    def log(self, msg):
+        self.logs.append(msg)
+
+    def log_warning(self, msg):
+        self.warnings.append(msg)
+
+
+class FakeEUT(object):
+
+    def __init__(self, serial='1234', version='1.0'):
+        self.serial = serial
+        self.version = version
+
+    def info(self):
+        return {'SerialNumber': self.serial, 'Version': self.version}
+
+
+class CheckpointTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.params = {'checkpoint.mode': 'Enabled', 'checkpoint.dir': os.path.join(self.dir, 'cp'),
+                       'checkpoint.max_age': 24., 'test.v_nom': 230.}
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_points(self, params=None, eut=None, points=(1, 2)):
+        ts = FakeScript(self.dir, dict(self.params, **(params or {})))
+        cp = checkpoint.checkpoint_init(ts, eut or FakeEUT())
+        for p in points:
+            if not cp.done(p):
+                cp.record((p,), rows=[{'point': p}])
+        return ts, cp
+
+    def resumed(self, **kwargs):
+        ts, cp = self.run_points(points=(), **kwargs)
+        return ts, len(cp.points)
+
+    def test_resume(self):
+        self.run_points()
+        ts, n = self.resumed()
+        self.assertEqual(n, 2)
+        self.assertFalse(ts.warnings)
+        self.assertTrue([m for m in ts.logs if 'firmware 1.0' in m and '1, 2' in m])
+
+    def test_restore_logged(self):
+        self.run_points()
+        ts, cp = self.run_points(points=())
+        self.assertEqual(cp.restore(1), [{'point': 1}])
+        self.assertTrue([m for m in ts.logs if m.startswith('Restored point 1')])
+
+    def test_parameter_mismatch(self):
+        self.run_points()
+        ts, n = self.resumed(params={'test.v_nom': 240.})
+        self.assertEqual(n, 0)
+        self.assertTrue(ts.warnings)
+
+    def test_ignored_groups(self):
+        self.run_points()
+        ts, n = self.resumed(params={'trace.mode': 'Enabled'})
+        self.assertEqual(n, 2)
+
+    def test_serial_mismatch(self):
+        self.run_points()
+        ts, n = self.resumed(eut=FakeEUT(serial='5678'))
+        self.assertEqual(n, 0)
+
+    def test_firmware_mismatch(self):
+        self.run_points()
+        ts, n = self.resumed(eut=FakeEUT(version='1.1'))
+        self.assertEqual(n, 0)
+        self.assertTrue([m for m in ts.warnings if 'firmware' in m])
+
+    def test_too_old(self):
+        self.run_points()
+        path = os.path.join(self.params['checkpoint.dir'], 'test.json')
+        state = json.load(open(path))
+        state['updated'] = time.time() - 25 * 3600.
+        json.dump(state, open(path, 'w'))
+        ts, n = self.resumed()
+        self.assertEqual(n, 0)
+        self.assertFalse(os.path.exists(path))
+
+    def test_disabled(self):
+        self.run_points(params={'checkpoint.mode': 'Disabled'})
+        self.assertFalse(os.path.exists(self.params['checkpoint.dir']))
+
+    def test_complete_removes(self):
+        ts, cp = self.run_points()
+        cp.complete()
+        ts, n = self.resumed()
+        self.assertEqual(n, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
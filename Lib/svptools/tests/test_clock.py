@@ -0,0 +1,78 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import threading
+import unittest
+from svptools import clock
+
+
+class VirtualClockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = clock.VirtualClock(start=100.)
+        self.stop = threading.Event()
+        self.times = []
+
+    def tearDown(self):
+        self.stop.set()
+
+    def sampler(self, interval):
+        self.times.append(self.clock.time())
+        while not self.clock.wait(self.stop, interval):
+            self.times.append(self.clock.time())
+
+    def test_sleep(self):
+        self.clock.sleep(2.5)
+        self.clock.sleep(0)
+        self.assertEqual(self.clock.time(), 102.5)
+
+    def test_thread_started_before_sleep(self):
+        t = threading.Thread(target=self.sampler, args=(1.,))
+        t.daemon = True
+        self.clock.start(t)
+        self.clock.sleep(5.)
+        self.assertEqual(self.clock.time(), 105.)
+        self.assertEqual(self.times, [100., 101., 102., 103., 104., 105.])
+        self.stop.set()
+        t.join(5.)
+        self.assertFalse(t.is_alive())
+
+    def test_wall_clock_start(self):
+        t = threading.Thread(target=self.times.append, args=(1,))
+        clock.Clock().start(t)
+        t.join(5.)
+        self.assertEqual(self.times, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
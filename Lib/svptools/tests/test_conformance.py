@@ -0,0 +1,83 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+import numpy as np
+from svptools import conformance
+
+
+class PFConformanceTest(unittest.TestCase):
+
+    def checker(self, tol=0.02):
+        return conformance.Conformance(tol=tol, max_failures=100, action='Skip', name='PF', pf=True)
+
+    def test_unity_boundary(self):
+        c = self.checker()
+        self.assertTrue(c.check(1.0, -0.999))
+        self.assertTrue(c.check(-1.0, 0.999))
+        self.assertTrue(c.check(1.0, 1.0))
+        self.assertTrue(c.passed())
+
+    def test_out_of_tolerance(self):
+        c = self.checker()
+        c.check(0.9, -0.9)
+        self.assertEqual(c.failures, 1)
+        self.assertFalse(c.passed())
+
+    def test_signed_targets(self):
+        c = self.checker()
+        self.assertTrue(c.check(-0.95, -0.96))
+        self.assertTrue(c.check(0.95, 0.94))
+        self.assertEqual(c.failures, 0)
+        self.assertTrue(c.check(0.95, -0.95))
+        self.assertEqual(c.failures, 1)
+
+    def test_check_many_matches_check(self):
+        x = np.array([1.0, 1.0, -1.0, 0.9, 0.9, 0.85])
+        y = np.array([-0.999, 0.985, 0.995, 0.91, -0.9, np.nan])
+        ok = self.checker().check_many(x, y)
+        self.assertEqual(list(ok), [True, True, True, True, False, True])
+
+    def test_pf_offset_is_continuous_at_unity(self):
+        self.assertAlmostEqual(float(conformance.pf_offset(0.999) - conformance.pf_offset(-0.999)), 0.002)
+        self.assertEqual(float(conformance.pf_offset(1.0)), 0.)
+        self.assertEqual(float(abs(conformance.pf_offset(-1.0))), 0.)
+
+    def test_curve_tolerance(self):
+        c = conformance.Conformance([0., 10.], [0., 100.], tol=5., max_failures=1, action='Abort')
+        self.assertTrue(c.check(5., 52.))
+        self.assertRaises(conformance.ConformanceError, c.check, 5., 60.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from svptools import drivers
+
+WIDGET = '''
+imported = True
+
+
+class WidgetError(Exception):
+    pass
+
+
+def params(info, group_name='widget', active=None):
+    info.param_group(group_name, label='Widget Parameters', glob=True)
+    info.param(group_name + '.mode', label='Mode', default='Disabled', values=['Disabled', 'Sim'])
+
+
+def widget_init(ts, id=None, group_name='widget'):
+    return ('device', ts.param_value(group_name + '.mode'))
+'''
+
+
+class Info(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def param_group(self, *args, **kwargs):
+        self.calls.append(('param_group', args, kwargs))
+
+    def param(self, *args, **kwargs):
+        self.calls.append(('param', args, kwargs))
+
+
+class Script(object):
+
+    def __init__(self, params):
+        self.params = params
+
+    def param_value(self, name):
+        return self.params.get(name)
+
+
+class DriversTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.dir, 'svpelab'))
+        open(os.path.join(self.dir, 'svpelab', '__init__.py'), 'w').close()
+        f = open(os.path.join(self.dir, 'svpelab', 'widget.py'), 'w')
+        f.write(WIDGET)
+        f.close()
+        self.manifest = os.path.join(self.dir, 'manifest.json')
+        self.saved = dict([(k, v) for k, v in sys.modules.items() if k == 'svpelab' or k.startswith('svpelab.')])
+        for k in self.saved:
+            del sys.modules[k]
+        sys.path.insert(0, self.dir)
+        drivers.signatures.clear()
+
+    def tearDown(self):
+        sys.path.remove(self.dir)
+        for k in [k for k in sys.modules if k == 'svpelab' or k.startswith('svpelab.')]:
+            del sys.modules[k]
+        sys.modules.update(self.saved)
+        drivers.signatures.clear()
+        shutil.rmtree(self.dir)
+
+    def driver(self):
+        return drivers.Driver('widget', drivers.DERError, manifest=self.manifest)
+
+    def test_params_replayed_from_manifest(self):
+        first = Info()
+        self.driver().params(first, active='x.mode')
+        self.assertTrue('svpelab.widget' in sys.modules)
+        del sys.modules['svpelab.widget']
+        second = Info()
+        self.driver().params(second, active='x.mode')
+        self.assertFalse('svpelab.widget' in sys.modules)
+        self.assertEqual(first.calls, second.calls)
+        self.assertEqual(type(second.calls[1][1][0]), str)
+
+    def test_manifest_invalidated_by_driver_change(self):
+        self.driver().params(Info())
+        del sys.modules['svpelab.widget']
+        drivers.signatures.clear()
+        f = open(os.path.join(self.dir, 'svpelab', 'widget_other.py'), 'w')
+        f.close()
+        self.driver().params(Info())
+        self.assertTrue('svpelab.widget' in sys.modules)
+
+    def test_disabled_device_comes_from_the_module(self):
+        d = self.driver()
+        self.assertEqual(d.widget_init(Script({'widget.mode': 'Disabled'})), ('device', 'Disabled'))
+
+    def test_error_class_without_import(self):
+        d = self.driver()
+        self.assertTrue(d.DERError is drivers.DERError)
+        self.assertFalse('svpelab.widget' in sys.modules)
+        self.assertRaises(drivers.DERError, self.raise_error, d)
+
+    def raise_error(self, d):
+        raise d.DERError('Inverter did not start.')
+
+
+if __name__ == '__main__':
+    unittest.main()
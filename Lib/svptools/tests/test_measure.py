@@ -0,0 +1,81 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+from svptools import clock
+from svptools import measure
+
+
+class FakeDER(object):
+
+    def __init__(self):
+        self.reads = 0
+
+    def measurements(self):
+        self.reads += 1
+        return {'W': 1000. * self.reads, 'VAr': 10., 'PF': 0.99, 'Hz': 60.}
+
+
+class MeasurementsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = clock.use(clock.VirtualClock(start=0.))
+        self.eut = FakeDER()
+        self.meas = measure.Measurements(self.eut, points=['W', 'VAr'], max_age=0.05)
+
+    def tearDown(self):
+        clock.use(clock.Clock())
+
+    def test_one_read_per_tick(self):
+        self.assertEqual(self.meas.get('W'), 1000.)
+        self.assertEqual(self.meas.get('VAr'), 10.)
+        self.assertEqual(self.eut.reads, 1)
+        self.clock.sleep(0.1)
+        self.assertEqual(self.meas.get('W'), 2000.)
+        self.assertEqual(self.meas.reads, 2)
+
+    def test_undeclared_point(self):
+        self.meas.get('W')
+        self.assertEqual(self.meas.get('PF'), 0.99)
+        self.assertEqual(self.eut.reads, 2)
+        self.assertEqual(self.meas.measurements(), {'W': 2000., 'VAr': 10., 'PF': 0.99})
+
+    def test_invalidate(self):
+        self.meas.get('W')
+        self.meas.invalidate()
+        self.assertEqual(self.meas.get('W'), 2000.)
+        self.assertEqual(self.meas.get('W', force=True), 3000.)
+
+
+if __name__ == '__main__':
+    unittest.main()
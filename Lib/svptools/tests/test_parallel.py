@@ -0,0 +1,78 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import threading
+import unittest
+from svptools import clock
+from svptools import parallel
+
+
+def fail(msg):
+    raise ValueError(msg)
+
+
+class ParallelTest(unittest.TestCase):
+
+    def tearDown(self):
+        clock.use(clock.Clock())
+
+    def test_assign(self):
+        self.assertEqual(parallel.assign([1, 2, 3, 4, 5], 2), [[1, 3, 5], [2, 4]])
+        self.assertEqual(parallel.channel_kind('der', 1), 'der')
+        self.assertEqual(parallel.channel_kind('der', 3), 'der_3')
+        self.assertEqual(parallel.channel_args(1), {})
+        self.assertEqual(parallel.channel_args(2), {'id': 2})
+
+    def test_threads(self):
+        name = lambda i: threading.current_thread().name
+        self.assertEqual(parallel.run([('ch1', name, (1,)), ('ch2', name, (2,))]), ['ch1', 'ch2'])
+
+    def test_failures_reported(self):
+        done = []
+        jobs = [('ch1', fail, ('no EUT',)), ('ch2', done.append, (2,)), ('ch3', fail, ('no PV',))]
+        try:
+            parallel.run(jobs)
+            self.fail('ParallelError not raised')
+        except parallel.ParallelError, e:
+            self.assertEqual(str(e), 'ch1: no EUT; ch3: no PV')
+        self.assertEqual(done, [2])
+
+    def test_virtual_clock_runs_serially(self):
+        clock.use(clock.VirtualClock())
+        name = lambda i: threading.current_thread().name
+        me = threading.current_thread().name
+        self.assertEqual(parallel.run([('ch1', name, (1,)), ('ch2', name, (2,))]), [me, me])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+from svptools import session
+
+
+class FakeScript(object):
+
+    def __init__(self, params):
+        self.params = params
+        self.logs = []
+        self.warnings = []
+
+    def param_value(self, name):
+        return self.params.get(name)
+
+    def log(self, msg):
+        self.logs.append(msg)
+
+    def log_warning(self, msg):
+        self.warnings.append(msg)
+
+
+class FakeDER(object):
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.closed = False
+        self.fail = fail
+
+    def info(self):
+        return 'Fake DER'
+
+    def config(self):
+        self.calls.append('config')
+
+    def close(self):
+        self.closed = True
+
+    def fixed_pf(self, params=None):
+        if self.fail:
+            raise IOError('no response')
+        self.calls.append(('fixed_pf', params))
+
+    def limit_max_power(self, params=None):
+        self.calls.append(('limit_max_power', params))
+
+
+class SessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.ts = FakeScript({'session.mode': 'Enabled', 'der.mode': 'SunSpec', 'der.sunspec.slave_id': 1})
+        self.created = []
+
+    def tearDown(self):
+        session.close_all()
+
+    def init(self, ts, fail=False):
+        handle = FakeDER(fail)
+        self.created.append(handle)
+        return handle
+
+    def test_reuse_resets_and_configures(self):
+        eut = session.acquire(self.ts, 'der', self.init, config=True)
+        session.release(self.ts, eut)
+        self.assertEqual(eut.calls, ['config', ('fixed_pf', {'Ena': False}), ('limit_max_power', {'Ena': False})])
+        again = session.acquire(self.ts, 'der', self.init, config=True)
+        self.assertTrue(again is eut)
+        self.assertEqual(len(self.created), 1)
+        self.assertEqual(eut.calls[-1], 'config')
+
+    def test_failed_reset_closes(self):
+        eut = session.acquire(self.ts, 'der', self.init, config=True, fail=True)
+        session.release(self.ts, eut)
+        self.assertTrue(eut.closed)
+        self.assertEqual(len(self.ts.warnings), 1)
+        session.acquire(self.ts, 'der', self.init, config=True)
+        self.assertEqual(len(self.created), 2)
+
+    def test_changed_parameters(self):
+        eut = session.acquire(self.ts, 'der', self.init)
+        session.release(self.ts, eut)
+        self.ts.params['der.sunspec.slave_id'] = 2
+        session.acquire(self.ts, 'der', self.init)
+        self.assertTrue(eut.closed)
+        self.assertEqual(len(self.created), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+from svptools import clock
+from svptools import settle
+
+
+class FakeScript(object):
+
+    def __init__(self):
+        self.warnings = []
+
+    def sleep(self, seconds):
+        clock.clock.sleep(seconds)
+
+    def log_warning(self, msg):
+        self.warnings.append(msg)
+
+
+def reader(values):
+    """
+    Return a reader that reports the next W value on each call, then repeats the last one.
+    """
+    values = list(values)
+
+    def read():
+        if len(values) > 1:
+            return {'W': values.pop(0), 'VAr': None, 'PF': None}
+        return {'W': values[0], 'VAr': None, 'PF': None}
+    return read
+
+
+class SettleTest(unittest.TestCase):
+
+    def setUp(self):
+        clock.use(clock.VirtualClock(start=0.))
+        self.ts = FakeScript()
+
+    def tearDown(self):
+        clock.use(clock.Clock())
+
+    def test_settles(self):
+        s = settle.Settle(self.ts, read=reader([0., 500., 900., 1000., 1010., 1000.]), window=3, min_time=0.5,
+                          max_time=5., poll_interval=0.2)
+        elapsed = s.wait()
+        # steady once 1000, 1010 and 1000 are the last three readings, polled at 0.5, 0.7, ... 1.5 s
+        self.assertAlmostEqual(elapsed, 1.5)
+        self.assertEqual(s.history, [(elapsed, True)])
+        self.assertEqual(self.ts.warnings, [])
+
+    def test_does_not_settle(self):
+        s = settle.Settle(self.ts, read=reader(range(0, 10000, 100)), min_time=0.5, max_time=2.,
+                          poll_interval=0.2)
+        elapsed = s.wait()
+        self.assertTrue(elapsed <= 2.)
+        self.assertEqual(s.history[0][1], False)
+        self.assertEqual(len(self.ts.warnings), 1)
+
+    def test_disabled_uses_dwell(self):
+        s = settle.Settle(self.ts, read=reader([0.]), enabled=False)
+        self.assertAlmostEqual(s.wait(2.), 2.)
+        self.assertAlmostEqual(s.wait(), s.max_time)
+        self.assertAlmostEqual(s.total_time(), 2. + s.max_time)
+
+    def test_no_data_uses_dwell(self):
+        s = settle.Settle(self.ts, read=lambda: None, min_time=0.5)
+        self.assertAlmostEqual(s.wait(3.), 3.)
+
+    def test_steady(self):
+        s = settle.Settle(self.ts, tol={'W': 50., 'PF': 0.01}, window=3)
+        steady = [{'W': 1000., 'PF': 0.95}, {'W': 1020., 'PF': 0.951}, {'W': 1010., 'PF': None}]
+        self.assertFalse(s.steady(steady[:2]))
+        self.assertFalse(s.steady(steady))  # PF has only two readings in the window
+        steady[2]['PF'] = 0.95
+        self.assertTrue(s.steady(steady))
+        steady.append({'W': 1100., 'PF': 0.95})
+        self.assertFalse(s.steady(steady))
+        self.assertRaises(settle.SettleError, settle.Settle, self.ts, min_time=2., max_time=1.)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+import numpy as np
+from svptools import stepresponse
+
+TAU = 0.5
+DT = 0.01
+
+
+def first_order(levels, step_times, t):
+    """
+    First-order response with time constant TAU to steps to levels at step_times, starting at 0.
+    """
+    y = np.zeros(len(t))
+    value = 0.
+    for level, t_step in zip(levels, step_times):
+        after = t >= t_step
+        y[after] = level + (value - level) * np.exp(-(t[after] - t_step) / TAU)
+        value = level
+    return y
+
+
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.t = np.arange(0., 30., DT)
+        self.y = first_order([100., 40.], [5., 15.], self.t)
+        self.starts = [int(round(5. / DT)), int(round(15. / DT))]
+
+    def test_first_order(self):
+        m = stepresponse.metrics(self.t, self.y, self.starts, expected=[100., 45.], band=5.)
+        self.assertTrue(np.allclose(m['initial'], [0., 100.], atol=1e-4))
+        self.assertTrue(np.allclose(m['final'], [100., 40.], atol=1e-4))
+        self.assertTrue(np.allclose(m['delta'], [100., -60.], atol=1e-4))
+        self.assertTrue(np.allclose(m['rise_time'], TAU * np.log(9.), atol=2 * DT))
+        self.assertTrue(np.allclose(m['response_time'], TAU * np.log(10.), atol=2 * DT))
+        self.assertTrue(np.allclose(m['settling_time'], TAU * np.log(20.), atol=2 * DT))
+        self.assertTrue(np.allclose(m['overshoot'], 0., atol=1e-3))
+        self.assertTrue(np.allclose(m['error'], [0., -5.], atol=1e-4))
+
+    def test_overshoot(self):
+        t = np.arange(40) * DT
+        y = np.zeros(40)
+        y[10:15] = 110.
+        y[15:] = 100.
+        m = stepresponse.metrics(t, y, [10], band=5.)
+        self.assertAlmostEqual(m['overshoot'][0], 10.)
+        self.assertAlmostEqual(m['rise_time'][0], 0.)
+        self.assertAlmostEqual(m['settling_time'][0], 5 * DT)
+        self.assertTrue(np.isnan(m['error'][0]))
+
+    def test_never_settles(self):
+        t = np.arange(100) * DT
+        y = np.zeros(100)
+        y[50:] = 100.
+        y[50::2] = 80.
+        m = stepresponse.metrics(t, y, [50], band=5.)
+        self.assertTrue(np.isnan(m['settling_time'][0]))
+
+    def test_undefined_steps(self):
+        m = stepresponse.metrics(self.t, self.y, [0] + self.starts)
+        self.assertTrue(np.isnan(m['rise_time'][0]))
+        self.assertFalse(np.isnan(m['rise_time'][1]))
+        m = stepresponse.metrics(self.t, self.y, self.starts, min_step=80.)
+        self.assertFalse(np.isnan(m['response_time'][0]))
+        self.assertTrue(np.isnan(m['response_time'][1]))
+        m = stepresponse.metrics(self.t, self.y, [])
+        self.assertEqual(sorted(m.keys()), sorted(stepresponse.METRICS))
+        self.assertEqual(len(m['final']), 0)
+
+    def test_invalid_starts(self):
+        self.assertRaises(stepresponse.StepResponseError, stepresponse.metrics, self.t, self.y, [10, 10])
+        self.assertRaises(stepresponse.StepResponseError, stepresponse.metrics, self.t, self.y, [len(self.t)])
+        self.assertRaises(stepresponse.StepResponseError, stepresponse.metrics, self.t[:-1], self.y, [10])
+
+    def test_step_levels(self):
+        self.assertEqual(stepresponse.step_levels(60., 60.5, 61.5, 2),
+                         [(60., 61.), (61., 60.), (60., 61.5), (61.5, 60.)])
+
+    def test_summary_value(self):
+        self.assertEqual(stepresponse.summary_value(np.float64(1.5)), 1.5)
+        self.assertEqual(stepresponse.summary_value(np.nan), None)
+        self.assertEqual(stepresponse.summary_value(None), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from svptools import suite as svp_suite
+
+SUITE = '''<suite globals="True" name="Rig">
+  <members>
+    <member name="FW.tst" />
+  </members>
+  <params>
+    <param name="test.wait_time" type="float">%s</param>
+  </params>
+</suite>
+'''
+
+TEST = '''<scriptConfig name="FW" script="freq_watt">
+  <params>
+    <param name="test.wait_time" type="float">1.0</param>
+    <param name="test.n_r" type="int">3</param>
+  </params>
+</scriptConfig>
+'''
+
+
+class LoadCompiledTest(unittest.TestCase):
+
+    def setUp(self):
+        self.svp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.svp_dir, 'cache')
+        for name in [svp_suite.SUITES_DIR, svp_suite.TESTS_DIR, svp_suite.SCRIPTS_DIR]:
+            os.mkdir(os.path.join(self.svp_dir, name))
+        self.suite_file = os.path.join(self.svp_dir, svp_suite.SUITES_DIR, 'Rig.ste')
+        self.script_file = os.path.join(self.svp_dir, svp_suite.SCRIPTS_DIR, 'freq_watt.py')
+        self.write(self.suite_file, SUITE % '0.5')
+        self.write(os.path.join(self.svp_dir, svp_suite.TESTS_DIR, 'FW.tst'), TEST)
+        self.write(self.script_file, '')
+
+    def tearDown(self):
+        shutil.rmtree(self.svp_dir)
+
+    def write(self, path, text, mtime=1000000000):
+        f = open(path, 'w')
+        try:
+            f.write(text)
+        finally:
+            f.close()
+        os.utime(path, (mtime, mtime))
+
+    def test_cache_hit(self):
+        compiled = svp_suite.compile_suite(self.suite_file, self.cache_dir)
+        cached = svp_suite.load_compiled(self.suite_file, self.cache_dir)
+        self.assertIsNotNone(cached)
+        self.assertEqual([c.name for c in cached.members], ['FW'])
+        self.assertEqual(cached.members[0].fingerprint(), compiled.members[0].fingerprint())
+        self.assertEqual(cached.members[0].param_value('test.wait_time'), 0.5)
+        self.assertEqual(cached.members[0].param_value('test.n_r'), 3)
+
+    def test_no_cache(self):
+        self.assertIsNone(svp_suite.load_compiled(self.suite_file, self.cache_dir))
+
+    def test_suite_changed(self):
+        first = svp_suite.compile_suite(self.suite_file, self.cache_dir)
+        self.write(self.suite_file, SUITE % '2.5', mtime=1000000010)
+        self.assertIsNone(svp_suite.load_compiled(self.suite_file, self.cache_dir))
+        second = svp_suite.compile_suite(self.suite_file, self.cache_dir)
+        self.assertEqual(second.members[0].param_value('test.wait_time'), 2.5)
+        self.assertNotEqual(first.members[0].fingerprint(), second.members[0].fingerprint())
+
+    def test_script_removed(self):
+        svp_suite.compile_suite(self.suite_file, self.cache_dir)
+        os.remove(self.script_file)
+        self.assertRaises(svp_suite.SuiteError, svp_suite.load_compiled, self.suite_file, self.cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
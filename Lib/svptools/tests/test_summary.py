@@ -0,0 +1,83 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from svptools import summary
+
+
+class ResultSummaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, 'result_summary.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def summary(self):
+        s = summary.ResultSummary(self.filename, [summary.Column('freq', 'Frequency (Hz)', type='float'),
+                                                  summary.Column('w_pct', 'Active Power (%)', type='float')])
+        s.write({'freq': 60.0, 'w_pct': 100.0})
+        return s
+
+    def read(self, path):
+        f = open(path)
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def test_complete(self):
+        s = self.summary()
+        s.close()
+        s.close(partial=True)
+        self.assertEqual(self.read(self.filename), 'Frequency (Hz), Active Power (%)\n60.0, 100.0\n')
+        self.assertFalse(os.path.exists(self.filename + '.partial'))
+        self.assertFalse(os.path.exists(s.tmp_filename))
+
+    def test_partial(self):
+        f = open(self.filename, 'w')
+        f.write('previous run\n')
+        f.close()
+        s = self.summary()
+        s.close(partial=True)
+        self.assertEqual(self.read(self.filename), 'previous run\n')
+        self.assertEqual(self.read(self.filename + '.partial'), 'Frequency (Hz), Active Power (%)\n60.0, 100.0\n')
+        self.assertFalse(os.path.exists(s.tmp_filename))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import unittest
+from svptools import sweep
+
+
+def response(x):
+    # follows the curve y = x except for a 10 unit error within 6 of x = 20
+    return x + (10. if abs(x - 20.) <= 6. else 0.)
+
+
+class SweepTest(unittest.TestCase):
+
+    def test_breakpoint_points(self):
+        self.assertEqual(sweep.breakpoint_points([45., 50.], 40., 60., 5., 1., 2.),
+                         [40., 43., 44., 45., 46., 47., 48., 49., 50., 51., 52., 55., 60.])
+        self.assertEqual(sweep.breakpoint_points([], 0., 1., 0.4, 0.1, 0.), [0., 0.4, 0.8, 1.])
+        self.assertRaises(sweep.SweepError, sweep.breakpoint_points, [], 0., 1., 0., 0.1, 0.)
+
+    def test_fixed(self):
+        s = sweep.Sweep([1., 2., 3.])
+        for x in s:
+            s.record(x, response(x))
+        self.assertEqual(len(s), 3)
+        self.assertEqual(s.results, [(1., 1.), (2., 2.), (3., 3.)])
+
+    def test_refinement(self):
+        s = sweep.AdaptiveSweep([40, 0, 10, 20, 30], [0., 40.], [0., 40.], tol=1., max_depth=2)
+        order = []
+        for x in s:
+            order.append(x)
+            s.record(x, response(x))
+        # points ahead of the current one are swept in order, those behind it in a second pass
+        self.assertEqual(order, [0, 10, 20, 25., 27.5, 30, 40, 15., 17.5, 12.5, 22.5])
+        self.assertEqual(s.refined, 6)
+        self.assertEqual(sorted(s.values), [0, 10, 12.5, 15., 17.5, 20, 22.5, 25., 27.5, 30, 40])
+        self.assertEqual(len(s.results), len(s.values))
+
+    def test_no_refinement(self):
+        s = sweep.AdaptiveSweep([0, 10, 20], [0., 40.], [0., 40.], tol=1.)
+        for x in s:
+            s.record(x, None if x == 10 else float(x))
+        self.assertEqual(s.refined, 0)
+        self.assertEqual(s.values, [0, 10, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import unittest
+import subprocess
+from svptools import workbook
+
+
+class LockTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'test.xlsx.lock')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_lock(self, pid, created):
+        f = open(self.path, 'w')
+        try:
+            json.dump({'pid': pid, 'time': created}, f)
+        finally:
+            f.close()
+
+    def dead_pid(self):
+        p = subprocess.Popen([sys.executable, '-c', 'pass'])
+        p.wait()
+        return p.pid
+
+    def test_owner_recorded(self):
+        with workbook.Lock(self.path) as lock:
+            self.assertEqual(lock.owner()[0], os.getpid())
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_dead_owner_is_broken(self):
+        self.write_lock(self.dead_pid(), time.time())
+        start = time.time()
+        logs = []
+        with workbook.Lock(self.path, timeout=5., log=logs.append):
+            pass
+        self.assertTrue(time.time() - start < 1.)
+        self.assertEqual(len(logs), 1)
+        self.assertTrue(logs[0].startswith('Breaking stale workbook lock'))
+
+    def test_old_lock_is_broken(self):
+        self.write_lock(os.getpid(), time.time() - 2 * workbook.LOCK_STALE)
+        with workbook.Lock(self.path, timeout=5., log=lambda msg: None):
+            pass
+
+    def test_unreadable_old_lock_is_broken(self):
+        open(self.path, 'w').close()
+        old = time.time() - 2 * workbook.LOCK_STALE
+        os.utime(self.path, (old, old))
+        with workbook.Lock(self.path, timeout=5., log=lambda msg: None):
+            pass
+
+    def test_live_owner_times_out(self):
+        self.write_lock(os.getpid(), time.time())
+        lock = workbook.Lock(self.path, timeout=0.2)
+        self.assertRaises(workbook.WorkbookError, lock.__enter__)
+        self.assertTrue(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import csv
+import json
+import time
+import threading
+import functools
+
+TRACE_DEFAULT_ID = 'trace'
+
+TRACE_FILE = 'trace.json'
+SUMMARY_FILE = 'trace_summary.csv'
+
+# events beyond this are only counted in the summary, to bound memory on long high-rate runs
+MAX_EVENTS = 200000
+
+
+def params(info, group_name=TRACE_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Timing Trace Parameters', glob=True)
+    info.param(gname('mode'), label='Timing Trace', default='Enabled', values=['Enabled', 'Disabled'])
+
+
+class _NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, tracer, name, cat):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *args):
+        self.tracer.record(self.name, self.cat, self.start, time.time() - self.start)
+        return False
+
+
+class Tracer(object):
+    """
+    Records timed spans as (name, category, start, duration, thread) events, plus per-name totals. Recording is
+    an append under the GIL, so the tracer can stay enabled in production runs.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.max_events = max_events
+        self.enabled = False
+        self.reset()
+
+    def reset(self):
+        self.t0 = time.time()
+        self.events = []
+        self.dropped = 0
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def span(self, name, cat='script'):
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, cat)
+
+    def record(self, name, cat, start, duration):
+        tid = threading.current_thread().name
+        if len(self.events) < self.max_events:
+            self.events.append((name, cat, start, duration, tid))
+        else:
+            self.dropped += 1
+        with self.lock:
+            t = self.totals.get(name)
+            if t is None:
+                self.totals[name] = [cat, 1, duration, duration]
+            else:
+                t[1] += 1
+                t[2] += duration
+                if duration > t[3]:
+                    t[3] = duration
+
+    def chrome_trace(self):
+        """
+        Return the events in Chrome trace (chrome://tracing, Perfetto) JSON format.
+        """
+        pid = os.getpid()
+        events = []
+        for name, cat, start, duration, tid in self.events:
+            events.append({'name': name, 'cat': cat, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': int((start - self.t0)*1e6), 'dur': int(duration*1e6)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def summary(self):
+        """
+        Return (name, category, count, total, mean, max, % of wall time) rows sorted by total time.
+        """
+        wall = time.time() - self.t0
+        rows = []
+        for name, (cat, count, total, longest) in self.totals.items():
+            rows.append((name, cat, count, total, total/count, longest, 100.*total/wall if wall > 0 else 0.))
+        return sorted(rows, key=lambda r: r[3], reverse=True)
+
+
+tracer = Tracer()
+
+
+def span(name, cat='script'):
+    return tracer.span(name, cat)
+
+
+def traced(name, cat='svptools'):
+    """
+    Decorator that records each call of the function as a span.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with tracer.span(name, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class Instrumented(object):
+    """
+    Proxy for a driver handle that records each method call as a span named <kind>.<method>. Attribute reads
+    and writes go to the handle.
+    """
+
+    def __init__(self, target, kind):
+        object.__setattr__(self, 'traced_target', target)
+        object.__setattr__(self, 'traced_kind', kind)
+
+    def __getattr__(self, name):
+        attr = getattr(self.traced_target, name)
+        if not callable(attr) or name.startswith('_'):
+            return attr
+        span_name = '%s.%s' % (self.traced_kind, name)
+
+        def call(*args, **kwargs):
+            with tracer.span(span_name, self.traced_kind):
+                return attr(*args, **kwargs)
+        return call
+
+    def __setattr__(self, name, value):
+        setattr(self.traced_target, name, value)
+
+
+def instrument(handle, kind):
+    """
+    Return the handle wrapped so its driver calls are traced, or the handle itself if tracing is off.
+    """
+    if handle is None or not tracer.enabled or isinstance(handle, Instrumented):
+        return handle
+    return Instrumented(handle, kind)
+
+
+def unwrap(handle):
+    return getattr(handle, 'traced_target', handle) if isinstance(handle, Instrumented) else handle
+
+
+def trace_init(ts, group_name=TRACE_DEFAULT_ID):
+    """
+    Start a fresh trace for the test if tracing is enabled.
+    """
+    tracer.reset()
+    tracer.enabled = ts.param_value(group_name + '.mode') == 'Enabled'
+    return tracer
+
+
+def trace_save(ts):
+    """
+    Write the Chrome trace and the per-span summary table to the result directory. The summary is a plain CSV
+    without a result summary schema, so it is not taken for test results. Errors are logged, never raised, so
+    tracing cannot fail a test.
+    """
+    if not tracer.enabled:
+        return
+
+    try:
+        f = open(ts.result_file_path(TRACE_FILE), 'w')
+        try:
+            json.dump(tracer.chrome_trace(), f)
+        finally:
+            f.close()
+        ts.result_file(TRACE_FILE)
+
+        f = open(ts.result_file_path(SUMMARY_FILE), 'wb')
+        try:
+            out = csv.writer(f)
+            out.writerow(['Span', 'Category', 'Count', 'Total (s)', 'Mean (s)', 'Max (s)', 'Wall Time (%)'])
+            for name, cat, count, total, mean, longest, pct in tracer.summary():
+                out.writerow([name, cat, count, '%0.4f' % total, '%0.6f' % mean, '%0.6f' % longest, '%0.1f' % pct])
+        finally:
+            f.close()
+        ts.result_file(SUMMARY_FILE)
+
+        for name, cat, count, total, mean, longest, pct in tracer.summary()[:10]:
+            ts.log_debug('Trace: %-32s %6d calls %9.3f s (%0.1f%%)' % (name, count, total, pct))
+        if tracer.dropped:
+            ts.log_debug('Trace: %d events beyond the first %d were only summarized' %
+                         (tracer.dropped, tracer.max_events))
+    except Exception, e:
+        ts.log_warning('Unable to save timing trace: %s' % e)
+    finally:
+        tracer.enabled = False
@@ -0,0 +1,201 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import threading
+from svptools import clock
+
+TRAJECTORY_DEFAULT_ID = 'trajectory'
+
+# time before a deadline at which the scheduler stops sleeping and spins
+SPIN_TIME = 0.002
+MONITOR_INTERVAL = 0.5
+
+
+class TrajectoryError(Exception):
+    pass
+
+
+def params(info, group_name=TRAJECTORY_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Setpoint Trajectory Parameters', glob=True)
+    info.param(gname('mode'), label='Run Sweep as Trajectory', default='Disabled', values=['Enabled', 'Disabled'])
+    info.param(gname('dwell'), label='Dwell per Point (s)', default=1.,
+               active=gname('mode'), active_value=['Enabled'])
+
+
+class Trajectory(object):
+    """
+    Applies a list of setpoints with per-point dwell times from a scheduler thread. Deadlines are computed from
+    the start of the trajectory rather than from the previous point, so host loop delays do not accumulate,
+    and the last few milliseconds before each deadline are spun rather than slept. The scheduled and actual
+    time of each point are recorded in applied.
+    """
+
+    def __init__(self, setter, values, dwell, name='trajectory'):
+        self.setter = setter
+        self.values = list(values)
+        if isinstance(dwell, (list, tuple)):
+            self.dwell = [float(d) for d in dwell]
+        else:
+            self.dwell = [float(dwell)] * len(self.values)
+        if len(self.dwell) != len(self.values):
+            raise TrajectoryError('%d dwell times given for %d points' % (len(self.dwell), len(self.values)))
+        self.name = name
+        self.applied = []
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def duration(self):
+        return sum(self.dwell)
+
+    def _run(self):
+        start = clock.now()
+        deadline = start
+        # a virtual clock only moves when the test sleeps, so there is nothing to spin for
+        spin = 0. if clock.is_virtual() else SPIN_TIME
+        try:
+            for i, value in enumerate(self.values):
+                while True:
+                    remaining = deadline - clock.now()
+                    if remaining <= 0:
+                        break
+                    if remaining > spin:
+                        if clock.wait(self._stop, remaining - spin):
+                            return
+                if self._stop.is_set():
+                    return
+                self.setter(value)
+                self.applied.append((i, value, deadline - start, clock.now() - start))
+                deadline += self.dwell[i]
+            remaining = deadline - clock.now()
+            if remaining > 0:
+                clock.wait(self._stop, remaining)
+        except Exception, e:
+            self.error = e
+
+    def start(self):
+        self.applied = []
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self, ts, monitor=None, interval=MONITOR_INTERVAL):
+        """
+        Run the trajectory and block until it completes. monitor(index, value) is called from this thread
+        whenever a new point has been applied since the last check.
+        """
+        self.start()
+        reported = 0
+        try:
+            while self.running():
+                ts.sleep(interval)
+                if monitor is not None:
+                    applied = self.applied[reported:]
+                    for i, value, scheduled, actual in applied:
+                        monitor(i, value)
+                    reported += len(applied)
+        finally:
+            self.stop()
+        if monitor is not None:
+            for i, value, scheduled, actual in self.applied[reported:]:
+                monitor(i, value)
+        if self.error is not None:
+            raise TrajectoryError('Trajectory %s failed: %s' % (self.name, self.error))
+        return self.applied
+
+    def jitter(self):
+        """
+        Return the mean and maximum lateness (s) of the applied points.
+        """
+        late = [actual - scheduled for i, value, scheduled, actual in self.applied]
+        if not late:
+            return 0., 0.
+        return sum(late)/len(late), max(late)
+
+
+class NativeTrajectory(Trajectory):
+    """
+    Trajectory uploaded to a simulator that can play a timed profile itself, through a driver method
+    trajectory(kind, values, dwell) that starts playback and returns immediately.
+    """
+
+    def __init__(self, device, kind, values, dwell, name='trajectory'):
+        Trajectory.__init__(self, None, values, dwell, name=name)
+        self.device = device
+        self.kind = kind
+
+    def _run(self):
+        start = clock.now()
+        try:
+            self.device.trajectory(self.kind, self.values, self.dwell)
+        except Exception, e:
+            self.error = e
+            return
+        t = 0.
+        for i, value in enumerate(self.values):
+            self.applied.append((i, value, t, t))
+            t += self.dwell[i]
+        remaining = start + self.duration() - clock.now()
+        if remaining > 0:
+            clock.wait(self._stop, remaining)
+
+
+def trajectory_init(ts, device, kind, values, dwell=None, group_name=TRAJECTORY_DEFAULT_ID):
+    """
+    Return a trajectory for the device setpoint kind ('voltage', 'freq', 'irradiance'), or None if trajectory
+    mode is disabled. The profile is uploaded to the device when its driver supports it, otherwise it is run
+    from the scheduler thread.
+    """
+    gname = lambda name: group_name + '.' + name
+    if ts.param_value(gname('mode')) != 'Enabled':
+        return None
+    if dwell is None:
+        dwell = ts.param_value(gname('dwell'))
+    if hasattr(device, 'trajectory'):
+        ts.log('Uploading %d point %s trajectory to the simulator' % (len(values), kind))
+        return NativeTrajectory(device, kind, values, dwell, name=kind)
+    setter = getattr(device, kind, None)
+    if setter is None:
+        raise TrajectoryError('Device does not support %s setpoints' % kind)
+    ts.log('Running %d point %s trajectory from the host scheduler' % (len(values), kind))
+    return Trajectory(setter, values, dwell, name=kind)
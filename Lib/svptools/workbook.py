@@ -0,0 +1,466 @@
+'''
+Copyright (c) 2018, Sandia National Labs and SunSpec Alliance
+All rights reserved.
+
+Redistribution and use in source and binary forms, with or without modification,
+are permitted provided that the following conditions are met:
+
+Redistributions of source code must retain the above copyright notice, this
+list of conditions and the following disclaimer.
+
+Redistributions in binary form must reproduce the above copyright notice, this
+list of conditions and the following disclaimer in the documentation and/or
+other materials provided with the distribution.
+
+Neither the names of the Sandia National Labs and SunSpec Alliance nor the names of its
+contributors may be used to endorse or promote products derived from
+this software without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE LIABLE FOR
+ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+(INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON
+ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+(INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+Written by Sandia National Laboratories, Loggerware, and SunSpec Alliance
+Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
+'''
+
+import os
+import sys
+import csv
+import json
+import time
+import errno
+import pickle
+import hashlib
+import subprocess
+from svptools import capfile
+from svptools import trace
+
+WORKBOOK_DEFAULT_ID = 'workbook'
+
+CACHE_DIR = '.workbook_cache'
+PLOT_SUFFIX = '.plot.json'
+ROWS_PER_CHUNK = 10000
+LOCK_TIMEOUT = 600.
+# a lock older than this is left over from a build that never finished, whether or not its process still exists
+LOCK_STALE = 3600.
+MAX_SHEET_NAME = 31
+
+
+class WorkbookError(Exception):
+    pass
+
+
+def params(info, group_name=WORKBOOK_DEFAULT_ID):
+    gname = lambda name: group_name + '.' + name
+    info.param_group(group_name, label='Result Workbook Parameters', glob=True)
+    info.param(gname('mode'), label='Workbook Generation', default='Incremental',
+               values=['Incremental', 'Background', 'Full'])
+
+
+def write_plot_params(csv_path, params):
+    """
+    Store the plot parameters of a result CSV next to it so the workbook builder can chart it.
+    """
+    f = open(csv_path + PLOT_SUFFIX, 'w')
+    try:
+        json.dump(params, f, indent=2)
+    finally:
+        f.close()
+
+
+def file_hash(path):
+    h = hashlib.sha1()
+    f = open(path, 'rb')
+    try:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            h.update(block)
+    finally:
+        f.close()
+    return h.hexdigest()
+
+
+def scan(results_dir):
+    """
+    Return {relative path: content hash} for the result CSVs and binary capture files under results_dir. A
+    capture file that has also been exported to CSV is only represented by the CSV. Timing trace summaries are
+    diagnostics, not results, and are left out.
+    """
+    found = {}
+    for root, dirs, files in os.walk(results_dir):
+        dirs[:] = sorted([d for d in dirs if d != CACHE_DIR])
+        for name in sorted(files):
+            base, ext = os.path.splitext(name)
+            if name == trace.SUMMARY_FILE:
+                continue
+            if ext.lower() == '.csv' or (ext == capfile.SUFFIX and base + '.csv' not in files):
+                path = os.path.join(root, name)
+                found[os.path.relpath(path, results_dir)] = file_hash(path)
+    return found
+
+
+def _value(text):
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def pid_alive(pid):
+    """
+    Return True if a process with this id is running (or may be: when it cannot be determined).
+    """
+    if os.name == 'nt':
+        # os.kill() terminates the process on Windows, ask the kernel instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except OSError, e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class Lock(object):
+    """
+    Exclusive lock file so that builds started by consecutive tests run one at a time.
+
+    The lock file holds the owner's process id and the time it was taken. A lock whose owner is no longer
+    running, or that is older than stale seconds, was left behind by a build that was killed and is broken.
+    Breaking a lock is reported through log (e.g. ts.log_warning), or on stderr if no log is given.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT, stale=LOCK_STALE, log=None):
+        self.path = path
+        self.timeout = timeout
+        self.stale = stale
+        self.log = log
+        self.fd = None
+
+    def owner(self):
+        """
+        Return the (pid, time) of the lock holder. The pid is None if the lock file cannot be read (e.g. its
+        owner was killed before writing it), the time then comes from the file.
+        """
+        try:
+            f = open(self.path)
+            try:
+                owner = json.load(f)
+            finally:
+                f.close()
+            return int(owner['pid']), float(owner['time'])
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            try:
+                return None, os.path.getmtime(self.path)
+            except OSError:
+                return None, time.time()
+
+    def is_stale(self):
+        pid, created = self.owner()
+        if time.time() - created > self.stale:
+            return True
+        return pid is not None and not pid_alive(pid)
+
+    def __enter__(self):
+        start = time.time()
+        while True:
+            try:
+                self.fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(self.fd, json.dumps({'pid': os.getpid(), 'time': time.time()}))
+                return self
+            except OSError, e:
+                if e.errno != errno.EEXIST:
+                    raise
+                if self.is_stale():
+                    pid, created = self.owner()
+                    msg = 'Breaking stale workbook lock %s (pid %s, %0.0f s old)' % (self.path, pid,
+                                                                                    time.time() - created)
+                    if self.log is not None:
+                        self.log(msg)
+                    else:
+                        sys.stderr.write(msg + '\n')
+                    try:
+                        os.remove(self.path)
+                    except OSError:
+                        pass
+                    continue
+                if time.time() - start > self.timeout:
+                    raise WorkbookError('Timed out waiting for workbook lock %s' % self.path)
+                time.sleep(0.5)
+
+    def __exit__(self, *args):
+        os.close(self.fd)
+        os.remove(self.path)
+
+
+class WorkbookBuilder(object):
+    """
+    Builds the result workbook from the CSVs under results_dir, one sheet (and chart, when the CSV has plot
+    parameters) per CSV.
+
+    A manifest of content hashes is kept in a cache directory. CSVs whose hash has not changed are not parsed
+    again: their parsed rows are read back from the cache, and when nothing has changed the build is skipped
+    altogether. The workbook is written with openpyxl's write-only mode and rows are streamed through in
+    chunks, so memory stays constant however large the datasets are. log is passed on to the build Lock.
+    """
+
+    def __init__(self, excel_path, results_dir, log=None):
+        self.excel_path = excel_path
+        self.results_dir = results_dir
+        self.log = log
+        self.cache_dir = os.path.join(results_dir, CACHE_DIR)
+        self.manifest_path = os.path.join(self.cache_dir, os.path.basename(excel_path) + '.manifest.json')
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, digest + '.pkl')
+
+    def load_manifest(self):
+        try:
+            f = open(self.manifest_path)
+            try:
+                return json.load(f)
+            finally:
+                f.close()
+        except (IOError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        tmp = self.manifest_path + '.tmp'
+        f = open(tmp, 'w')
+        try:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
+        os.rename(tmp, self.manifest_path)
+
+    def parse(self, rel_path, digest):
+        """
+        Parse a CSV into the cache as a header followed by pickled chunks of typed rows.
+        """
+        if rel_path.endswith(capfile.SUFFIX):
+            return self.parse_capture(rel_path, digest)
+        f = open(os.path.join(self.results_dir, rel_path), 'rb')
+        out = open(self._cache_path(digest), 'wb')
+        try:
+            reader = csv.reader(f)
+            header = [h.strip() for h in next(reader, [])]
+            pickle.dump(header, out, pickle.HIGHEST_PROTOCOL)
+            chunk = []
+            for row in reader:
+                chunk.append([_value(v) for v in row])
+                if len(chunk) >= ROWS_PER_CHUNK:
+                    pickle.dump(chunk, out, pickle.HIGHEST_PROTOCOL)
+                    chunk = []
+            if chunk:
+                pickle.dump(chunk, out, pickle.HIGHEST_PROTOCOL)
+        finally:
+            out.close()
+            f.close()
+
+    def parse_capture(self, rel_path, digest):
+        """
+        Cache a binary capture file like a CSV, reading it through numpy.memmap one chunk at a time.
+        """
+        cf = capfile.CaptureFile(os.path.join(self.results_dir, rel_path))
+        out = open(self._cache_path(digest), 'wb')
+        try:
+            pickle.dump(cf.points, out, pickle.HIGHEST_PROTOCOL)
+            for block in cf.blocks(ROWS_PER_CHUNK):
+                pickle.dump(block.tolist(), out, pickle.HIGHEST_PROTOCOL)
+        finally:
+            out.close()
+            cf.close()
+
+    def rows(self, digest):
+        f = open(self._cache_path(digest), 'rb')
+        try:
+            header = pickle.load(f)
+            yield header
+            while True:
+                try:
+                    chunk = pickle.load(f)
+                except EOFError:
+                    break
+                for row in chunk:
+                    yield row
+        finally:
+            f.close()
+
+    def plot_params(self, rel_path):
+        path = os.path.join(self.results_dir, rel_path + PLOT_SUFFIX)
+        if not os.path.exists(path):
+            return None
+        f = open(path)
+        try:
+            return json.load(f)
+        finally:
+            f.close()
+
+    def sheet_name(self, rel_path, used):
+        base = os.path.splitext(rel_path)[0].replace(os.sep, '_')
+        name = base[-MAX_SHEET_NAME:]
+        i = 1
+        while name in used:
+            suffix = '_%d' % i
+            name = base[-(MAX_SHEET_NAME - len(suffix)):] + suffix
+            i += 1
+        used.add(name)
+        return name
+
+    def chart(self, ws, header, nrows, params):
+        from openpyxl.chart import ScatterChart, Reference, Series
+
+        x_name = params.get('plot.x.points')
+        if x_name not in header:
+            return
+        x_col = header.index(x_name) + 1
+        chart = ScatterChart()
+        chart.title = params.get('plot.title')
+        chart.x_axis.title = params.get('plot.x.title')
+        chart.y_axis.title = params.get('plot.y.title')
+        xvalues = Reference(ws, min_col=x_col, min_row=2, max_row=nrows + 1)
+        for y_name in [p.strip() for p in params.get('plot.y.points', '').split(',')]:
+            if y_name in header:
+                y_col = header.index(y_name) + 1
+                values = Reference(ws, min_col=y_col, min_row=1, max_row=nrows + 1)
+                chart.series.append(Series(values, xvalues, title_from_data=True))
+        ws.add_chart(chart, 'A%d' % (nrows + 3))
+
+    def build(self, force=False):
+        """
+        Bring the workbook up to date. Returns the number of CSVs that were (re)parsed, or None if the workbook
+        was already current.
+        """
+        import openpyxl
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        with Lock(os.path.join(self.cache_dir, os.path.basename(self.excel_path) + '.lock'), log=self.log):
+            manifest = self.load_manifest()
+            current = scan(self.results_dir)
+            if not force and current == manifest and os.path.exists(self.excel_path):
+                return None
+            parsed = 0
+            for rel_path, digest in sorted(current.items()):
+                if force or manifest.get(rel_path) != digest or not os.path.exists(self._cache_path(digest)):
+                    self.parse(rel_path, digest)
+                    parsed += 1
+            for rel_path, digest in manifest.items():
+                if digest not in current.values() and os.path.exists(self._cache_path(digest)):
+                    os.remove(self._cache_path(digest))
+
+            wb = openpyxl.Workbook(write_only=True)
+            used = set()
+            for rel_path, digest in sorted(current.items()):
+                ws = wb.create_sheet(title=self.sheet_name(rel_path, used))
+                header = None
+                nrows = 0
+                for row in self.rows(digest):
+                    if header is None:
+                        header = row
+                    else:
+                        nrows += 1
+                    ws.append(row)
+                params = self.plot_params(rel_path)
+                if params and header and nrows:
+                    self.chart(ws, header, nrows, params)
+            tmp = self.excel_path + '.tmp'
+            wb.save(tmp)
+            if os.path.exists(self.excel_path):
+                os.remove(self.excel_path)
+            os.rename(tmp, self.excel_path)
+            self.save_manifest(current)
+            return parsed
+
+
+def build_async(excel_path, results_dir, log_path=None):
+    """
+    Start the workbook build in a separate process and return without waiting for it. The process outlives the
+    test script, so the next test can start while the workbook is written.
+    """
+    lib_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([lib_dir] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else []))
+    out = open(log_path, 'a') if log_path is not None else open(os.devnull, 'w')
+    try:
+        return subprocess.Popen([sys.executable, '-m', 'svptools.workbook', excel_path, results_dir],
+                                env=env, stdout=out, stderr=subprocess.STDOUT)
+    finally:
+        out.close()
+
+
+@trace.traced('workbook')
+def result_workbook(ts, excelfile, group_name=WORKBOOK_DEFAULT_ID):
+    """
+    Create or update the result workbook for the test according to workbook.mode: incrementally in this
+    process, in a background process, or a full rebuild with the svpelab result module.
+
+    Returns True if the workbook exists when this returns, so the caller can register it as a result file. A
+    background build has not finished yet and returns False. Errors are logged, never raised, since this runs
+    at the end of a test and must not hide its result.
+    """
+    mode = ts.param_value(group_name + '.mode')
+    excel_path = ts.result_file_path(excelfile)
+    # only the CSVs of this test go into its workbook, as with the svpelab builder
+    result_dir = os.path.dirname(excel_path)
+    try:
+        if mode == 'Full':
+            from svpelab import result as rslt
+            rslt.result_workbook(excelfile, ts.results_dir(), ts.result_dir())
+        elif mode == 'Background':
+            build_async(excel_path, result_dir, log_path=excel_path + '.log')
+            ts.log('Result workbook %s is being built in the background, see %s.log' % (excelfile, excelfile))
+            return False
+        else:
+            parsed = WorkbookBuilder(excel_path, result_dir, log=ts.log_warning).build()
+            if parsed is None:
+                ts.log('Result workbook %s is up to date' % excelfile)
+            else:
+                ts.log('Result workbook %s updated, %d dataset(s) parsed' % (excelfile, parsed))
+    except Exception, e:
+        ts.log_warning('Unable to create result workbook %s: %s' % (excelfile, e))
+        return False
+    return os.path.exists(excel_path)
+
+
+def main(args=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build or update a result workbook from the result CSVs')
+    parser.add_argument('excelfile', help='workbook (.xlsx) path')
+    parser.add_argument('results_dir', help='result directory to scan for CSVs')
+    parser.add_argument('-f', '--force', action='store_true', help='rebuild from scratch')
+    args = parser.parse_args(args)
+    parsed = WorkbookBuilder(args.excelfile, args.results_dir).build(force=args.force)
+    if parsed is None:
+        sys.stdout.write('%s is up to date\n' % args.excelfile)
+    else:
+        sys.stdout.write('%s updated, %d dataset(s) parsed\n' % (args.excelfile, parsed))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -37,12 +37,25 @@ import sys
 import os
 import traceback
 import math
-from svpelab import gridsim
-from svpelab import pvsim
-from svpelab import das
-from svpelab import der
-from svpelab import hil
-from svpelab import result as rslt
+from svptools.drivers import gridsim
+from svptools.drivers import pvsim
+from svptools.drivers import das
+from svptools.drivers import der
+from svptools.drivers import hil
+from svptools import settle
+from svptools import session
+from svptools import deviceio
+from svptools import sim
+from svptools import trace
+from svptools import resultindex
+from svptools import measure
+from svptools import startup
+from svptools import capture
+from svptools import dataset
+from svptools import summary
+from svptools import channels
+from svptools import workbook
+from svptools import checkpoint
 import script
 import numpy as np
 
@@ -52,6 +65,7 @@ def test_run():
     eut = None
     chil = None
     daq = None
+    cap = None
     pv = None
     result_summary = None
     result = script.RESULT_FAIL
@@ -66,100 +80,153 @@ def test_run():
     }
 
     try:
-        # Initialize DER configuration
-        eut = der.der_init(ts)
-        eut.config()
-
-        # Initialize CHIL environment, if necessary
-        chil = hil.hil_init(ts)
-        if chil is not None:
-            chil.config()
-
-        # PV simulator is initialized with test parameters and enabled
-        pv = pvsim.pvsim_init(ts)
-        pv.irradiance_set(1000)
-        pv.power_on()
-
-        # Initialize data acquisition with soft channels (sc) that include data that doesn't come from the DAQ
-        sc_points = ['W_TARG', 'W_TOTAL', 'W_INV']
-        daq = das.das_init(ts, sc_points=sc_points)
+        # Initialize DER configuration, reusing the connection from an earlier test in the suite if possible.
+        # With device I/O overlap enabled the EUT connection is opened while the test equipment is set up.
+        eut_opening = deviceio.background(ts, session.acquire, ts, 'der', der.der_init, config=True)
+        try:
+            # Initialize CHIL environment, if necessary
+            chil = session.acquire(ts, 'hil', hil.hil_init, config=True)
+
+            # PV simulator is initialized with test parameters and enabled
+            pv = session.acquire(ts, 'pvsim', pvsim.pvsim_init)
+            pv.irradiance_set(1000)
+            pv.power_on()
+
+            # Initialize data acquisition with soft channels (sc) that include data that doesn't come from the DAQ
+            sc_points = ['W_TARG', 'W_TOTAL', 'W_INV']
+            daq = session.acquire(ts, 'das', das.das_init, pool=False, sc_points=sc_points)
+        finally:
+            eut = eut_opening.result()
         ts.log('DAS device: %s' % daq.info())
 
+        # W_TOTAL is derived from the per-phase DAS channels; the phase count comes from the configured channel map
+        channel_map = channels.channel_map(daq)
+        if channel_map is None:
+            ts.log_warning('DAS driver does not report its channel map, reading it from a sample')
+            daq.data_sample()
+            channel_map = [k for k, v in daq.data_capture_read().items() if v is not None]
+        derived = channels.standard(channel_map)
+        ts.log('DAS channel map has %d phase(s)' % channels.phases(channel_map))
+
         # Open result summary file - this will include a selection of DAQ data to evaluate performance of the EUT
         result_summary_filename = 'result_summary.csv'
-        result_summary = open(ts.result_file_path(result_summary_filename), 'a+')  # Open .csv file
+        result_summary = summary.ResultSummary(ts.result_file_path(result_summary_filename), [
+            summary.Column('test', 'Test Name', type='int'),
+            summary.Column('power_pct', 'Power Setting (%)', type='float'),
+            summary.Column('w_inv', 'Inverter-Reported Power (W)', type='float'),
+            summary.Column('w_das', 'DAS Power (W)', type='float'),
+            summary.Column('w_inv_pct', 'Inverter-Reported Power (%)', type='float'),
+            summary.Column('w_das_pct', 'DAS Power (%)', type='float'),
+            summary.Column('w_das_err', 'DAS Power Error (% of rating)', type='float'),
+            summary.Column('settle_time', 'Settle Time (s)', fmt='%0.3f', type='float')])
         ts.result_file(result_summary_filename)  # create result file in the GUI
-        # Write result summary header
-        result_summary.write('Test Name, Power Setting (%), Inverter-Reported Power (W), DAS Power (W), '
-                             'Inverter-Reported Power (%), DAS Power (%)\n')
 
         # Get EUT nameplate power
         eut_nameplate_power = eut.nameplate().get('WRtg')
 
-        inv_power = eut.measurements().get('W')
+        # EUT measurements are read once per tick and shared by all points used in that tick
+        meas = measure.Measurements(eut, points=['W', 'VAr', 'PF'])
+
+        inv_power = meas.get('W')
         timeout = 20.
         if inv_power <= eut_nameplate_power/10.:
-            eut.connect(params={'Conn': True})
-            pv.irradiance_set(995)  # Perturb the pv slightly to start the inverter
-        while inv_power <= eut_nameplate_power/10. and timeout >= 0:
-            ts.log('Inverter power is at %0.1f. Waiting %s more seconds or until EUT starts...' % (inv_power, timeout))
-            ts.sleep(1)
-            timeout -= 1
-            inv_power = eut.measurements().get('W')
-            if timeout == 0:
-                result = script.RESULT_FAIL
-                raise der.DERError('Inverter did not start.')
+            # Connect the EUT and perturb the pv slightly to start the inverter; the two commands are independent
+            deviceio.gather(deviceio.background(ts, eut.connect, params={'Conn': True}),
+                            deviceio.background(ts, pv.irradiance_set, 995))
+        startup_time = startup.wait_for_production(ts, meas, eut_nameplate_power/10., timeout)
+        if startup_time is None:
+            result = script.RESULT_FAIL
+            raise der.DERError('Inverter did not start.')
+        ts.log('EUT start-up latency: %0.2f seconds' % startup_time)
+
+        # EUT identity and test parameters are kept with the results for the cross-run results index
+        resultindex.run_info(ts, eut)
+
+        # Settle detection replaces the fixed dwell at each power level when enabled
+        # Background capture samples the DAS at the full rate while the loop only tags power level changes. It
+        # is then the only sampler of the DAS, so the recorded dataset comes from the capture.
+        cap = capture.capture_init(ts, daq, record=True)
+        settling = settle.settle_init(ts, eut=meas, daq=daq, read=cap.source() if cap is not None else None)
+
+        # Power loops completed by an earlier run of this test that did not finish are restored, not rerun. Each loop
+        # is one continuous data capture, so a loop that was interrupted is rerun from its first power level.
+        progress = checkpoint.checkpoint_init(ts, eut)
 
         for time_loop in range(2):
-            daq.data_capture(True)  # Begin data capture for this power loop
+            testname = 'CurtailmentRun_%s' % (str(time_loop+1))  # Pick name for the DAS data
+            if progress.done(time_loop+1):
+                for row in progress.restore(time_loop+1):
+                    result_summary.write(row)
+                ts.log('%s restored from checkpoint' % testname)
+                continue
+            loop_rows = []
+            if cap is not None:
+                # in binary dataset mode the samples are streamed to a capture file rather than kept in memory
+                cap.start(stream=dataset.stream_path(ts, testname))
+            else:
+                daq.data_capture(True)  # Begin data capture for this power loop
 
             for power_limit_pct in [10, 20, 30, 40, 50, 60, 70, 80, 90, 100]:
                 daq.sc['W_TARG'] = eut_nameplate_power*(float(power_limit_pct)/100.)
+                if cap is not None:
+                    step_start = cap.tag(daq.sc['W_TARG'])  # mark the step boundary in the capture buffer
                 eut.limit_max_power(params={'Ena': True, 'WMaxPct': power_limit_pct})
                 ts.log('EUT power set to %0.2f%%' % power_limit_pct)
-                ts.sleep(2)
-                daq.sc['W_INV'] = eut.measurements().get('W')  # Get the inverter-measured power and save it.
-                daq.data_sample()  # force a data capture point after the sleep and add this to the dataset
-                daq_data = daq.data_capture_read()  # read the last data point dictionary from the daq object
-                try:  # if 3 phase device add up the power from each phase
-                    daq.sc['W_TOTAL'] = daq_data['AC_P_1'] + daq_data['AC_P_2'] + daq_data['AC_P_2']
-                except Exception, e:  # if single phase device
-                    daq.sc['W_TOTAL'] = daq_data['AC_P_1']
+                settle_time = settling.wait(2)
+                daq.sc['W_INV'] = meas.get('W')  # Get the inverter-measured power and save it.
+                if cap is not None:
+                    daq_data = cap.latest()  # last buffered sample of the step; no blocking DAS read
+                    ts.log_debug('Captured %d samples for this power level' % len(cap.since(step_start)))
+                else:
+                    daq.data_sample()  # force a data capture point after the sleep and add this to the dataset
+                    daq_data = daq.data_capture_read()  # read the last data point dictionary from the daq object
+                daq.sc['W_TOTAL'] = derived.evaluate(daq_data, ['W_TOTAL'])['W_TOTAL']
                 # Record 1 set of power values for each power level setting
-                result_summary.write('%s, %s, %s, %s, %s, %s\n' % (time_loop+1, power_limit_pct, daq.sc['W_INV'],
-                                                           daq.sc['W_TOTAL'], daq.sc['W_INV']/eut_nameplate_power,
-                                                           daq.sc['W_TOTAL']/eut_nameplate_power))
-
-            daq.data_capture(False)  # Stop data capture
-            ds = daq.data_capture_dataset()  # generate dataset from the daq data that was recorded
-            testname = 'CurtailmentRun_%s' % (str(time_loop+1))  # Pick name for the DAS data
-            filename = testname + '.csv'  # Pick name for the DAS .csv data file
-            ds.to_csv(ts.result_file_path(filename))  # Convert data to .cvs file
+                row = {'test': time_loop+1, 'power_pct': power_limit_pct,
+                       'w_inv': daq.sc['W_INV'], 'w_das': daq.sc['W_TOTAL'],
+                       'w_inv_pct': daq.sc['W_INV']/eut_nameplate_power,
+                       'w_das_pct': daq.sc['W_TOTAL']/eut_nameplate_power,
+                       'w_das_err': 100.*daq.sc['W_TOTAL']/eut_nameplate_power - power_limit_pct,
+                       'settle_time': settle_time}
+                result_summary.write(row)
+                loop_rows.append(row)
+
+            if cap is not None:
+                cap.stop()
+                ds = cap.dataset  # full-rate dataset or capture file recorded by the background capture
+            else:
+                daq.data_capture(False)  # Stop data capture
+                ds = daq.data_capture_dataset()  # generate dataset from the daq data that was recorded
+            derived.apply(ds, ['W_TOTAL'])  # recompute W_TOTAL for every sample in one vectorized pass
             result_params['plot.title'] = testname  # update title for the excel plot for this dataset
-            ts.result_file(filename, params=result_params)  # Add results info to .xml log, which will be used to plot
+            # Write the .csv file and add results info to .xml log, which will be used to plot
+            filename = dataset.save(ts, ds, testname, params=result_params)
             ts.log('Saving data capture: %s' % filename)
+            progress.record((time_loop+1,), rows=loop_rows, files=checkpoint.result_files(ts, testname),
+                            registered={filename: dict(result_params)})
 
+        result_summary.close()
+        progress.complete()
         result = script.RESULT_COMPLETE
 
     except Exception, e:
         ts.log_error('Script failure: %s' % e)
 
     finally:
+        if result_summary is not None:
+            result_summary.close(partial=True)
         if eut is not None:
             eut.limit_max_power(params={'Ena': False})
-            eut.close()
-        if chil is not None:
-            chil.close()
-        if pv is not None:
-            pv.close()
-        if daq is not None:
-            daq.close()
-        if result_summary is not None:
-            result_summary.close()
+        session.release(ts, eut)
+        session.release(ts, chil)
+        session.release(ts, pv)
+        if cap is not None:
+            cap.stop()
+        session.release(ts, daq)
         # create result workbook
         excelfile = ts.config_name() + '.xlsx'
-        rslt.result_workbook(excelfile, ts.results_dir(), ts.result_dir())
-        ts.result_file(excelfile)
+        if workbook.result_workbook(ts, excelfile):
+            ts.result_file(excelfile)
 
     return result
 
@@ -176,7 +243,12 @@ def run(test_script):
         ts.log_debug('Script: %s %s' % (ts.name, ts.info.version))
         ts.log_active_params()
 
-        result = test_run()
+        # Time device init, start-up, settling, driver calls and file writes; saved to the result dir
+        trace.trace_init(ts)
+        # On a simulated rig the devices are modelled and ts.sleep() advances a virtual clock
+        sim.sim_init(ts)
+        with trace.span('test_run'):
+            result = test_run()
 
         ts.result(result)
         if result == script.RESULT_FAIL:
@@ -185,7 +257,10 @@ def run(test_script):
     except Exception, e:
         ts.log_error('Test script exception: %s' % traceback.format_exc())
         rc = 1
+        result = script.RESULT_FAIL
 
+    trace.trace_save(ts)
+    resultindex.index_result(ts, result)
     sys.exit(rc)
 
 
@@ -195,6 +270,16 @@ der.params(info)
 hil.params(info)
 das.params(info)
 pvsim.params(info)
+settle.params(info)
+trace.params(info)
+session.params(info)
+deviceio.params(info)
+sim.params(info)
+resultindex.params(info)
+capture.params(info)
+dataset.params(info)
+checkpoint.params(info)
+workbook.params(info)
 
 info.logo('sunspec.gif')
 
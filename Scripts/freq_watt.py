@@ -36,11 +36,27 @@ Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
 import sys
 import os
 import traceback
-from svpelab import das
-from svpelab import der
-from svpelab import pvsim
-from svpelab import hil
-from svpelab import gridsim
+from svptools.drivers import das
+from svptools.drivers import der
+from svptools.drivers import pvsim
+from svptools.drivers import hil
+from svptools.drivers import gridsim
+from svptools import settle
+from svptools import session
+from svptools import deviceio
+from svptools import sim
+from svptools import trace
+from svptools import resultindex
+from svptools import measure
+from svptools import startup
+from svptools import conformance
+from svptools import eutconfig
+from svptools import trajectory
+from svptools import sweep
+from svptools import summary
+from svptools import channels
+from svptools import dataset
+from svptools import stepresponse
 import script
 import numpy as np
 
@@ -49,84 +65,191 @@ def test_run():
     chil = None
     grid = None
     pv = None
+    daq = None
+    cap = None
+    result_summary = None
+    result = script.RESULT_FAIL
 
     try:
 
-        # Initialize DER configuration
-        eut = der.der_init(ts)
-        eut.config()
+        # Initialize DER configuration, reusing the connection from an earlier test in the suite if possible.
+        # With device I/O overlap enabled the EUT connection is opened while the test equipment is set up.
+        eut_opening = deviceio.background(ts, session.acquire, ts, 'der', der.der_init, config=True)
+        try:
+            # Initialize CHIL environment, if necessary
+            chil = session.acquire(ts, 'hil', hil.hil_init, config=True)
 
-        # Initialize CHIL environment, if necessary
-        chil = hil.hil_init(ts)
-        if chil is not None:
-            chil.config()
+            # PV simulator is initialized with test parameters and enabled
+            pv = session.acquire(ts, 'pvsim', pvsim.pvsim_init)
+            pv.irradiance_set(1000)
+            pv.power_on()
 
-        # PV simulator is initialized with test parameters and enabled
-        pv = pvsim.pvsim_init(ts)
-        pv.irradiance_set(1000)
-        pv.power_on()
+            # grid simulator is initialized with test parameters and enabled
+            grid = session.acquire(ts, 'gridsim', gridsim.gridsim_init)
 
-        # grid simulator is initialized with test parameters and enabled
-        grid = gridsim.gridsim_init(ts)
+            # The step response is measured with the DAS
+            if ts.param_value('stepresponse.mode') == 'Enabled':
+                daq = session.acquire(ts, 'das', das.das_init, pool=False)
+        finally:
+            eut = eut_opening.result()
 
         # Get EUT nameplate power
         eut_nameplate_power = eut.nameplate().get('WRtg')
 
-        inv_power = eut.measurements().get('W')
+        # EUT measurements are read once per tick and shared by all points used in that tick
+        meas = measure.Measurements(eut, points=['W', 'VAr', 'PF'])
+
+        inv_power = meas.get('W')
         timeout = 20.
         if inv_power <= eut_nameplate_power / 10.:
-            eut.connect(params={'Conn': True})
-            pv.irradiance_set(995)  # Perturb the pv slightly to start the inverter
-        while inv_power <= eut_nameplate_power / 10. and timeout >= 0:
-            ts.log('Inverter power is at %0.1f. Waiting %s more seconds or until EUT starts...' % (inv_power, timeout))
-            ts.sleep(1)
-            timeout -= 1
-            inv_power = eut.measurements().get('W')
-            if timeout == 0:
-                result = script.RESULT_FAIL
-                raise der.DERError('Inverter did not start.')
+            # Connect the EUT and perturb the pv slightly to start the inverter; the two commands are independent
+            deviceio.gather(deviceio.background(ts, eut.connect, params={'Conn': True}),
+                            deviceio.background(ts, pv.irradiance_set, 995))
+        startup_time = startup.wait_for_production(ts, meas, eut_nameplate_power/10., timeout)
+        if startup_time is None:
+            result = script.RESULT_FAIL
+            raise der.DERError('Inverter did not start.')
+        ts.log('EUT start-up latency: %0.2f seconds' % startup_time)
+
+        # EUT identity and test parameters are kept with the results for the cross-run results index
+        resultindex.run_info(ts, eut)
 
         fw_mode = 'Pointwise'
+        f_points = [50, 50.2, 51.5, 53]
+        p_points = [100, 100, 0, 0]
+        # Only the settings that differ from the EUT's cached configuration are written, then verified
+        eut_config = eutconfig.eutconfig_init(ts, eut)
         if fw_mode == 'Parameters':
-            eut.freq_watt_param(params={'HysEna': False, 'HzStr': 50.2,
-                                        'HzStop': 51.5, 'WGra': 140.})
+            eut_config.apply('freq_watt_param', {'HysEna': False, 'HzStr': 50.2,
+                                                 'HzStop': 51.5, 'WGra': 140.})
         else:  # Pointwise
-            eut.freq_watt(params={'ActCrv': 1})
-            f_points = [50, 50.2, 51.5, 53]
-            p_points = [100, 100, 0, 0]
             parameters = {'hz': f_points, 'w': p_points}
             # ts.log_debug(parameters)
-            eut.freq_watt_curve(id=1, params=parameters)
-            eut.freq_watt(params={'Ena': True})
-            ts.log_debug(eut.freq_watt())
+            eut_config.apply('freq_watt_curve', parameters, id=1)
+            ts.log_debug(eut_config.apply('freq_watt', {'ActCrv': 1, 'Ena': True}))
+
+        # Settle detection replaces the fixed dwell at each frequency when enabled
+        settling = settle.settle_init(ts, eut=meas)
 
         # Create list of frequencies to iterate over
         freq_values = list(np.linspace(49.5, 53, num=50))
+        # In adaptive mode the points are concentrated around the curve knots and refined where the EUT
+        # active power (% of rating) departs from the curve
+        freq_sweep = sweep.sweep_init(ts, freq_values, f_points, p_points, 49.5, 53,
+                                      coarse=0.5, fine=0.1, fine_width=0.1)
+        # Check each settled point against the curve as the sweep runs and fail fast if the EUT doesn't follow it
+        fw_check = conformance.conformance_init(ts, f_points, p_points, name='FW')
         sleep_time = 1.0
-        for freq in freq_values:
-            grid.freq(freq)  # set grid frequency
-            ts.log('      f = %0.3f Hz. Sleeping for %0.2f seconds...' % (freq, sleep_time))
-            ts.sleep(sleep_time)
+        # In trajectory mode the whole frequency profile is timed by the simulator or a scheduler thread
+        traj = trajectory.trajectory_init(ts, grid, 'freq', freq_sweep.values)
+        if traj is not None:
+            traj.run(ts, monitor=lambda i, f: ts.log('      f = %0.3f Hz' % f))
+            ts.log('FW trajectory lateness: mean %0.4f s, max %0.4f s' % traj.jitter())
+        else:
+            for freq in freq_sweep:
+                grid.freq(freq)  # set grid frequency
+                ts.log('      f = %0.3f Hz. Waiting for EUT to settle...' % freq)
+                settle_time = settling.wait(sleep_time)
+                ts.log_debug('      Settled in %0.2f seconds' % settle_time)
+                w = meas.get('W')
+                w_pct = 100.*w/eut_nameplate_power if w is not None else None
+                freq_sweep.record(freq, w_pct)
+                if fw_check is not None and not fw_check.check(freq, w_pct):
+                    ts.log_warning('FW response out of tolerance, skipping the rest of the sweep')
+                    break
+            ts.log('FW sweep: %d points, total settling time %0.2f seconds' %
+                   (len(freq_sweep), settling.total_time()))
+
+        # Static curve points and step response metrics go to one result summary
+        result_summary_filename = 'result_summary.csv'
+        result_summary = summary.ResultSummary(ts.result_file_path(result_summary_filename), [
+            summary.Column('kind', 'Test'),
+            summary.Column('freq_from', 'Step From (Hz)', type='float'),
+            summary.Column('freq', 'Frequency (Hz)', type='float'),
+            summary.Column('w_pct', 'Active Power (% of rating)', type='float'),
+            summary.Column('w_expected_pct', 'Expected Active Power (% of rating)', type='float'),
+            summary.Column('error_pct', 'Error (% of rating)', type='float'),
+            summary.Column('rise_time', 'Rise Time (s)', type='float'),
+            summary.Column('response_time', 'Response Time (s)', type='float'),
+            summary.Column('settling_time', 'Settling Time (s)', type='float'),
+            summary.Column('overshoot', 'Overshoot (% of step)', type='float')])
+        ts.result_file(result_summary_filename)
+        for freq, w_pct in freq_sweep.results:
+            expected = float(np.interp(freq, f_points, p_points))
+            error = w_pct - expected if w_pct is not None else None
+            result_summary.write({'kind': 'Static', 'freq_from': None, 'freq': freq,
+                                  'w_pct': stepresponse.summary_value(w_pct), 'w_expected_pct': expected,
+                                  'error_pct': stepresponse.summary_value(error),
+                                  'rise_time': None, 'response_time': None, 'settling_time': None, 'overshoot': None})
+
+        if daq is not None:
+            # Step the frequency from nominal to levels between HzStr and HzStop (and back) while the DAS is
+            # captured at its full rate, then compute the response metrics of every step from the capture at once
+            f_nom = f_points[0]
+            hz_str, hz_stop = f_points[1], f_points[2]
+            dwell = ts.param_value('stepresponse.dwell')
+            levels = stepresponse.step_levels(f_nom, hz_str, hz_stop, ts.param_value('stepresponse.steps'))
+            cap, interval = stepresponse.capture_init(ts, daq, (len(levels) + 1) * dwell)
+            grid.freq(f_nom)
+            cap.start()
+            ts.sleep(dwell)  # initial values of the first step
+            starts = []
+            for f_from, f_to in levels:
+                starts.append(cap.tag(f_to))
+                grid.freq(f_to)
+                ts.log('      f step %0.3f -> %0.3f Hz' % (f_from, f_to))
+                ts.sleep(dwell)
+            cap.stop()
+            ds = cap.dataset
+            derived = channels.standard(ds.points)
+            derived.apply(ds, ['W_TOTAL'])
+            t = ds.column('TIME') if 'TIME' in ds.points else np.arange(len(ds)) * interval
+            w_pct = 100. * ds.column('W_TOTAL') / eut_nameplate_power
+            expected = np.interp([f_to for f_from, f_to in levels], f_points, p_points)
+            m = stepresponse.metrics(t, w_pct, starts, expected=expected, band=ts.param_value('stepresponse.band'))
+            for i, (f_from, f_to) in enumerate(levels):
+                result_summary.write({'kind': 'Step', 'freq_from': f_from, 'freq': f_to,
+                                      'w_pct': stepresponse.summary_value(m['final'][i]), 'w_expected_pct': expected[i],
+                                      'error_pct': stepresponse.summary_value(m['error'][i]),
+                                      'rise_time': stepresponse.summary_value(m['rise_time'][i]),
+                                      'response_time': stepresponse.summary_value(m['response_time'][i]),
+                                      'settling_time': stepresponse.summary_value(m['settling_time'][i]),
+                                      'overshoot': stepresponse.summary_value(m['overshoot'][i])})
+            ts.log('FW step response: %d steps, response time max %0.3f s, settling time max %0.3f s' %
+                   (len(levels), np.nanmax(m['response_time']), np.nanmax(m['settling_time'])))
+            filename = dataset.save(ts, ds, 'FW_StepResponse', params={
+                'plot.title': 'FW Step Response',
+                'plot.x.title': 'Time (sec)',
+                'plot.x.points': 'TIME',
+                'plot.y.points': 'W_TOTAL',
+                'plot.y.title': 'EUT Power (W)'})
+            ts.log('Saving step response capture: %s' % filename)
+        result_summary.close()
 
         # Disable the FW function
-        eut.freq_watt(params={'Ena': False})
+        eut_config.set('freq_watt', {'Ena': False})
         ts.log('FW Disabled')
 
         result = script.RESULT_COMPLETE
+        if fw_check is not None and not fw_check.passed():
+            ts.log_warning('FW response did not conform to the curve')
+            result = script.RESULT_FAIL
 
     except Exception, e:
         ts.log_error('Script failure: %s' % e)
 
     finally:
+        if result_summary is not None:
+            result_summary.close(partial=True)
         if eut is not None:
             eut.freq_watt(params={'Ena': False})
-            eut.close()
-        if chil is not None:
-            chil.close()
-        if pv is not None:
-            pv.close()
-        if grid is not None:
-            grid.close()
+        session.release(ts, eut)
+        session.release(ts, chil)
+        session.release(ts, pv)
+        session.release(ts, grid)
+        if cap is not None:
+            cap.stop()
+        session.release(ts, daq)
 
     return result
 
@@ -143,7 +266,12 @@ def run(test_script):
         ts.log_debug('Script: %s %s' % (ts.name, ts.info.version))
         ts.log_active_params()
 
-        result = test_run()
+        # Time device init, start-up, settling, driver calls and file writes; saved to the result dir
+        trace.trace_init(ts)
+        # On a simulated rig the devices are modelled and ts.sleep() advances a virtual clock
+        sim.sim_init(ts)
+        with trace.span('test_run'):
+            result = test_run()
 
         ts.result(result)
         if result == script.RESULT_FAIL:
@@ -152,7 +280,10 @@ def run(test_script):
     except Exception, e:
         ts.log_error('Test script exception: %s' % traceback.format_exc())
         rc = 1
+        result = script.RESULT_FAIL
 
+    trace.trace_save(ts)
+    resultindex.index_result(ts, result)
     sys.exit(rc)
 
 info = script.ScriptInfo(name=os.path.basename(__file__), run=run, version='1.0.0')
@@ -162,6 +293,19 @@ der.params(info)
 pvsim.params(info)
 hil.params(info)
 gridsim.params(info)
+das.params(info, active='stepresponse.mode', active_value=['Enabled'])
+settle.params(info)
+trace.params(info)
+conformance.params(info)
+eutconfig.params(info)
+trajectory.params(info)
+sweep.params(info)
+stepresponse.params(info)
+dataset.params(info)
+session.params(info)
+deviceio.params(info)
+sim.params(info)
+resultindex.params(info)
 
 # Add a logo to the SVP
 info.logo('sunspec.gif')
@@ -36,17 +36,82 @@ Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
 import sys
 import os
 import traceback
-from svpelab import das
-from svpelab import der
-from svpelab import pvsim
-from svpelab import hil
+from svptools.drivers import das
+from svptools.drivers import der
+from svptools.drivers import pvsim
+from svptools.drivers import hil
+from svptools import settle
+from svptools import session
+from svptools import deviceio
+from svptools import sim
+from svptools import trace
+from svptools import resultindex
+from svptools import measure
+from svptools import startup
+from svptools import conformance
+from svptools import eutconfig
+from svptools import parallel
+from svptools import summary
+from svptools import checkpoint
 import script
 import numpy as np
 
+def pf_sweep(channel, eut, pv, meas, settling, pf_check, irradiances, pf_values, sleep_time, progress):
+    """
+    Run the PF sweep at each irradiance on one device channel and return its rows of the PF map. Points completed
+    by an earlier run are taken from the checkpoint instead of being measured again.
+    """
+    prefix = 'Channel %d: ' % channel if parallel.channel_count(ts) > 1 else ''
+    # At a new irradiance the PV simulator and the EUT are written at the same time with device I/O overlap enabled
+    pv_io = deviceio.wrap(ts, pv, 'pvsim')
+    eut_io = deviceio.wrap(ts, eut, 'der')
+    rows = []
+    try:
+        for irr in irradiances:
+            irradiance_set = False
+            if pf_check is not None:
+                pf_check.reset()
+
+            for pf in pf_values:
+                if progress.done(channel, irr, pf):
+                    # replay the point through the conformance check so a skip or abort happens where it did before
+                    row = progress.restore(channel, irr, pf)[0]
+                    rows.append(row)
+                    if pf_check is not None and not pf_check.check(pf, row.get('pf')):
+                        ts.log_warning('%sPF out of tolerance at %s W/m^2, skipping to the next irradiance' %
+                                       (prefix, irr))
+                        break
+                    continue
+                writes = []
+                if not irradiance_set:
+                    writes.append(pv_io.irradiance_set(irr))  # Set irradiance of the PV simulator
+                    irradiance_set = True
+                # Send PF setting to the equipment under test (EUT)
+                writes.append(eut_io.fixed_pf(params={'Ena': True, 'PF': pf, 'WinTms': 0, 'RmpTms': 0, 'RvrtTms': 0}))
+                deviceio.gather(*writes)
+                ts.log('%sPower Factor set to %0.3f. Waiting for EUT to settle...' % (prefix, pf))
+                settle_time = settling.wait(sleep_time)
+                ts.log_debug('%sSettled in %0.2f seconds' % (prefix, settle_time))
+                m = meas.read(force=True)
+                row = {'channel': channel, 'irradiance': irr, 'pf_target': pf, 'settle_time': settle_time}
+                if m is not None:
+                    row.update({'pf': m.get('PF'), 'w': m.get('W'), 'var': m.get('VAr')})
+                rows.append(row)
+                in_tolerance = pf_check is None or pf_check.check(pf, row.get('pf'))
+                progress.record((channel, irr, pf), rows=[row])
+                if not in_tolerance:
+                    ts.log_warning('%sPF out of tolerance at %s W/m^2, skipping to the next irradiance' % (prefix, irr))
+                    break
+    finally:
+        pv_io.close()
+        eut_io.close()
+    return rows
+
 def test_run():
-    eut = None
+    euts = []
+    pvs = []
     chil = None
-    pv = None
+    pf_map = None
     result = script.RESULT_FAIL
 
     try:
@@ -56,19 +121,29 @@ def test_run():
         steps = ts.param_value('test.pf_steps_per_side')
         sleep_time = ts.param_value('test.wait_time')
 
-        # Initialize DER configuration
-        eut = der.der_init(ts)
-        eut.config()
-
-        # Initialize CHIL environment, if necessary
-        chil = hil.hil_init(ts)
-        if chil is not None:
-            chil.config()
-
-        # PV simulator is initialized with test parameters and enabled
-        pv = pvsim.pvsim_init(ts)
-        pv.irradiance_set(800)
-        pv.power_on()
+        # With parallel channels enabled, each channel is an EUT with its own PV simulator (der_2, pvsim_2, ...)
+        channels = parallel.channel_count(ts)
+
+        # Initialize DER configuration, reusing the connection from an earlier test in the suite if possible.
+        # With device I/O overlap enabled the EUT connections are opened while the test equipment is set up.
+        eut_opening = [deviceio.background(ts, session.acquire, ts, parallel.channel_kind('der', channel),
+                                           der.der_init, config=True, **parallel.channel_args(channel))
+                       for channel in range(1, channels + 1)]
+        try:
+            # Initialize CHIL environment, if necessary
+            chil = session.acquire(ts, 'hil', hil.hil_init, config=True)
+
+            # PV simulator is initialized with test parameters and enabled
+            for channel in range(1, channels + 1):
+                kind = parallel.channel_kind('pvsim', channel)
+                pv = session.acquire(ts, kind, pvsim.pvsim_init, **parallel.channel_args(channel))
+                pvs.append(pv)
+                pv.irradiance_set(800)
+                pv.power_on()
+        finally:
+            for opening in eut_opening:
+                euts.append(opening.result())
+        eut = euts[0]
         # Print information from the DER
         ts.log('---')
         info = eut.info()
@@ -96,60 +171,113 @@ def test_run():
 
         # Get EUT nameplate power
         eut_nameplate_power = eut.nameplate().get('WRtg')
+        thresholds = [eut_nameplate_power/10.] + [e.nameplate().get('WRtg')/10. for e in euts[1:]]
+
+        # EUT measurements are read once per tick and shared by all points used in that tick
+        meas = [measure.Measurements(e, points=['W', 'VAr', 'PF']) for e in euts]
 
-        # disable volt/var, VW, FW
-        eut.volt_var(params={'Ena': False})
-        eut.volt_watt(params={'Ena': False})
-        eut.freq_watt(params={'Ena': False})
+        # disable volt/var, VW, FW; functions the EUT's cached configuration shows disabled are only verified
+        for e in euts:
+            eut_config = eutconfig.eutconfig_init(ts, e)
+            eut_config.apply('volt_var', {'Ena': False})
+            eut_config.apply('volt_watt', {'Ena': False})
+            eut_config.apply('freq_watt', {'Ena': False})
 
-        inv_power = eut.measurements().get('W')
         timeout = 120.
-        if inv_power <= eut_nameplate_power / 10.:
-            pv.irradiance_set(800)  # Perturb the pv slightly to start the inverter
+        stopped = [i for i in range(channels) if meas[i].get('W') <= thresholds[i]]
+        if stopped:
+            for i in stopped:
+                pvs[i].irradiance_set(800)  # Perturb the pv slightly to start the inverter
             ts.sleep(3)
-            eut.connect(params={'Conn': True})
-        while inv_power <= eut_nameplate_power / 10. and timeout >= 0:
-            ts.log('Inverter power is at %0.1f. Waiting %s more seconds or until EUT starts...' % (inv_power, timeout))
-            ts.sleep(1)
-            timeout -= 1
-            inv_power = eut.measurements().get('W')
-            if timeout == 0:
+            for i in stopped:
+                euts[i].connect(params={'Conn': True})
+        startup_times = startup.wait_for_production_all(ts, meas, thresholds, timeout)
+        for i, startup_time in enumerate(startup_times):
+            if startup_time is None:
                 result = script.RESULT_FAIL
-                raise der.DERError('Inverter did not start.')
-
+                raise der.DERError('Inverter did not start.' if channels == 1 else
+                                   'Inverter %d did not start.' % (i + 1))
+            if channels == 1:
+                ts.log('EUT start-up latency: %0.2f seconds' % startup_time)
+            else:
+                ts.log('EUT %d start-up latency: %0.2f seconds' % (i + 1, startup_time))
 
+        # EUT identity and test parameters are kept with the results for the cross-run results index
+        resultindex.run_info(ts, euts)
 
         # Create list of the power factor values to iterate over
         pf_values = list(np.linspace(pf_start, 1.0, num=steps)) + list(np.linspace(-1.0, pf_end, num=steps)[1:])
         # ts.log('Setting DER to the following PF values: %s' % pf_values)
 
         # Run the test for 3 different irradiance values
-        for irr in [1000, 600, 300]:
-            pv.irradiance_set(irr)  # Set irradiance of the PV simulator
-
-            for pf in pf_values:
-                # Send PF setting to the equipment under test (EUT)
-                eut.fixed_pf(params={'Ena': True, 'PF': pf, 'WinTms': 0, 'RmpTms': 0, 'RvrtTms': 0})
-                ts.log('Power Factor set to %0.3f. Sleeping for %0.2f seconds...' % (pf, sleep_time))
-                ts.sleep(sleep_time)
+        irradiances = [1000, 600, 300]
+        if channels > 1 and ts.param_value('parallel.split') == 'Irradiance':
+            # identical EUTs share out the irradiance levels
+            levels = parallel.assign(irradiances, channels)
+        else:
+            # each EUT is swept at every irradiance level
+            levels = [irradiances] * channels
+
+        # PF points completed by an earlier run of this test that did not finish are restored, not measured again
+        progress = checkpoint.checkpoint_init(ts, euts)
+
+        jobs = []
+        settlings = []
+        pf_checks = []
+        for i in range(channels):
+            # Settle detection replaces the fixed wait time at each PF level when enabled
+            settling = settle.settle_init(ts, eut=meas[i])
+            # Check each settled PF against its target as the sweep runs and skip or abort if the EUT doesn't follow
+            pf_check = conformance.conformance_init(ts, name='PF' if channels == 1 else 'PF channel %d' % (i + 1))
+            settlings.append(settling)
+            pf_checks.append(pf_check)
+            jobs.append(('pf-channel-%d' % (i + 1), pf_sweep,
+                         (i + 1, euts[i], pvs[i], meas[i], settling, pf_check, levels[i], pf_values, sleep_time,
+                          progress)))
+        # The channels are swept concurrently, one worker thread each
+        rows = parallel.run(jobs)
+        ts.log('Total settling time for PF sweeps: %0.2f seconds' % sum([s.total_time() for s in settlings]))
+
+        # Merge the channel results into one PF map, ordered by irradiance, PF target and channel
+        pf_map_filename = 'pf_map.csv'
+        pf_map = summary.ResultSummary(ts.result_file_path(pf_map_filename), [
+            summary.Column('channel', 'Channel', type='int'),
+            summary.Column('irradiance', 'Irradiance (W/m^2)', type='float'),
+            summary.Column('pf_target', 'PF Target', fmt='%0.3f', type='float'),
+            summary.Column('pf', 'PF', type='float'),
+            summary.Column('w', 'Active Power (W)', type='float'),
+            summary.Column('var', 'Reactive Power (var)', type='float'),
+            summary.Column('settle_time', 'Settle Time (s)', fmt='%0.3f', type='float')])
+        ts.result_file(pf_map_filename)
+        order = lambda r: (irradiances.index(r['irradiance']), pf_values.index(r['pf_target']), r['channel'])
+        for row in sorted([r for channel_rows in rows for r in channel_rows], key=order):
+            pf_map.write(row)
+        pf_map.close()
+        progress.complete()
 
         # Disable the PF function
-        eut.fixed_pf(params={'Ena': False})
+        for e in euts:
+            e.fixed_pf(params={'Ena': False})
         ts.log('Power Factor Disabled')
 
         result = script.RESULT_COMPLETE
+        if [c for c in pf_checks if c is not None and not c.passed()]:
+            ts.log_warning('EUT power factor did not conform to the targets')
+            result = script.RESULT_FAIL
 
     except Exception, e:
         ts.log_error('Script failure: %s' % e)
 
     finally:
-        if eut is not None:
-            eut.fixed_pf(params={'Ena': False})
-            eut.close()
-        if chil is not None:
-            chil.close()
-        if pv is not None:
-            pv.close()
+        if pf_map is not None:
+            pf_map.close(partial=True)
+        for e in euts:
+            e.fixed_pf(params={'Ena': False})
+        for e in euts:
+            session.release(ts, e)
+        session.release(ts, chil)
+        for pv in pvs:
+            session.release(ts, pv)
 
     return result
 
@@ -166,7 +294,12 @@ def run(test_script):
         ts.log_debug('Script: %s %s' % (ts.name, ts.info.version))
         ts.log_active_params()
 
-        result = test_run()
+        # Time device init, start-up, settling, driver calls and file writes; saved to the result dir
+        trace.trace_init(ts)
+        # On a simulated rig the devices are modelled and ts.sleep() advances a virtual clock
+        sim.sim_init(ts)
+        with trace.span('test_run'):
+            result = test_run()
 
         ts.result(result)
         if result == script.RESULT_FAIL:
@@ -175,7 +308,10 @@ def run(test_script):
     except Exception, e:
         ts.log_error('Test script exception: %s' % traceback.format_exc())
         rc = 1
+        result = script.RESULT_FAIL
 
+    trace.trace_save(ts)
+    resultindex.index_result(ts, result)
     sys.exit(rc)
 
 info = script.ScriptInfo(name=os.path.basename(__file__), run=run, version='1.0.0')
@@ -190,7 +326,21 @@ info.param('test.wait_time', label='Sleep Time for Each PF Level', default=0.5)
 # Expose the driver parameters through the abstraction layer
 der.params(info)
 pvsim.params(info)
+parallel.params(info)
+for channel in range(2, parallel.MAX_CHANNELS + 1):
+    der.params(info, id=channel, label='DER %d' % channel, active='parallel.mode', active_value=['Enabled'])
+    pvsim.params(info, id=channel, label='PV Simulator %d' % channel, active='parallel.mode',
+                 active_value=['Enabled'])
 hil.params(info)
+settle.params(info)
+trace.params(info)
+conformance.params(info)
+eutconfig.params(info)
+checkpoint.params(info)
+session.params(info)
+deviceio.params(info)
+sim.params(info)
+resultindex.params(info)
 
 # Add a logo to the SVP
 info.logo('sunspec.gif')
@@ -36,11 +36,23 @@ Questions can be directed to Jay Johnson (jjohns2@sandia.gov)
 import sys
 import os
 import traceback
-from svpelab import das
-from svpelab import der
-from svpelab import pvsim
-from svpelab import hil
-from svpelab import gridsim
+from svptools.drivers import das
+from svptools.drivers import der
+from svptools.drivers import pvsim
+from svptools.drivers import hil
+from svptools.drivers import gridsim
+from svptools import settle
+from svptools import session
+from svptools import deviceio
+from svptools import sim
+from svptools import trace
+from svptools import resultindex
+from svptools import measure
+from svptools import startup
+from svptools import conformance
+from svptools import eutconfig
+from svptools import trajectory
+from svptools import sweep
 import script
 import numpy as np
 
@@ -55,22 +67,22 @@ def test_run():
     try:
         v_nom = ts.param_value('test.v_nom')
 
-        # Initialize DER configuration
-        eut = der.der_init(ts)
-        eut.config()
-
-        # Initialize CHIL environment, if necessary
-        chil = hil.hil_init(ts)
-        if chil is not None:
-            chil.config()
-
-        # PV simulator is initialized with test parameters and enabled
-        pv = pvsim.pvsim_init(ts)
-        pv.irradiance_set(800)
-        pv.power_on()
-
-        # grid simulator is initialized with test parameters and enabled
-        grid = gridsim.gridsim_init(ts)
+        # Initialize DER configuration, reusing the connection from an earlier test in the suite if possible.
+        # With device I/O overlap enabled the EUT connection is opened while the test equipment is set up.
+        eut_opening = deviceio.background(ts, session.acquire, ts, 'der', der.der_init, config=True)
+        try:
+            # Initialize CHIL environment, if necessary
+            chil = session.acquire(ts, 'hil', hil.hil_init, config=True)
+
+            # PV simulator is initialized with test parameters and enabled
+            pv = session.acquire(ts, 'pvsim', pvsim.pvsim_init)
+            pv.irradiance_set(800)
+            pv.power_on()
+
+            # grid simulator is initialized with test parameters and enabled
+            grid = session.acquire(ts, 'gridsim', gridsim.gridsim_init)
+        finally:
+            eut = eut_opening.result()
         # sometimes when there's a xfmr between the gridsim and EUT, V_nom at EUT != V_nom_grid (gridsim nominal)
         try:
             v_nom_grid = grid.v_nom_param
@@ -80,43 +92,75 @@ def test_run():
         # Get EUT nameplate power
         eut_nameplate_power = eut.nameplate().get('WRtg')
 
-        inv_power = eut.measurements().get('W')
+        # EUT measurements are read once per tick and shared by all points used in that tick
+        meas = measure.Measurements(eut, points=['W', 'VAr', 'PF'])
+
+        inv_power = meas.get('W')
         timeout = 120.
         if inv_power <= eut_nameplate_power/10.:
-            eut.connect(params={'Conn': True})
-            pv.irradiance_set(800)  # Perturb the pv slightly to start the inverter
-        while inv_power <= eut_nameplate_power/10. and timeout >= 0:
-            ts.log('Inverter power is at %0.1f. Waiting %s more seconds or until EUT starts...' % (inv_power, timeout))
-            ts.sleep(1)
-            timeout -= 1
-            inv_power = eut.measurements().get('W')
-            if timeout == 0:
-                result = script.RESULT_FAIL
-                raise der.DERError('Inverter did not start.')
-
-        eut.volt_var_curve(1, params={'v': [95, 98, 102, 105], 'var': [100, 0, 0, -100]})
-        eut.volt_var(params={'ActCrv': 1, 'Ena': True})
-        parameters = eut.volt_var()
+            # Connect the EUT and perturb the pv slightly to start the inverter; the two commands are independent
+            deviceio.gather(deviceio.background(ts, eut.connect, params={'Conn': True}),
+                            deviceio.background(ts, pv.irradiance_set, 800))
+        startup_time = startup.wait_for_production(ts, meas, eut_nameplate_power/10., timeout)
+        if startup_time is None:
+            result = script.RESULT_FAIL
+            raise der.DERError('Inverter did not start.')
+        ts.log('EUT start-up latency: %0.2f seconds' % startup_time)
+
+        # EUT identity and test parameters are kept with the results for the cross-run results index
+        resultindex.run_info(ts, eut)
+
+        vv_curve = {'v': [95, 98, 102, 105], 'var': [100, 0, 0, -100]}
+        # Only the settings that differ from the EUT's cached configuration are written, then verified
+        eut_config = eutconfig.eutconfig_init(ts, eut)
+        eut_config.apply('volt_var_curve', vv_curve, id=1)
+        parameters = eut_config.apply('volt_var', {'ActCrv': 1, 'Ena': True})
         ts.log_debug('EUT VV settings (readback): %s' % parameters)
 
+        # Settle detection replaces the fixed dwell at each voltage when enabled
+        settling = settle.settle_init(ts, eut=meas)
+
         # Create list of voltages to iterate over
         voltage_values = list(np.linspace(95, 105, num=50))
+        # In adaptive mode the points are concentrated around the curve knots and refined where the EUT
+        # reactive power (% of rating) departs from the curve
+        voltage_sweep = sweep.sweep_init(ts, voltage_values, vv_curve['v'], vv_curve['var'], 95, 105,
+                                         coarse=2., fine=0.5, fine_width=0.5)
+        var_rating = eut.nameplate().get('VArRtgQ1')
+        # Check each settled point against the curve as the sweep runs and fail fast if the EUT doesn't follow it
+        vv_check = conformance.conformance_init(ts, vv_curve['v'], vv_curve['var'], name='VV')
         sleep_time = 1.
-        for voltage in voltage_values:
-            v = ((voltage/100.) * v_nom_grid)
-            grid.voltage(v)  # set grid voltage
-            ts.log('      V = %0.3f V (%0.3f%%). Sleeping for %0.2f seconds...' % (v, voltage, sleep_time))
-            ts.sleep(sleep_time)
+        # In trajectory mode the whole voltage profile is timed by the simulator or a scheduler thread
+        traj = trajectory.trajectory_init(ts, grid, 'voltage', [(voltage/100.) * v_nom_grid
+                                                               for voltage in voltage_sweep.values])
+        if traj is not None:
+            traj.run(ts, monitor=lambda i, v: ts.log('      V = %0.3f V (%0.3f%%)' %
+                                                     (v, voltage_sweep.values[i])))
+            ts.log('VV trajectory lateness: mean %0.4f s, max %0.4f s' % traj.jitter())
+        else:
+            for voltage in voltage_sweep:
+                v = ((voltage/100.) * v_nom_grid)
+                grid.voltage(v)  # set grid voltage
+                ts.log('      V = %0.3f V (%0.3f%%). Waiting for EUT to settle...' % (v, voltage))
+                settle_time = settling.wait(sleep_time)
+                ts.log_debug('      Settled in %0.2f seconds' % settle_time)
+                var = meas.get('VAr')
+                var_pct = 100.*var/var_rating if var is not None and var_rating else None
+                voltage_sweep.record(voltage, var_pct)
+                if vv_check is not None and not vv_check.check(voltage, var_pct):
+                    ts.log_warning('VV response out of tolerance, skipping the rest of the sweep')
+                    break
+            ts.log('VV sweep: %d points, total settling time %0.2f seconds' %
+                   (len(voltage_sweep), settling.total_time()))
 
         # Disable the VV function
-        eut.volt_var(params={'Ena': False})
+        eut_config.set('volt_var', {'Ena': False})
         ts.log('VV Disabled')
 
-        # Close the connection to the CHIL
-        if chil is not None:
-            chil.close()
-
         result = script.RESULT_COMPLETE
+        if vv_check is not None and not vv_check.passed():
+            ts.log_warning('VV response did not conform to the curve')
+            result = script.RESULT_FAIL
 
     except Exception, e:
         ts.log_error('Script failure: %s' % e)
@@ -124,13 +168,10 @@ def test_run():
     finally:
         if eut is not None:
             eut.volt_var(params={'Ena': False})
-            eut.close()
-        if chil is not None:
-            chil.close()
-        if pv is not None:
-            pv.close()
-        if grid is not None:
-            grid.close()
+        session.release(ts, eut)
+        session.release(ts, chil)
+        session.release(ts, pv)
+        session.release(ts, grid)
 
     return result
 
@@ -147,7 +188,12 @@ def run(test_script):
         ts.log_debug('Script: %s %s' % (ts.name, ts.info.version))
         ts.log_active_params()
 
-        result = test_run()
+        # Time device init, start-up, settling, driver calls and file writes; saved to the result dir
+        trace.trace_init(ts)
+        # On a simulated rig the devices are modelled and ts.sleep() advances a virtual clock
+        sim.sim_init(ts)
+        with trace.span('test_run'):
+            result = test_run()
 
         ts.result(result)
         if result == script.RESULT_FAIL:
@@ -156,7 +202,10 @@ def run(test_script):
     except Exception, e:
         ts.log_error('Test script exception: %s' % traceback.format_exc())
         rc = 1
+        result = script.RESULT_FAIL
 
+    trace.trace_save(ts)
+    resultindex.index_result(ts, result)
     sys.exit(rc)
 
 info = script.ScriptInfo(name=os.path.basename(__file__), run=run, version='1.0.0')
@@ -169,6 +218,16 @@ der.params(info)
 pvsim.params(info)
 hil.params(info)
 gridsim.params(info)
+settle.params(info)
+trace.params(info)
+conformance.params(info)
+eutconfig.params(info)
+trajectory.params(info)
+sweep.params(info)
+session.params(info)
+deviceio.params(info)
+sim.params(info)
+resultindex.params(info)
 
 # Add a logo to the SVP
 info.logo('sunspec.gif')